@@ -0,0 +1,186 @@
+"""
+doc_request.py
+The PAN/Aadhaar request message sent to a candidate: LLM prompts, template
+fallback, sender sanitising, and a per-candidate cache of the drafted message.
+
+precompute_document_request_task drafts the message right after a new upload
+is parsed (for the default org and upload link; not for bulk uploads or
+reparses, which would spend an LLM call on candidates nobody opens), so POST
+/candidates/<id>/request-documents answers from Redis instead of waiting on the
+LLM. Each candidate has one entry, stored with a hash of everything the message
+depends on (candidate fields, org name, support email, upload link,
+PROMPT_VERSION); a request whose inputs hash differently drafts a new message
+and replaces it. Only LLM-written messages are cached (the template is free).
+A Redis failure is a miss (redis_client.fail_open).
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+
+from . import metrics
+from .llm_client import generate_structured
+from .redis_client import fail_open, get as _redis
+
+PROMPT_VERSION = 1  # bump when the prompts below change: cached drafts go stale
+
+DOC_REQUEST_CACHE_TTL = int(os.getenv("DOC_REQUEST_CACHE_TTL", str(30 * 24 * 3600)))
+DOC_REQUEST_UPLOAD_URL = os.getenv("DOC_REQUEST_UPLOAD_URL", "http://localhost:5173/upload/{id}")
+
+_PREFIX = "docreq:"
+
+
+def default_upload_url(candidate_id) -> str:
+    return DOC_REQUEST_UPLOAD_URL.format(id=candidate_id)
+
+
+def default_sender():
+    """(org_name, support_email) used when the request doesn't override them."""
+    return (
+        getattr(settings, "ORG_NAME", "TraqCheck").strip(),
+        getattr(settings, "ORG_SUPPORT_EMAIL", "support@traqcheck.local").strip(),
+    )
+
+
+def candidate_payload(cand, extracted: Dict[str, Any]) -> Dict[str, Any]:
+    """Best-known candidate details; the prior employer is candidate_company, never the sender."""
+    return {
+        "name": extracted.get("name") or cand.name,
+        "email": extracted.get("email") or cand.email,
+        "phone": extracted.get("phone") or cand.phone,
+        "skills": extracted.get("skills") or (cand.skills or []),
+        "candidate_company": extracted.get("company") or cand.company,
+        "designation": extracted.get("designation") or cand.designation,
+    }
+
+
+def compose_preview(candidate_payload, upload_url, org_name, support_email):
+    sal = (candidate_payload.get("name") or "there").strip()
+    subject = f"{org_name} — PAN & Aadhaar verification"
+    email_body = (
+        f"Hi {sal},\n\n"
+        f"To complete your background verification for onboarding with {org_name}, "
+        "please upload clear images or PDFs of your PAN and Aadhaar using the secure link below:\n"
+        f"{upload_url}\n\n"
+        "We use these documents only for identity verification and do not share them. "
+        f"If you face any issues, reply to {support_email} and we’ll help.\n\n"
+        f"Thanks,\n{org_name} Team"
+    )
+    sms_body = f"{org_name}: please upload PAN & Aadhaar to complete verification: {upload_url}"
+    return {"subject": subject, "email_body": email_body, "sms_body": sms_body}
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "subject": {"type": "string"},
+        "email_body": {"type": "string"},
+        "sms_body": {"type": "string"},
+    },
+    "required": ["subject", "email_body", "sms_body"],
+    "additionalProperties": False,
+}
+
+
+def prompts(candidate_payload, upload_url, org_name, support_email):
+    """(system, user) LLM prompts for the PAN/Aadhaar request, with explicit sender semantics."""
+    system = (
+        "You are an HR assistant writing document-collection messages on behalf of an organization.\n"
+        "You MUST treat the requesting organization as the SENDER.\n"
+        f"- The sender organization is '{org_name}'. Never imply you are the candidate's employer.\n"
+        "- 'candidate_company' (if present) is the candidate's past/current employer, NOT the sender.\n"
+        "- Write concise, professional, privacy-aware requests to collect PAN and Aadhaar.\n"
+        "- Tone: courteous, clear, formal; keep SMS <= 320 chars.\n"
+        "- Output STRICT JSON ONLY with keys: subject, email_body, sms_body. No markdown links.\n"
+    )
+    user = (
+        "Context:\n"
+        f"- Sender org: {org_name}\n"
+        f"- Support email: {support_email}\n"
+        f"- Secure upload link: {upload_url}\n"
+        f"- Candidate data: {candidate_payload}\n\n"
+        "Requirements:\n"
+        "- Subject mentions 'PAN & Aadhaar verification' or similar.\n"
+        "- Email body MUST state you are contacting on behalf of the sender org (org_name),\n"
+        "  explain purpose (onboarding/identity verification), acceptable file types (clear photo or PDF), privacy,\n"
+        "  support instructions (use support_email), and include the plain URL.\n"
+        "- SMS body must be ≤ 320 chars and include the URL.\n"
+        "- NEVER say or imply you are the candidate_company.\n"
+        "- Output EXACT JSON with keys: subject, email_body, sms_body."
+    )
+    return system, user
+
+
+def fix_sender(data, candidate_payload, org_name):
+    """Final safety: sanitize any accidental sender confusion (in place; returns data)."""
+    cand_co = (candidate_payload.get("candidate_company") or "").strip()
+    if cand_co and cand_co.lower() != org_name.lower():
+        def _fix_org(text: str) -> str:
+            if not text:
+                return text
+            text = text.replace(f" at {cand_co}", f" at {org_name}")
+            text = text.replace(f" from {cand_co}", f" from {org_name}")
+            text = text.replace(cand_co, org_name)
+            return text
+
+        for key in ("subject", "email_body", "sms_body"):
+            if key in data:
+                data[key] = _fix_org(data.get(key, ""))
+    return data
+
+
+def draft(
+    candidate_payload, upload_url, org_name, support_email,
+    on_delta: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Optional[Dict[str, str]]:
+    """
+    LLM-written message with the sender fixed, or None if no LLM is configured
+    or every provider failed. LLMTimeout / LLMThrottled propagate. on_delta
+    receives sanitised partial drafts while it streams (see generate_structured).
+    """
+    system, user = prompts(candidate_payload, upload_url, org_name, support_email)
+    stream = None if on_delta is None else lambda d: on_delta(fix_sender(dict(d), candidate_payload, org_name))
+    data = generate_structured(SCHEMA, system, user, on_delta=stream)
+    return fix_sender(data, candidate_payload, org_name) if data else None
+
+
+# -- Per-candidate cache -------------------------------------------------------
+
+def inputs_key(candidate_payload, upload_url, org_name, support_email) -> str:
+    """Hash of everything the drafted message depends on."""
+    blob = json.dumps(
+        {
+            "candidate": candidate_payload,
+            "upload_url": upload_url,
+            "org_name": org_name,
+            "support_email": support_email,
+            "prompt_version": PROMPT_VERSION,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def cached(candidate_id, key: str, count: bool = True) -> Optional[Dict[str, str]]:
+    """The candidate's cached message if it was drafted from the same inputs, else None."""
+    entry = _load(candidate_id)
+    hit = entry is not None and entry.get("key") == key
+    if count:
+        metrics.incr("doc_request_cache_hit" if hit else "doc_request_cache_miss")
+    return entry["message"] if hit else None
+
+
+@fail_open()
+def _load(candidate_id) -> Optional[Dict[str, Any]]:
+    raw = _redis().get(f"{_PREFIX}{candidate_id}")
+    return json.loads(raw) if raw is not None else None
+
+
+@fail_open()
+def store(candidate_id, key: str, message: Dict[str, str]) -> None:
+    _redis().set(f"{_PREFIX}{candidate_id}", json.dumps({"key": key, "message": message}), ex=DOC_REQUEST_CACHE_TTL)
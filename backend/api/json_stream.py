@@ -0,0 +1,138 @@
+"""
+json_stream.py
+Incremental parser for a JSON object that arrives in pieces (streamed LLM output).
+
+    p = IncrementalJSONObject(required=["subject", "email_body"])
+    for delta in stream:
+        if p.feed(delta):      # True once every required key has a complete value
+            break              # (or the object closed) — stop reading the stream
+    data = p.result()
+
+It only tracks the top level: each "key": value pair is decoded with json.loads
+as soon as the value ends, so a broken value raises ValueError at that point
+instead of after the whole completion. Text before the first "{" (a sentence of
+preamble, a ```json fence) is skipped, like _extract_json_block does; a bare
+array is rejected, and so is an answer that is still prose after
+MAX_PREAMBLE characters.
+partial() exposes the completed values plus the string value still being
+written, for showing a draft while it generates.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Optional
+
+
+MAX_PREAMBLE = 2000
+
+
+class IncrementalJSONObject:
+    def __init__(self, required: Optional[Iterable[str]] = None):
+        self.required = set(required or [])
+        self.values: Dict[str, Any] = {}
+        self.done = False
+        self._buf = ""
+        self._i = 0
+        self._start = -1       # index of the opening "{"
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._key: Optional[str] = None
+        self._key_start = -1   # opening quote of the key being read
+        self._val_start = -1   # first char after ":" of the value being read
+        self._str_start = -1   # opening quote of the current depth-1 string
+
+    def feed(self, chunk: str) -> bool:
+        """Consume more text; True once the object is usable (see module doc)."""
+        if self.done or not chunk:
+            return self.done
+        self._buf += chunk
+        buf = self._buf
+        while self._i < len(buf) and not self.done:
+            ch = buf[self._i]
+            if self._start < 0:
+                self._before_start(ch)
+            elif self._in_str:
+                self._string_char(ch)
+            else:
+                self._structural(ch)
+            self._i += 1
+        return self.done
+
+    def result(self) -> Dict[str, Any]:
+        if not self.done:
+            raise ValueError("incomplete JSON object")
+        return dict(self.values)
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buf
+
+    def partial(self) -> Dict[str, Any]:
+        """Completed values, plus the prefix of a string value still being streamed."""
+        out = dict(self.values)
+        if (
+            self._in_str and self._depth == 1 and self._key is not None and self._str_start >= 0
+            and not self._buf[self._val_start : self._str_start].strip()
+        ):
+            raw = self._buf[self._str_start + 1 : self._i]
+            if raw.endswith("\\") and not raw.endswith("\\\\"):
+                raw = raw[:-1]
+            try:
+                out[self._key] = json.loads('"' + raw + '"')
+            except ValueError:
+                out[self._key] = raw
+        return out
+
+    # -- scanner -------------------------------------------------------------
+
+    def _before_start(self, ch: str) -> None:
+        if ch == "{":
+            self._start = self._i
+            self._depth = 1
+        elif ch == "[" and not self._buf[: self._i].strip():
+            raise ValueError("expected a JSON object, got an array")
+        elif self._i >= MAX_PREAMBLE:
+            raise ValueError(f"no JSON object in the first {MAX_PREAMBLE} characters")
+
+    def _string_char(self, ch: str) -> None:
+        if self._esc:
+            self._esc = False
+        elif ch == "\\":
+            self._esc = True
+        elif ch == '"':
+            self._in_str = False
+            if self._depth == 1 and self._key is None and self._key_start >= 0:
+                self._key = json.loads(self._buf[self._key_start : self._i + 1])
+                self._key_start = -1
+
+    def _structural(self, ch: str) -> None:
+        if ch == '"':
+            self._in_str = True
+            if self._depth == 1:
+                if self._key is None:
+                    self._key_start = self._i
+                else:
+                    self._str_start = self._i
+        elif ch == ":" and self._depth == 1:
+            self._val_start = self._i + 1
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                # The whole object is here: let json.loads validate what the scan skipped over.
+                self.values = json.loads(self._buf[self._start : self._i + 1])
+                self.done = True
+        elif ch == "," and self._depth == 1:
+            self._end_value()
+        if self.required and self.required.issubset(self.values):
+            self.done = True
+
+    def _end_value(self) -> None:
+        if self._key is None:
+            return
+        text = self._buf[self._val_start : self._i].strip()
+        self.values[self._key] = json.loads(text)  # ValueError on a broken value: fail fast
+        self._key = None
+        self._val_start = self._str_start = -1
@@ -0,0 +1,94 @@
+"""
+llm_cache.py
+Redis-backed cache for generate_structured() results.
+
+Key = sha256(schema, system prompt, user prompt, provider, model), so a reparse
+or a duplicate resume with unchanged text/prompt/model skips the LLM call.
+Entries expire after LLM_CACHE_TTL seconds; LLM_CACHE_MAX_ENTRIES bounds the
+total (least-recently-used entries are evicted first). Hit/miss counters live in
+Redis so they aggregate across all workers; see stats().
+
+Any Redis failure degrades to a cache miss (redis_client.fail_open).
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from .redis_client import fail_open, get as _redis
+
+_PREFIX = "llmcache:"
+_INDEX = _PREFIX + "index"  # zset: key -> last-access ts (LRU order)
+_HITS = _PREFIX + "hits"
+_MISSES = _PREFIX + "misses"
+
+
+def _enabled() -> bool:
+    return os.getenv("LLM_CACHE_ENABLED", "1").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _ttl() -> int:
+    return int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def _max_entries() -> int:
+    return int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+
+def make_key(schema: Dict[str, Any], system: str, user: str, provider: str, model: str) -> str:
+    """Stable content hash of everything that determines the LLM output."""
+    blob = json.dumps(
+        {"schema": schema, "system": system, "user": user, "provider": provider, "model": model},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return _PREFIX + hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+@fail_open()
+def get(key: str) -> Optional[Dict[str, Any]]:
+    """Cached dict for key, or None on miss / disabled / Redis unavailable."""
+    if not _enabled():
+        return None
+    r = _redis()
+    raw = r.get(key)
+    pipe = r.pipeline()
+    if raw is None:
+        pipe.incr(_MISSES)
+    else:
+        pipe.incr(_HITS)
+        pipe.zadd(_INDEX, {key: time.time()})
+    pipe.execute()
+    return json.loads(raw) if raw is not None else None
+
+
+@fail_open()
+def put(key: str, value: Dict[str, Any]) -> None:
+    """Store value with TTL, then trim the index down to LLM_CACHE_MAX_ENTRIES."""
+    if not _enabled():
+        return
+    r = _redis()
+    now = time.time()
+    ttl = _ttl()
+    pipe = r.pipeline()
+    pipe.set(key, json.dumps(value), ex=ttl)
+    pipe.zadd(_INDEX, {key: now})
+    pipe.zremrangebyscore(_INDEX, "-inf", now - ttl)  # members whose key already expired
+    pipe.zcard(_INDEX)
+    size = pipe.execute()[-1]
+
+    overflow = size - _max_entries()
+    if overflow > 0:
+        evicted = [m for m, _ in r.zpopmin(_INDEX, overflow)]
+        if evicted:
+            r.delete(*evicted)
+
+
+@fail_open({"hits": 0, "misses": 0, "entries": 0})
+def stats() -> Dict[str, int]:
+    """Cluster-wide hit/miss counters and current entry count."""
+    r = _redis()
+    hits, misses = r.mget(_HITS, _MISSES)
+    return {"hits": int(hits or 0), "misses": int(misses or 0), "entries": int(r.zcard(_INDEX))}
@@ -1,11 +1,95 @@
-import json, os, time
-from typing import Any, Dict, Optional
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import asyncio, json, os, threading, time, weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+from tenacity import (
+    AsyncRetrying, Retrying, stop_after_attempt, stop_after_delay, wait_exponential,
+    retry_if_exception_type, retry_if_not_exception_type,
+)
+
+from . import llm_cache, llm_health, llm_ratelimit
+from .json_stream import IncrementalJSONObject
 
 _JSON_TIMEOUT_SECS = float(os.getenv("LLM_JSON_TIMEOUT", "12"))
+_TEXT_TIMEOUT_SECS = float(os.getenv("LLM_TEXT_TIMEOUT", "30"))
+_CONNECT_TIMEOUT_SECS = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+_ASYNC_POOL_SIZE = int(os.getenv("LLM_ASYNC_POOL_SIZE", "50"))
+_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "1024"))  # Anthropic needs an explicit cap
+_STREAM = os.getenv("LLM_STREAM", "0").strip().lower() in {"1", "true", "yes", "on"}
 
 class LLMError(Exception): ...
 
+class LLMTimeout(LLMError):
+    """The call's deadline ran out; callers should fall back instead of waiting."""
+
+class LLMRateLimited(LLMError):
+    """HTTP 429 from the provider; retry_after (seconds) if it said."""
+    def __init__(self, msg: str, retry_after: Optional[float] = None):
+        super().__init__(msg)
+        self.retry_after = retry_after
+
+class LLMThrottled(LLMError):
+    """
+    No provider can take the call now: our own shared rate limit
+    (llm_ratelimit) has no room, or every provider is backed off after a 429
+    or has its circuit open (llm_health); nothing was sent. Celery tasks should
+    retry after retry_after seconds instead of waiting in the worker.
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(f"no provider available; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+# -----------------------------------------------------------------------------
+# Per-process client registry (keep-alive pools reused across calls)
+# -----------------------------------------------------------------------------
+
+_clients: Dict[str, Any] = {}
+_clients_pid: Optional[int] = None
+_clients_lock = threading.Lock()
+
+def reset_clients() -> None:
+    """
+    Forget cached clients. Called after a fork (Celery prefork child): pooled
+    sockets belong to the parent and must not be shared, so we drop them
+    without closing and let each child build its own on first use.
+    """
+    global _clients_pid
+    _clients.clear()
+    _clients_pid = os.getpid()
+
+def _http_client():
+    import httpx
+    return httpx.Client(
+        timeout=httpx.Timeout(_JSON_TIMEOUT_SECS, connect=_CONNECT_TIMEOUT_SECS),
+        limits=httpx.Limits(max_connections=_POOL_SIZE, max_keepalive_connections=_POOL_SIZE),
+    )
+
+def _build_client(name: str):
+    if name == "http":
+        return _http_client()
+    if name == "openai":
+        from openai import OpenAI
+        # max_retries=0: retries are ours (_with_deadline) so they share one budget.
+        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=_http_client(), max_retries=0)
+    if name == "anthropic":
+        import anthropic
+        return anthropic.Anthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"), http_client=_http_client(), max_retries=0
+        )
+    raise ValueError(f"unknown client: {name}")
+
+def get_client(name: str):
+    """Lazily build (once per process) the client for 'http' | 'openai' | 'anthropic'."""
+    if _clients_pid != os.getpid():
+        reset_clients()
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = _build_client(name)
+    return client
+
 def _extract_json_block(text: str) -> Optional[Dict[str, Any]]:
     """
     Robust JSON extraction from a text response that *should* be pure JSON.
@@ -26,21 +110,135 @@ def _extract_json_block(text: str) -> Optional[Dict[str, Any]]:
             return None
     return None
 
-@retry(
-    reraise=False,
-    stop=stop_after_attempt(2),
-    wait=wait_exponential(multiplier=0.4, min=0.4, max=2),
-    retry=retry_if_exception_type(LLMError),
-)
+# Async clients are bound to the event loop that created them, so they are
+# kept per running loop (e.g. one asyncio.run() inside a Celery task).
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+def _async_http_client():
+    import httpx
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(_JSON_TIMEOUT_SECS, connect=_CONNECT_TIMEOUT_SECS),
+        limits=httpx.Limits(max_connections=_ASYNC_POOL_SIZE, max_keepalive_connections=_ASYNC_POOL_SIZE),
+    )
+
+def _build_async_client(name: str):
+    if name == "http":
+        return _async_http_client()
+    if name == "openai":
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=_async_http_client(), max_retries=0)
+    if name == "anthropic":
+        import anthropic
+        return anthropic.AsyncAnthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"), http_client=_async_http_client(), max_retries=0
+        )
+    raise ValueError(f"unknown client: {name}")
+
+def get_async_client(name: str):
+    """Async counterpart of get_client(), scoped to the running event loop."""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if name not in clients:
+        clients[name] = _build_async_client(name)
+    return clients[name]
+
+async def aclose_clients() -> None:
+    """Close the running loop's async clients; call before the loop shuts down."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await (client.aclose() if hasattr(client, "aclose") else client.close())
+
+# -----------------------------------------------------------------------------
+# Deadlines & retries
+# -----------------------------------------------------------------------------
+
+def _httpx_timeout(remaining: float):
+    import httpx
+    return httpx.Timeout(remaining, connect=min(_CONNECT_TIMEOUT_SECS, remaining))
+
+def _classify(exc: Exception) -> Exception:
+    """Map provider/transport errors to LLMTimeout (budget gone) or LLMError (retryable)."""
+    if isinstance(exc, LLMError):
+        return exc
+    import httpx
+    if isinstance(exc, httpx.TimeoutException) or type(exc).__name__ == "APITimeoutError":
+        return LLMTimeout(str(exc) or "timeout")
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status == 429:
+        try:
+            retry_after = float(response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            retry_after = None
+        return LLMRateLimited("HTTP 429", retry_after)
+    if status and status >= 500:
+        return LLMError(f"HTTP {status}")
+    if isinstance(exc, httpx.TransportError) or type(exc).__name__ == "APIConnectionError":
+        return LLMError(str(exc) or type(exc).__name__)
+    return exc
+
+def _with_deadline(call, budget: float, attempts: int = 2):
+    """
+    Run call(remaining_secs) under one overall deadline. Transient LLMErrors are
+    retried (attempts in total) with whatever budget is left; each attempt gets
+    only the remaining seconds as its timeout. 429s are not retried here: the
+    provider is backed off and the next one in the chain is used instead; nor
+    is LLMThrottled from our own limiter (call charges it per attempt).
+    Raises LLMTimeout once the budget is spent.
+    """
+    deadline = time.monotonic() + budget
+    for attempt in Retrying(
+        reraise=True,
+        stop=stop_after_attempt(attempts) | stop_after_delay(budget),
+        wait=wait_exponential(multiplier=0.4, min=0.4, max=2),
+        retry=retry_if_exception_type(LLMError) & retry_if_not_exception_type((LLMTimeout, LLMRateLimited, LLMThrottled)),
+    ):
+        with attempt:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeout("deadline exceeded")
+            try:
+                return call(remaining)
+            except Exception as e:
+                raise _classify(e) from e
+
+async def _awith_deadline(call, budget: float, attempts: int = 2):
+    """Async _with_deadline(): each attempt is cancelled once the budget is spent."""
+    deadline = time.monotonic() + budget
+    async for attempt in AsyncRetrying(
+        reraise=True,
+        stop=stop_after_attempt(attempts) | stop_after_delay(budget),
+        wait=wait_exponential(multiplier=0.4, min=0.4, max=2),
+        retry=retry_if_exception_type(LLMError) & retry_if_not_exception_type((LLMTimeout, LLMRateLimited, LLMThrottled)),
+    ):
+        with attempt:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeout("deadline exceeded")
+            try:
+                return await asyncio.wait_for(call(remaining), remaining)
+            except asyncio.TimeoutError:
+                raise LLMTimeout("deadline exceeded")
+            except Exception as e:
+                raise _classify(e) from e
+
+# -----------------------------------------------------------------------------
+# Plain text
+# -----------------------------------------------------------------------------
 
 def generate_text(system: str, user: str) -> str | None:
     """
     Basic text generation. Returns None if no provider/key configured or on error.
+    Raises LLMTimeout if the provider doesn't answer within LLM_TEXT_TIMEOUT,
+    LLMThrottled if the shared rate limit has no room.
     """
     prov = (os.getenv("LLM_PROVIDER") or "").lower()
+
+    def post(url, headers, data, timeout):
+        _throttle(prov, system, user)  # every attempt is a request
+        return _post(url, headers, data, timeout)
+
     try:
         if prov == "openai":
-            import requests, json
             key = os.getenv("OPENAI_API_KEY")
             model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
             if not key:
@@ -48,12 +246,10 @@ def generate_text(system: str, user: str) -> str | None:
             url = "https://api.openai.com/v1/chat/completions"
             headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
             data = {"model": model, "messages": [{"role":"system","content":system},{"role":"user","content":user}]}
-            r = requests.post(url, headers=headers, data=json.dumps(data), timeout=30)
-            r.raise_for_status()
+            r = _with_deadline(lambda t: post(url, headers, data, t), _TEXT_TIMEOUT_SECS)
             return r.json()["choices"][0]["message"]["content"].strip()
 
         if prov == "openrouter":
-            import requests, json
             key = os.getenv("OPENROUTER_API_KEY")
             model = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini")
             if not key:
@@ -61,12 +257,10 @@ def generate_text(system: str, user: str) -> str | None:
             url = "https://openrouter.ai/api/v1/chat/completions"
             headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
             data = {"model": model, "messages":[{"role":"system","content":system},{"role":"user","content":user}]}
-            r = requests.post(url, headers=headers, data=json.dumps(data), timeout=30)
-            r.raise_for_status()
+            r = _with_deadline(lambda t: post(url, headers, data, t), _TEXT_TIMEOUT_SECS)
             return r.json()["choices"][0]["message"]["content"].strip()
 
         if prov == "anthropic":
-            import requests, json, os
             key = os.getenv("ANTHROPIC_API_KEY")
             model = os.getenv("ANTHROPIC_MODEL", "claude-3-haiku-20240307")
             if not key:
@@ -83,93 +277,682 @@ def generate_text(system: str, user: str) -> str | None:
                 "max_tokens": 600,
                 "messages": [{"role":"user","content":user}],
             }
-            r = requests.post(url, headers=headers, data=json.dumps(data), timeout=30)
-            r.raise_for_status()
+            r = _with_deadline(lambda t: post(url, headers, data, t), _TEXT_TIMEOUT_SECS)
             return "".join(part.get("text","") for part in r.json()["content"]).strip()
+    except (LLMTimeout, LLMThrottled):
+        raise
     except Exception:
         return None
     return None
 
-def generate_structured(schema: Dict[str, Any], system_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
+def _post(url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: float):
+    r = get_client("http").post(url, headers=headers, json=payload, timeout=_httpx_timeout(timeout))
+    r.raise_for_status()
+    return r
+
+# -----------------------------------------------------------------------------
+# Structured JSON
+# -----------------------------------------------------------------------------
+
+_DEFAULT_MODELS = {
+    "openai": ("OPENAI_MODEL", "gpt-4o-mini"),
+    "openrouter": ("OPENROUTER_MODEL", "openai/gpt-4o-mini"),
+    "anthropic": ("ANTHROPIC_MODEL", "claude-3-haiku-20240307"),
+}
+
+def _resolve_model(provider: str) -> str:
+    env, default = _DEFAULT_MODELS.get(provider, ("", ""))
+    return os.getenv(env, default) if env else ""
+
+_API_KEY_ENV = {"openai": "OPENAI_API_KEY", "openrouter": "OPENROUTER_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
+
+def provider_chain() -> List[str]:
+    """
+    Providers to try, in order: LLM_PROVIDERS (comma-separated, e.g.
+    "openai,anthropic") or else the single LLM_PROVIDER. Unknown providers and
+    those without an API key are left out.
+    """
+    raw = os.getenv("LLM_PROVIDERS") or os.getenv("LLM_PROVIDER", "")
+    chain = []
+    for p in (x.strip().lower() for x in raw.split(",")):
+        if p in _API_KEY_ENV and os.getenv(_API_KEY_ENV[p]) and p not in chain:
+            chain.append(p)
+    return chain
+
+def _cache_key(chain: List[str], schema: Dict[str, Any], system_prompt: str, user_prompt: str) -> str:
+    return llm_cache.make_key(
+        schema, system_prompt, user_prompt, ",".join(chain), ",".join(_resolve_model(p) for p in chain)
+    )
+
+# Failover & hedging. Providers are tried in chain order, skipping any that
+# llm_health says are backed off (429) or circuit-broken; a failure moves on to
+# the next one within the same deadline. With LLM_HEDGE on and a second
+# provider available, if the first hasn't answered after its p95 latency the
+# second is asked too and the first good answer wins. With a chain of one this
+# is the plain deadline + retry call it always was.
+
+_HEDGE = os.getenv("LLM_HEDGE", "1").strip().lower() in {"1", "true", "yes", "on"}
+
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_pid: Optional[int] = None
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool, _hedge_pool_pid
+    if _hedge_pool is None or _hedge_pool_pid != os.getpid():
+        _hedge_pool = ThreadPoolExecutor(max_workers=2 * _POOL_SIZE, thread_name_prefix="llm-hedge")
+        _hedge_pool_pid = os.getpid()
+    return _hedge_pool
+
+def _record(provider: str, started: float, exc: Optional[Exception]) -> None:
+    h = llm_health.get(provider)
+    if exc is None:
+        h.record_success(time.monotonic() - started)
+    else:
+        h.record_failure(isinstance(exc, LLMRateLimited), getattr(exc, "retry_after", None))
+
+_EST_OUTPUT_TOKENS = 300  # per answer object; a packed request asks for several
+
+def _throttle(provider: str, system_prompt: str, user_prompt: str, answers: int = 1) -> None:
+    """
+    Charge one request to the shared RPM/TPM buckets (~4 chars/token in, an
+    estimate per answer object out); LLMThrottled if they are empty. Called
+    before every attempt, retries included: each one is billed by the provider.
+    """
+    tokens = (len(system_prompt) + len(user_prompt)) // 4 + _EST_OUTPUT_TOKENS * max(1, answers)
+    wait = llm_ratelimit.acquire(provider, tokens)
+    if wait > 0:
+        raise LLMThrottled(wait)
+
+# Streaming. With stream on, the answer is read as it is generated and fed to
+# an IncrementalJSONObject: the call returns as soon as every required key of
+# the schema has a complete value (closing the stream, so the provider stops
+# generating), and output that isn't a JSON object fails at its first bad
+# character instead of after the last token. That ValueError is not retried:
+# the same prompt tends to produce the same shape, so the next provider gets it.
+# on_delta(partial dict) is called as text arrives, for live previews.
+
+class _StreamOpts:
+    def __init__(self, required: List[str], on_delta=None):
+        self.required = required
+        self.on_delta = on_delta
+        self._owner: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def emit(self, provider: str, partial: Dict[str, Any]) -> None:
+        # A hedge may stream two providers at once; the first one to produce
+        # text owns the preview until it fails.
+        with self._lock:
+            if self._owner is None:
+                self._owner = provider
+            mine = self._owner == provider
+        if mine:
+            self.on_delta(partial)
+
+    def release(self, provider: str) -> None:
+        with self._lock:
+            if self._owner == provider:
+                self._owner = None
+
+class _StreamSink:
+    """One streamed attempt: text deltas in, JSON text out (early once the required keys are done)."""
+    def __init__(self, provider: str, opts: _StreamOpts, timeout: float):
+        self.provider = provider
+        self.opts = opts
+        self.timeout = timeout
+        self.parser = IncrementalJSONObject(opts.required)
+        self._end = time.monotonic() + timeout
+
+    def feed(self, delta: str) -> bool:
+        if time.monotonic() > self._end:
+            raise LLMTimeout("deadline exceeded")
+        done = self.parser.feed(delta)
+        if self.opts.on_delta is not None:
+            self.opts.emit(self.provider, self.parser.result() if done else self.parser.partial())
+        return done
+
+    def content(self) -> str:
+        # Stream ended without a complete object: hand the text to _extract_json_block.
+        return json.dumps(self.parser.result()) if self.parser.done else self.parser.text
+
+    def consume(self, deltas) -> str:
+        for delta in deltas:
+            if delta and self.feed(delta):
+                break
+        return self.content()
+
+    async def aconsume(self, deltas) -> str:
+        async for delta in deltas:
+            if delta and self.feed(delta):
+                break
+        return self.content()
+
+def _call_provider(
+    provider: str, system_prompt: str, user_prompt: str, deadline: float, attempts: int,
+    stream: Optional[_StreamOpts] = None, answers: int = 1,
+) -> str:
+    if stream is None:
+        call = _STRUCTURED_CALLS[provider]
+    else:
+        stream_call = _STREAM_CALLS[provider]
+        call = lambda sp, up, t: stream_call(sp, up, _StreamSink(provider, stream, t))
+
+    def attempt(t):
+        _throttle(provider, system_prompt, user_prompt, answers)
+        return call(system_prompt, user_prompt, t)
+
+    started = time.monotonic()
+    try:
+        content = _with_deadline(attempt, deadline - started, attempts)
+    except LLMThrottled:
+        if stream is not None:
+            stream.release(provider)
+        raise  # our own limiter: nothing was sent, not the provider's fault
+    except Exception as e:
+        _record(provider, started, e)
+        if stream is not None:
+            stream.release(provider)
+        if isinstance(e, LLMRateLimited):
+            # Backed off now (llm_health); if no other provider answers, the caller requeues.
+            raise LLMThrottled(llm_health.get(provider).available_in()) from e
+        raise
+    _record(provider, started, None)
+    return content
+
+def _failover(
+    chain: List[str], system_prompt: str, user_prompt: str, budget: float, stream: Optional[_StreamOpts] = None,
+    answers: int = 1,
+) -> Optional[str]:
+    """
+    First answer from the chain within budget; None if all failed; LLMTimeout if
+    time ran out; LLMThrottled if no provider could be called.
+    """
+    deadline = time.monotonic() + budget
+    queue = llm_health.route(chain)
+    if not queue:
+        # Every provider is backed off or circuit-open: same as a full rate limit.
+        raise LLMThrottled(llm_health.next_available(chain))
+    attempts = 2 if len(chain) == 1 else 1  # with a fallback, fail over instead of retrying
+    if len(queue) == 1:
+        return _call_provider(queue[0], system_prompt, user_prompt, deadline, attempts, stream, answers)
+
+    pool = _get_hedge_pool()
+    pending: Dict[Any, str] = {}
+    timed_out = hedged = False
+    throttled: List[float] = []
+
+    def launch() -> None:
+        p = queue.pop(0)
+        pending[pool.submit(_call_provider, p, system_prompt, user_prompt, deadline, attempts, stream, answers)] = p
+
+    launch()
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        hedge_in = None
+        if _HEDGE and not hedged and queue and len(pending) == 1:
+            hedge_in = llm_health.get(next(iter(pending.values()))).hedge_delay()
+        done, _ = wait(list(pending), timeout=min(remaining, hedge_in or remaining), return_when=FIRST_COMPLETED)
+        if not done:
+            if hedge_in is not None and remaining > hedge_in:
+                hedged = True
+                launch()
+            continue
+        for f in done:
+            pending.pop(f)
+            try:
+                content = f.result()
+                if content:
+                    return content
+            except LLMThrottled as e:
+                throttled.append(e.retry_after)
+            except LLMTimeout:
+                timed_out = True
+            except Exception:
+                pass
+        if not pending and queue:
+            launch()
+    if timed_out:
+        raise LLMTimeout("deadline exceeded")
+    if throttled:
+        raise LLMThrottled(min(throttled))
+    return None
+
+def _stream_opts(schema: Dict[str, Any], stream: Optional[bool], on_delta) -> Optional[_StreamOpts]:
+    if on_delta is None and not (_STREAM if stream is None else stream):
+        return None
+    return _StreamOpts(list(schema.get("required") or []), on_delta)
+
+def generate_structured(
+    schema: Dict[str, Any], system_prompt: str, user_prompt: str, use_cache: bool = True,
+    stream: Optional[bool] = None, on_delta=None, answers: int = 1,
+) -> Optional[Dict[str, Any]]:
     """
     Provider-agnostic structured JSON generator.
-    Returns dict on success, or None if provider/key is missing or call fails.
+    Returns dict on success, or None if no provider/key is configured or every
+    provider in the chain failed.
+    Raises LLMTimeout if no answer arrives within LLM_JSON_TIMEOUT (retries included),
+    LLMThrottled if no provider can be called now (shared rate limit full, or all
+    backed off / circuit-open); retry_after says when one can.
+    Successful results are cached (see llm_cache) keyed by schema/prompts/providers/models.
+    stream (default LLM_STREAM) reads the answer incrementally and returns once
+    the schema's required keys are complete; on_delta(partial dict) implies it
+    and is called from the calling thread or a hedge thread as text arrives
+    (not on a cache hit). answers is how many result objects the prompt asks for
+    (a packed prompt asks for several); it scales the rate limiter's output estimate.
     """
-    provider = os.getenv("LLM_PROVIDER", "").lower().strip()
-    if not provider:
+    chain = provider_chain()
+    if not chain:
         return None
 
+    key = None
+    if use_cache:
+        key = _cache_key(chain, schema, system_prompt, user_prompt)
+        hit = llm_cache.get(key)
+        if hit is not None:
+            return hit
+
     try:
-        if provider == "openai":
-            from openai import OpenAI
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-            t0 = time.time()
-            resp = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0,
-                response_format={"type": "json_object"},  # ask for strict JSON
-            )
-            if time.time() - t0 > _JSON_TIMEOUT_SECS:
-                raise LLMError("timeout")
-            content = resp.choices[0].message.content or ""
-            return _extract_json_block(content)
+        content = _failover(
+            chain, system_prompt, user_prompt, _JSON_TIMEOUT_SECS, _stream_opts(schema, stream, on_delta), answers
+        )
+    except (LLMTimeout, LLMThrottled):
+        raise
+    except Exception:
+        # Swallow errors for the take-home; caller will fallback
+        return None
+    data = _extract_json_block(content) if content else None
+    if data and key:
+        llm_cache.put(key, data)
+    return data
 
-        if provider == "openrouter":
-            import httpx
-            model = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini")
-            headers = {
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY','')}",
-                "Content-Type": "application/json",
-                # Optional; some models require a referer:
-                "HTTP-Referer": "https://github.com/jainam0037/traqcheck-takehome",
-                "X-Title": "TraqCheck Takehome",
-            }
-            payload = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "temperature": 0,
-                "response_format": {"type": "json_object"},
-            }
-            with httpx.Client(timeout=_JSON_TIMEOUT_SECS) as http:
-                r = http.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload)
-                r.raise_for_status()
-                data = r.json()
-            content = data["choices"][0]["message"]["content"]
-            return _extract_json_block(content)
-
-        if provider == "anthropic":
-            import anthropic
-            client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-            model = os.getenv("ANTHROPIC_MODEL", "claude-3-haiku-20240307")
-            msg = client.messages.create(
-                model=model,
-                max_tokens=1024,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
-                temperature=0,
-            )
-            # Concatenate text blocks
-            parts = []
-            for b in msg.content:
-                if getattr(b, "type", None) == "text":
-                    parts.append(b.text)
-                elif isinstance(b, dict) and b.get("type") == "text":
-                    parts.append(b.get("text", ""))
-            content = "\n".join(parts)
-            return _extract_json_block(content)
-
-        # Unknown provider
+_OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+def _openai_body(system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    return {
+        "model": _resolve_model("openai"),
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0,
+        "response_format": {"type": "json_object"},  # ask for strict JSON
+    }
+
+def _openai_structured(system_prompt: str, user_prompt: str, timeout: float) -> str:
+    resp = get_client("openai").chat.completions.create(**_openai_body(system_prompt, user_prompt), timeout=timeout)
+    return resp.choices[0].message.content or ""
+
+def _openrouter_request(system_prompt: str, user_prompt: str):
+    headers = {
+        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY','')}",
+        "Content-Type": "application/json",
+        # Optional; some models require a referer:
+        "HTTP-Referer": "https://github.com/jainam0037/traqcheck-takehome",
+        "X-Title": "TraqCheck Takehome",
+    }
+    payload = {
+        "model": _resolve_model("openrouter"),
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0,
+        "response_format": {"type": "json_object"},
+    }
+    return headers, payload
+
+def _openrouter_structured(system_prompt: str, user_prompt: str, timeout: float) -> str:
+    headers, payload = _openrouter_request(system_prompt, user_prompt)
+    r = _post(_OPENROUTER_URL, headers, payload, timeout)
+    return r.json()["choices"][0]["message"]["content"]
+
+def _anthropic_params(system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    return {
+        "model": _resolve_model("anthropic"),
+        "max_tokens": _MAX_OUTPUT_TOKENS,
+        "system": system_prompt,
+        "messages": [{"role": "user", "content": user_prompt}],
+        "temperature": 0,
+    }
+
+def _anthropic_structured(system_prompt: str, user_prompt: str, timeout: float) -> str:
+    msg = get_client("anthropic").messages.create(**_anthropic_params(system_prompt, user_prompt), timeout=timeout)
+    return _anthropic_text(msg)
+
+def _anthropic_text(msg) -> str:
+    # Concatenate text blocks
+    parts = []
+    for b in msg.content:
+        if getattr(b, "type", None) == "text":
+            parts.append(b.text)
+        elif isinstance(b, dict) and b.get("type") == "text":
+            parts.append(b.get("text", ""))
+    return "\n".join(parts)
+
+_STRUCTURED_CALLS = {
+    "openai": _openai_structured,
+    "openrouter": _openrouter_structured,
+    "anthropic": _anthropic_structured,
+}
+
+def _sse_content(data: str) -> Optional[str]:
+    """Text delta of one OpenAI-style SSE `data:` payload ("" for keep-alives, None at [DONE])."""
+    if data == "[DONE]":
+        return None
+    chunk = json.loads(data)
+    if chunk.get("error"):
+        raise LLMError(f"stream error: {chunk['error']}")
+    choices = chunk.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+def _sse_deltas(lines):
+    for line in lines:
+        if line.startswith("data:"):
+            delta = _sse_content(line[5:].strip())
+            if delta is None:
+                return
+            yield delta
+
+async def _asse_deltas(lines):
+    async for line in lines:
+        if line.startswith("data:"):
+            delta = _sse_content(line[5:].strip())
+            if delta is None:
+                return
+            yield delta
+
+def _openai_deltas(chunks):
+    for chunk in chunks:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content or ""
+
+async def _aopenai_deltas(chunks):
+    async for chunk in chunks:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content or ""
+
+def _openai_stream(system_prompt: str, user_prompt: str, sink: _StreamSink) -> str:
+    chunks = get_client("openai").chat.completions.create(
+        **_openai_body(system_prompt, user_prompt), stream=True, timeout=sink.timeout
+    )
+    with chunks:
+        return sink.consume(_openai_deltas(chunks))
+
+def _openrouter_stream(system_prompt: str, user_prompt: str, sink: _StreamSink) -> str:
+    headers, payload = _openrouter_request(system_prompt, user_prompt)
+    with get_client("http").stream(
+        "POST", _OPENROUTER_URL, headers=headers, json={**payload, "stream": True},
+        timeout=_httpx_timeout(sink.timeout),
+    ) as r:
+        r.raise_for_status()
+        return sink.consume(_sse_deltas(r.iter_lines()))
+
+def _anthropic_stream(system_prompt: str, user_prompt: str, sink: _StreamSink) -> str:
+    with get_client("anthropic").messages.stream(
+        **_anthropic_params(system_prompt, user_prompt), timeout=sink.timeout
+    ) as s:
+        return sink.consume(s.text_stream)
+
+_STREAM_CALLS = {
+    "openai": _openai_stream,
+    "openrouter": _openrouter_stream,
+    "anthropic": _anthropic_stream,
+}
+
+# -----------------------------------------------------------------------------
+# Structured JSON (offline batch APIs)
+# Providers that take a file of requests and answer within hours at a discount
+# (OpenAI Batch, Anthropic Message Batches). Submit returns a batch id; fetch
+# returns None while the batch is still running, then {custom_id: dict | None}
+# (None = that request failed or its output wasn't JSON; absent = not returned).
+# No cache and no deadline here: callers poll.
+# -----------------------------------------------------------------------------
+
+BATCH_PROVIDERS = ("openai", "anthropic")
+
+def _batch_provider() -> str:
+    """First provider of the chain that has a batch API."""
+    for provider in provider_chain():
+        if provider in BATCH_PROVIDERS:
+            return provider
+    raise LLMError(f"no offline batch API among providers {provider_chain()}")
+
+def submit_structured_batch(requests: "list[tuple[str, str, str]]") -> str:
+    """Submit (custom_id, system prompt, user prompt) requests; returns the provider's batch id."""
+    provider = _batch_provider()
+    if provider == "openai":
+        client = get_client("openai")
+        lines = [
+            json.dumps({
+                "custom_id": cid,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": _openai_body(system_prompt, user_prompt),
+            })
+            for cid, system_prompt, user_prompt in requests
+        ]
+        f = client.files.create(file=("requests.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        return client.batches.create(
+            input_file_id=f.id, endpoint="/v1/chat/completions", completion_window="24h"
+        ).id
+
+    batch = get_client("anthropic").beta.messages.batches.create(requests=[
+        {"custom_id": cid, "params": _anthropic_params(system_prompt, user_prompt)}
+        for cid, system_prompt, user_prompt in requests
+    ])
+    return batch.id
+
+def fetch_structured_batch(batch_id: str) -> Optional[Dict[str, Optional[Dict[str, Any]]]]:
+    """Results of a submitted batch, or None while it is still processing."""
+    provider = _batch_provider()
+    out: Dict[str, Optional[Dict[str, Any]]] = {}
+    if provider == "openai":
+        client = get_client("openai")
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+            return None
+        if batch.output_file_id:
+            for line in client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                try:
+                    content = row["response"]["body"]["choices"][0]["message"]["content"]
+                except (KeyError, IndexError, TypeError):
+                    content = None
+                out[row["custom_id"]] = _extract_json_block(content) if content else None
+        return out
+
+    batches = get_client("anthropic").beta.messages.batches
+    if batches.retrieve(batch_id).processing_status != "ended":
         return None
+    for entry in batches.results(batch_id):
+        ok = getattr(entry.result, "type", "") == "succeeded"
+        out[entry.custom_id] = _extract_json_block(_anthropic_text(entry.result.message)) if ok else None
+    return out
 
+# -----------------------------------------------------------------------------
+# Structured JSON (async)
+# -----------------------------------------------------------------------------
+
+async def _acall_provider(
+    provider: str, system_prompt: str, user_prompt: str, deadline: float, attempts: int,
+    stream: Optional[_StreamOpts] = None, answers: int = 1,
+) -> str:
+    if stream is None:
+        call = _ASYNC_STRUCTURED_CALLS[provider]
+    else:
+        stream_call = _ASYNC_STREAM_CALLS[provider]
+        call = lambda sp, up, t: stream_call(sp, up, _StreamSink(provider, stream, t))
+
+    async def attempt(t):
+        await asyncio.to_thread(_throttle, provider, system_prompt, user_prompt, answers)
+        return await call(system_prompt, user_prompt, t)
+
+    started = time.monotonic()
+    try:
+        content = await _awith_deadline(attempt, deadline - started, attempts)
+    except (asyncio.CancelledError, LLMThrottled):
+        if stream is not None:
+            stream.release(provider)
+        raise  # lost a hedge race, or our own limiter: not the provider's fault
     except Exception as e:
-        # Swallow errors for the take-home; caller will fallback
+        _record(provider, started, e)
+        if stream is not None:
+            stream.release(provider)
+        if isinstance(e, LLMRateLimited):
+            # Backed off now (llm_health); if no other provider answers, the caller requeues.
+            raise LLMThrottled(llm_health.get(provider).available_in()) from e
+        raise
+    _record(provider, started, None)
+    return content
+
+async def _afailover(
+    chain: List[str], system_prompt: str, user_prompt: str, budget: float, stream: Optional[_StreamOpts] = None,
+    answers: int = 1,
+) -> Optional[str]:
+    """Async _failover(); the losing request of a hedge is cancelled."""
+    deadline = time.monotonic() + budget
+    queue = llm_health.route(chain)
+    if not queue:
+        # Every provider is backed off or circuit-open: same as a full rate limit.
+        raise LLMThrottled(llm_health.next_available(chain))
+    attempts = 2 if len(chain) == 1 else 1
+    if len(queue) == 1:
+        return await _acall_provider(queue[0], system_prompt, user_prompt, deadline, attempts, stream, answers)
+
+    pending: Dict[asyncio.Task, str] = {}
+    timed_out = hedged = False
+    throttled: List[float] = []
+
+    def launch() -> None:
+        p = queue.pop(0)
+        pending[asyncio.ensure_future(
+            _acall_provider(p, system_prompt, user_prompt, deadline, attempts, stream, answers)
+        )] = p
+
+    launch()
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            hedge_in = None
+            if _HEDGE and not hedged and queue and len(pending) == 1:
+                hedge_in = llm_health.get(next(iter(pending.values()))).hedge_delay()
+            done, _ = await asyncio.wait(
+                list(pending), timeout=min(remaining, hedge_in or remaining), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                if hedge_in is not None and remaining > hedge_in:
+                    hedged = True
+                    launch()
+                continue
+            for t in done:
+                pending.pop(t)
+                try:
+                    content = t.result()
+                    if content:
+                        return content
+                except LLMThrottled as e:
+                    throttled.append(e.retry_after)
+                except LLMTimeout:
+                    timed_out = True
+                except Exception:
+                    pass
+            if not pending and queue:
+                launch()
+    finally:
+        for t in pending:
+            t.cancel()
+    if timed_out:
+        raise LLMTimeout("deadline exceeded")
+    if throttled:
+        raise LLMThrottled(min(throttled))
+    return None
+
+async def agenerate_structured(
+    schema: Dict[str, Any], system_prompt: str, user_prompt: str, use_cache: bool = True,
+    stream: Optional[bool] = None, on_delta=None, answers: int = 1,
+) -> Optional[Dict[str, Any]]:
+    """Async generate_structured(): same contract, chain, cache, deadline and streaming; many can run concurrently."""
+    chain = provider_chain()
+    if not chain:
         return None
 
+    key = None
+    if use_cache:
+        key = _cache_key(chain, schema, system_prompt, user_prompt)
+        hit = await asyncio.to_thread(llm_cache.get, key)
+        if hit is not None:
+            return hit
+
+    try:
+        content = await _afailover(
+            chain, system_prompt, user_prompt, _JSON_TIMEOUT_SECS, _stream_opts(schema, stream, on_delta), answers
+        )
+    except (LLMTimeout, LLMThrottled):
+        raise
+    except Exception:
+        return None
+    data = _extract_json_block(content) if content else None
+    if data and key:
+        await asyncio.to_thread(llm_cache.put, key, data)
+    return data
+
+async def _aopenai_structured(system_prompt: str, user_prompt: str, timeout: float) -> str:
+    resp = await get_async_client("openai").chat.completions.create(
+        **_openai_body(system_prompt, user_prompt), timeout=timeout
+    )
+    return resp.choices[0].message.content or ""
+
+async def _aopenrouter_structured(system_prompt: str, user_prompt: str, timeout: float) -> str:
+    headers, payload = _openrouter_request(system_prompt, user_prompt)
+    r = await get_async_client("http").post(
+        _OPENROUTER_URL, headers=headers, json=payload, timeout=_httpx_timeout(timeout)
+    )
+    r.raise_for_status()
+    return r.json()["choices"][0]["message"]["content"]
+
+async def _aanthropic_structured(system_prompt: str, user_prompt: str, timeout: float) -> str:
+    msg = await get_async_client("anthropic").messages.create(
+        **_anthropic_params(system_prompt, user_prompt), timeout=timeout
+    )
+    return _anthropic_text(msg)
+
+_ASYNC_STRUCTURED_CALLS = {
+    "openai": _aopenai_structured,
+    "openrouter": _aopenrouter_structured,
+    "anthropic": _aanthropic_structured,
+}
+
+async def _aopenai_stream(system_prompt: str, user_prompt: str, sink: _StreamSink) -> str:
+    chunks = await get_async_client("openai").chat.completions.create(
+        **_openai_body(system_prompt, user_prompt), stream=True, timeout=sink.timeout
+    )
+    async with chunks:
+        return await sink.aconsume(_aopenai_deltas(chunks))
+
+async def _aopenrouter_stream(system_prompt: str, user_prompt: str, sink: _StreamSink) -> str:
+    headers, payload = _openrouter_request(system_prompt, user_prompt)
+    async with get_async_client("http").stream(
+        "POST", _OPENROUTER_URL, headers=headers, json={**payload, "stream": True},
+        timeout=_httpx_timeout(sink.timeout),
+    ) as r:
+        r.raise_for_status()
+        return await sink.aconsume(_asse_deltas(r.aiter_lines()))
+
+async def _aanthropic_stream(system_prompt: str, user_prompt: str, sink: _StreamSink) -> str:
+    async with get_async_client("anthropic").messages.stream(
+        **_anthropic_params(system_prompt, user_prompt), timeout=sink.timeout
+    ) as s:
+        return await sink.aconsume(s.text_stream)
+
+_ASYNC_STREAM_CALLS = {
+    "openai": _aopenai_stream,
+    "openrouter": _aopenrouter_stream,
+    "anthropic": _aanthropic_stream,
+}
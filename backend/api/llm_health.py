@@ -0,0 +1,143 @@
+"""
+llm_health.py
+Per-process health of each LLM provider, used by llm_client to route requests.
+
+For every provider we keep:
+- EWMA of latency and of error rate (LLM_HEALTH_ALPHA), plus recent latencies
+  for a p95 that sets the hedge delay;
+- 429 backoff: skip the provider until Retry-After (or an exponential delay,
+  capped at LLM_BACKOFF_MAX_SECS) has passed;
+- a circuit breaker: after LLM_BREAKER_FAILURES consecutive failures the
+  provider is skipped for LLM_BREAKER_COOLDOWN seconds, then tried again
+  (one more failure re-opens it, a success closes it).
+
+route() keeps the configured order, except that a degraded provider (error
+EWMA above LLM_DEGRADED_ERROR_RATE, or latency EWMA more than
+LLM_DEGRADED_LATENCY_FACTOR times the fastest in the chain) moves behind the
+healthy ones. Every time-dependent method takes an optional `now`
+(time.monotonic() by default).
+
+State lives in the process (each worker learns from its own calls), so a bad
+provider is dropped after a handful of requests without any shared store.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+_ALPHA = float(os.getenv("LLM_HEALTH_ALPHA", "0.2"))
+_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+_BACKOFF_MAX_SECS = float(os.getenv("LLM_BACKOFF_MAX_SECS", "60"))
+_HEDGE_MIN_SECS = float(os.getenv("LLM_HEDGE_MIN_SECS", "1.0"))
+_HEDGE_DEFAULT_SECS = float(os.getenv("LLM_HEDGE_DEFAULT_SECS", "4.0"))  # until there are enough samples
+_DEGRADED_ERROR_RATE = float(os.getenv("LLM_DEGRADED_ERROR_RATE", "0.5"))
+_DEGRADED_LATENCY_FACTOR = float(os.getenv("LLM_DEGRADED_LATENCY_FACTOR", "3"))
+_P95_MIN_SAMPLES = 10
+
+
+class ProviderHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.latencies: deque = deque(maxlen=200)
+        self.failures = 0
+        self.open_until = 0.0
+        self.backoff_until = 0.0
+        self.backoff_secs = 0.0
+        self._lock = threading.Lock()
+
+    def available(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return now >= self.backoff_until and now >= self.open_until
+
+    def available_in(self, now: Optional[float] = None) -> float:
+        """Seconds until available() turns true (0 if it already is)."""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.backoff_until - now, self.open_until - now)
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.latency_ewma = latency if self.latency_ewma is None else (
+                _ALPHA * latency + (1 - _ALPHA) * self.latency_ewma
+            )
+            self.error_ewma *= 1 - _ALPHA
+            self.latencies.append(latency)
+            self.failures = 0
+            self.backoff_secs = 0.0
+            self.open_until = 0.0
+
+    def record_failure(
+        self, rate_limited: bool = False, retry_after: Optional[float] = None, now: Optional[float] = None
+    ) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.error_ewma = _ALPHA + (1 - _ALPHA) * self.error_ewma
+            self.failures += 1
+            if rate_limited:
+                self.backoff_secs = retry_after if retry_after else min(max(1.0, 2 * self.backoff_secs), _BACKOFF_MAX_SECS)
+                self.backoff_until = now + self.backoff_secs
+            if self.failures >= _BREAKER_FAILURES:
+                self.open_until = now + _BREAKER_COOLDOWN
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < _P95_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def hedge_delay(self) -> float:
+        """How long to wait on this provider before also asking the next one."""
+        p95 = self.p95()
+        return max(_HEDGE_MIN_SECS, p95 if p95 is not None else _HEDGE_DEFAULT_SECS)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, object]:
+        now = time.monotonic() if now is None else now
+        return {
+            "available": self.available(now),
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "latency_p95": round(self.p95(), 3) if self.p95() is not None else None,
+            "error_rate": round(self.error_ewma, 3),
+            "consecutive_failures": self.failures,
+            "circuit_open_secs": round(max(0.0, self.open_until - now), 1),
+            "backoff_secs": round(max(0.0, self.backoff_until - now), 1),
+        }
+
+
+_registry: Dict[str, ProviderHealth] = {}
+_registry_lock = threading.Lock()
+
+
+def get(provider: str) -> ProviderHealth:
+    h = _registry.get(provider)
+    if h is None:
+        with _registry_lock:
+            h = _registry.setdefault(provider, ProviderHealth(provider))
+    return h
+
+
+def route(chain: List[str], now: Optional[float] = None) -> List[str]:
+    """Providers of the chain that may be called now: healthy ones in configured order, then degraded ones."""
+    now = time.monotonic() if now is None else now
+    ready = [get(p) for p in chain if get(p).available(now)]
+    known = [h.latency_ewma for h in ready if h.latency_ewma is not None]
+    fastest = min(known) if known else None
+
+    def degraded(h: ProviderHealth) -> bool:
+        slow = fastest is not None and h.latency_ewma is not None and h.latency_ewma > _DEGRADED_LATENCY_FACTOR * fastest
+        return slow or h.error_ewma > _DEGRADED_ERROR_RATE
+
+    return [h.name for h in sorted(ready, key=degraded)]  # stable: configured order within each group
+
+
+def next_available(chain: List[str], now: Optional[float] = None) -> float:
+    """Seconds until the first provider of the chain may be called again."""
+    now = time.monotonic() if now is None else now
+    return min((get(p).available_in(now) for p in chain), default=0.0)
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    return {name: h.snapshot() for name, h in list(_registry.items())}
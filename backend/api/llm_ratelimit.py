@@ -0,0 +1,88 @@
+"""
+llm_ratelimit.py
+Client-side request/token limits per LLM provider, shared by every process
+through Redis, checked before each provider call (see llm_client).
+
+Two token buckets per provider, refilled continuously:
+- requests: LLM_RPM_<PROVIDER> (else LLM_RPM) per minute,
+- tokens:   LLM_TPM_<PROVIDER> (else LLM_TPM) per minute, charged with an
+  estimate of prompt + completion tokens.
+0 (the default) means no limit. Both buckets are checked and charged in one
+Lua script, so concurrent workers can't overdraw them; Redis' own clock is used
+so worker clock skew doesn't matter.
+
+acquire() never sleeps: it returns 0 when the call may go ahead, else how many
+seconds until it could. Callers turn that into a task countdown rather than
+holding a worker slot. A Redis failure lets the call through
+(redis_client.fail_open).
+"""
+
+import os
+
+from .redis_client import fail_open, get as _redis
+
+_PREFIX = "llmrl:"
+
+# KEYS: request bucket, token bucket. ARGV: rpm, tpm, token cost.
+# Returns "0" (charged) or the wait in seconds (nothing charged), as a string
+# because Redis truncates Lua numbers to integers.
+_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+local rpm, tpm, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+
+local function level(key, cap)
+  local v = redis.call('HMGET', key, 'level', 'ts')
+  local lvl, ts = tonumber(v[1]), tonumber(v[2])
+  if lvl == nil then return cap end
+  return math.min(cap, lvl + (now - ts) * cap / 60)
+end
+
+local wait, req, tok = 0, 0, 0
+if rpm > 0 then
+  req = level(KEYS[1], rpm)
+  if req < 1 then wait = math.max(wait, (1 - req) * 60 / rpm) end
+end
+if tpm > 0 then
+  cost = math.min(cost, tpm)
+  tok = level(KEYS[2], tpm)
+  if tok < cost then wait = math.max(wait, (cost - tok) * 60 / tpm) end
+end
+if wait > 0 then return tostring(wait) end
+
+if rpm > 0 then
+  redis.call('HSET', KEYS[1], 'level', req - 1, 'ts', now)
+  redis.call('EXPIRE', KEYS[1], 120)
+end
+if tpm > 0 then
+  redis.call('HSET', KEYS[2], 'level', tok - cost, 'ts', now)
+  redis.call('EXPIRE', KEYS[2], 120)
+end
+return "0"
+"""
+
+_script = None
+
+
+def limits(provider: str):
+    """(requests/min, tokens/min) for provider; 0 = unlimited."""
+    p = provider.upper()
+    rpm = int(os.getenv(f"LLM_RPM_{p}") or os.getenv("LLM_RPM", "0"))
+    tpm = int(os.getenv(f"LLM_TPM_{p}") or os.getenv("LLM_TPM", "0"))
+    return rpm, tpm
+
+
+def acquire(provider: str, tokens: int) -> float:
+    """Charge one request and `tokens` tokens to provider's buckets; 0.0 if allowed, else seconds to wait."""
+    rpm, tpm = limits(provider)
+    if rpm <= 0 and tpm <= 0:
+        return 0.0
+    return _charge(provider, rpm, tpm, max(0, int(tokens)))
+
+
+@fail_open(0.0)
+def _charge(provider: str, rpm: int, tpm: int, tokens: int) -> float:
+    global _script
+    if _script is None:
+        _script = _redis().register_script(_ACQUIRE_LUA)
+    return float(_script(keys=[f"{_PREFIX}{provider}:req", f"{_PREFIX}{provider}:tok"], args=[rpm, tpm, tokens]))
@@ -0,0 +1,93 @@
+"""
+backfill_rule_fields
+Re-run deterministic_extract over the stored raw_text of every candidate's
+latest done Extraction and fill blank Candidate fields (name, email, phone,
+company, designation, skills) from it. Values that are already set are kept,
+same as update_candidate().
+
+Texts are streamed from the DB in chunks, extracted column-wise on a process
+pool (deterministic_extract_batch) and written back with bulk_update.
+
+    python manage.py backfill_rule_fields --chunk-size 2000 --workers 4
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from api.models import Candidate, Extraction
+from api.parsing import deterministic_extract_batch
+from api.skills import get_matcher
+
+_FIELDS = ("name", "email", "phone", "company", "designation")
+
+
+class Command(BaseCommand):
+    help = "Fill blank candidate fields from stored resume text using the deterministic extractor."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="rows fetched and written per round trip")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="extraction processes")
+        parser.add_argument("--dry-run", action="store_true", help="count changes without writing")
+
+    def handle(self, *args, chunk_size, workers, dry_run, **opts):
+        get_matcher()  # load the taxonomy once before the pool forks
+        latest = Extraction.objects.filter(candidate=OuterRef("candidate")).order_by("-created_at").values("id")[:1]
+        qs = (
+            Extraction.objects.filter(status="done", id=Subquery(latest))
+            .select_related("candidate")
+            .only("id", "raw_text", *(f"candidate__{f}" for f in (*_FIELDS, "skills")))
+        )
+
+        t0 = time.time()
+        scanned = updated = 0
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            batch = []
+            for ext in qs.iterator(chunk_size=chunk_size):
+                batch.append(ext)
+                if len(batch) >= chunk_size:
+                    updated += self._apply(batch, workers, pool, dry_run)
+                    scanned += len(batch)
+                    batch = []
+            if batch:
+                updated += self._apply(batch, workers, pool, dry_run)
+                scanned += len(batch)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(
+            f"scanned={scanned} updated={updated} dry_run={dry_run} "
+            f"rate={scanned / max(time.time() - t0, 1e-6):.0f}/s"
+        )
+
+    def _apply(self, batch, workers, pool, dry_run) -> int:
+        cols = deterministic_extract_batch(
+            (e.raw_text for e in batch),
+            chunk_size=max(1, -(-len(batch) // max(workers, 1))),
+            pool=pool,
+        )
+        names = cols["skill_names"]
+        now = timezone.now()
+        dirty = []
+        for i, ext in enumerate(batch):
+            cand = ext.candidate
+            changed = False
+            for f in _FIELDS:
+                if not getattr(cand, f) and cols[f][i]:
+                    setattr(cand, f, cols[f][i])
+                    changed = True
+            if not cand.skills and cols["skills"][i]:
+                cand.skills = [s for j, s in enumerate(names) if cols["skills"][i] >> j & 1]
+                changed = True
+            if changed:
+                cand.updated_at = now
+                dirty.append(cand)
+        if dirty and not dry_run:
+            Candidate.objects.bulk_update(dirty, [*_FIELDS, "skills", "updated_at"])
+        return len(dirty)
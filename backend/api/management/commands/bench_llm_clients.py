@@ -0,0 +1,77 @@
+"""
+bench_llm_clients
+Per-call latency of the pooled LLM HTTP client (llm_client.get_client) against
+a fresh client per call, using a local stub server that answers like a chat
+completions endpoint. No provider or API key is needed. Plain local HTTP, so
+the gap is a lower bound: real providers add DNS and a TLS handshake per new
+connection.
+
+    python manage.py bench_llm_clients --calls 300
+"""
+
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from api import llm_client
+
+_BODY = json.dumps({"choices": [{"message": {"content": "{}"}}]}).encode()
+
+
+class _Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real providers
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024  # headers + body in one write (else delayed ACKs dominate)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length") or 0))
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(_BODY)))
+        self.end_headers()
+        self.wfile.write(_BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark pooled vs per-call HTTP clients for LLM requests against a local stub."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=200)
+
+    def handle(self, *args, calls, **opts):
+        import httpx
+
+        srv = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{srv.server_port}/v1/chat/completions"
+        payload = {"messages": [{"role": "user", "content": "x"}]}
+
+        def fresh():
+            with httpx.Client(timeout=5) as client:
+                client.post(url, json=payload).raise_for_status()
+
+        def pooled():
+            llm_client._post(url, {}, payload, 5)
+
+        try:
+            for label, call in (("fresh client per call", fresh), ("pooled client", pooled)):
+                call()  # warm-up (imports, first connection)
+                samples = []
+                for _ in range(calls):
+                    t0 = time.perf_counter()
+                    call()
+                    samples.append((time.perf_counter() - t0) * 1000)
+                samples.sort()
+                self.stdout.write(
+                    f"{label}: mean={statistics.mean(samples):.2f}ms "
+                    f"p50={samples[len(samples) // 2]:.2f}ms p95={samples[int(0.95 * (len(samples) - 1))]:.2f}ms"
+                )
+        finally:
+            srv.shutdown()
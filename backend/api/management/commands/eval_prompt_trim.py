@@ -0,0 +1,98 @@
+"""
+eval_prompt_trim
+Offline comparison of the full-text LLM prompt against the section-trimmed one
+(trim_for_llm) over a folder of resumes.
+
+Always reports estimated prompt tokens per file, full vs trimmed. With an LLM
+configured (LLM_PROVIDER(S) + key) it also extracts each resume both ways, with the
+cache off, and reports per-field agreement of the trimmed result with the
+full-text result; --truth adds accuracy against a hand-labelled JSON file
+{"<file name>": {"name": "...", "email": "...", ...}}.
+
+    python manage.py eval_prompt_trim "../resumes for testing" --budget 1500
+"""
+
+import json
+import os
+
+from django.core.management.base import BaseCommand
+
+from api.llm_client import generate_structured, provider_chain
+from api.parsing import (
+    _EXTRACT_SCHEMA, _SYSTEM_PROMPT, _llm_user_prompt, _to_extracted,
+    deterministic_extract, estimate_tokens, extract_text, trim_for_llm,
+)
+from api.utils_text import canonical_phone
+
+_FIELDS = ("name", "email", "phone", "company", "designation")
+
+
+def _norm(field, value):
+    value = str(value or "")
+    return canonical_phone(value) if field == "phone" else " ".join(value.lower().split())
+
+
+class Command(BaseCommand):
+    help = "Compare prompt size and extraction accuracy of trimmed vs full-text LLM prompts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("folder")
+        parser.add_argument("--budget", type=int, default=None, help="token budget (default: configured one)")
+        parser.add_argument("--truth", help="JSON file of expected fields per file name")
+        parser.add_argument("--no-llm", action="store_true", help="prompt sizes only")
+
+    def handle(self, *args, folder, budget, truth, no_llm, **opts):
+        expected = json.load(open(truth, encoding="utf-8")) if truth else {}
+        use_llm = not no_llm and bool(provider_chain())
+        files = sorted(f for f in os.listdir(folder) if f.lower().endswith((".pdf", ".docx")))
+
+        totals = {"full": 0, "trimmed": 0}
+        agree = {f: 0 for f in _FIELDS}
+        correct = {"full": {f: 0 for f in _FIELDS}, "trimmed": {f: 0 for f in _FIELDS}}
+        compared = labelled = 0
+
+        for name in files:
+            text = extract_text(os.path.join(folder, name))
+            hints = deterministic_extract(text)
+            prompts = {
+                "full": _llm_user_prompt(text, hints),
+                "trimmed": _llm_user_prompt(trim_for_llm(text, budget), hints),
+            }
+            sizes = {k: estimate_tokens(p) for k, p in prompts.items()}
+            for k in totals:
+                totals[k] += sizes[k]
+            self.stdout.write(f"{name}: full={sizes['full']} trimmed={sizes['trimmed']} tokens")
+
+            if not use_llm:
+                continue
+            out = {
+                k: _to_extracted(generate_structured(_EXTRACT_SCHEMA, _SYSTEM_PROMPT, p, use_cache=False)).model_dump()
+                for k, p in prompts.items()
+            }
+            compared += 1
+            diffs = []
+            for f in _FIELDS:
+                if _norm(f, out["full"][f]) == _norm(f, out["trimmed"][f]):
+                    agree[f] += 1
+                else:
+                    diffs.append(f"{f}: {out['full'][f]!r} vs {out['trimmed'][f]!r}")
+            if diffs:
+                self.stdout.write("  differs: " + "; ".join(diffs))
+            if name in expected:
+                labelled += 1
+                for k in correct:
+                    for f in _FIELDS:
+                        correct[k][f] += _norm(f, out[k][f]) == _norm(f, expected[name].get(f))
+
+        if files:
+            saved = 1 - totals["trimmed"] / max(totals["full"], 1)
+            self.stdout.write(f"total: full={totals['full']} trimmed={totals['trimmed']} tokens ({saved:.0%} smaller)")
+        if compared:
+            self.stdout.write("agreement with full-text result: " + ", ".join(
+                f"{f}={agree[f] / compared:.0%}" for f in _FIELDS
+            ))
+        if labelled:
+            for k in correct:
+                self.stdout.write(f"accuracy ({k}): " + ", ".join(
+                    f"{f}={correct[k][f] / labelled:.0%}" for f in _FIELDS
+                ))
@@ -0,0 +1,149 @@
+"""
+reparse_all
+Bulk version of POST /candidates/<id>/reparse.
+
+Selects candidates that have a resume, optionally filtered by the status of
+their latest Extraction, creation date and missing fields; streams them from
+the DB (server-side cursor on Postgres) in id order, and per chunk:
+  - bulk_creates the queued Extraction and AuditLog("reparse") rows,
+  - enqueues parse_resume_batch_task per --task-size candidates, paced so
+    enqueueing never exceeds --rate candidates/second,
+  - then writes a checkpoint (last candidate id), so an interrupted run picks up
+    where it stopped when started again with the same filters.
+With --offline, llm_offline_batch_task is enqueued instead: the LLM calls go
+through the provider's batch API (cheaper; results arrive within its batch
+window, not right away).
+
+    python manage.py reparse_all --status error
+    python manage.py reparse_all --created-before 2024-06-01 --missing email --missing phone --rate 2
+    python manage.py reparse_all --offline --task-size 500 --rate 0
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from api.models import AuditLog, Candidate, Extraction, Resume
+from api.tasks import llm_offline_batch_task, parse_resume_batch_task
+
+_MISSING = ("name", "email", "phone", "company", "designation", "skills")
+
+
+class Command(BaseCommand):
+    help = "Queue a reparse of many candidates, throttled and resumable."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", choices=("queued", "done", "error"), help="latest extraction status")
+        parser.add_argument("--created-before", help="candidate created before this date/datetime (ISO)")
+        parser.add_argument("--missing", action="append", choices=_MISSING, default=[],
+                            help="field is empty (repeatable; any of them)")
+        parser.add_argument("--chunk-size", type=int, default=500, help="candidates read and written per round trip")
+        parser.add_argument("--task-size", type=int, default=25, help="candidates per batch task")
+        parser.add_argument("--offline", action="store_true",
+                            help="use the provider batch API (llm_offline_batch_task) instead of online calls")
+        parser.add_argument("--rate", type=float, default=5.0, help="max candidates enqueued per second (0 = no limit)")
+        parser.add_argument("--checkpoint", default=os.path.join(settings.DOCS_DIR, ".reparse_all.json"))
+        parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+        parser.add_argument("--dry-run", action="store_true", help="count matching candidates only")
+
+    def handle(self, *args, **opts):
+        qs = self._queryset(opts)
+        if opts["dry_run"]:
+            self.stdout.write(f"matching={qs.count()}")
+            return
+
+        filters = {k: opts[k] for k in ("status", "created_before", "missing")}
+        key = hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()[:12]
+        state = {"filters_key": key, "filters": filters, "last_id": None, "queued": 0}
+        saved = self._load(opts["checkpoint"])
+        if saved and not opts["restart"]:
+            if saved.get("filters_key") != key:
+                raise CommandError(
+                    f"checkpoint {opts['checkpoint']} is for other filters {saved.get('filters')}; "
+                    "use --restart or --checkpoint"
+                )
+            state = saved
+            self.stdout.write(f"resuming after {state['last_id']} ({state['queued']} already queued)")
+        if state["last_id"]:
+            qs = qs.filter(id__gt=state["last_id"])
+
+        chunk = []
+        for cid in qs.values_list("id", flat=True).iterator(chunk_size=opts["chunk_size"]):
+            chunk.append(cid)
+            if len(chunk) >= opts["chunk_size"]:
+                self._enqueue(chunk, state, opts)
+                chunk = []
+        if chunk:
+            self._enqueue(chunk, state, opts)
+
+        state["finished"] = True
+        self._save(opts["checkpoint"], state)
+        self.stdout.write(f"queued={state['queued']}")
+
+    def _queryset(self, opts):
+        qs = Candidate.objects.filter(Exists(Resume.objects.filter(candidate=OuterRef("pk"))))
+        if opts["status"]:
+            qs = qs.with_latest_extraction_status().filter(latest_extraction_status=opts["status"])
+        if opts["created_before"]:
+            raw = opts["created_before"]
+            when = parse_datetime(raw)
+            if when is None:
+                day = parse_date(raw)
+                if day is None:
+                    raise CommandError(f"--created-before: not an ISO date/datetime: {raw}")
+                when = datetime.combine(day, datetime.min.time())
+            if timezone.is_naive(when):
+                when = timezone.make_aware(when)
+            qs = qs.filter(created_at__lt=when)
+        if opts["missing"]:
+            cond = Q()
+            for f in opts["missing"]:
+                cond |= Q(skills=[]) if f == "skills" else Q(**{f: ""})
+            qs = qs.filter(cond)
+        return qs.order_by("id")
+
+    def _enqueue(self, ids, state, opts):
+        Extraction.objects.bulk_create([Extraction(candidate_id=cid, status="queued") for cid in ids])
+        AuditLog.objects.bulk_create([
+            AuditLog(actor="reparse_all", action="reparse", candidate_id=cid, metadata_json={"filters": state["filters"]})
+            for cid in ids
+        ])
+        strs = [str(cid) for cid in ids]
+        size = opts["task_size"]
+        task = llm_offline_batch_task if opts["offline"] else parse_resume_batch_task
+        # One task at a time, spaced out to --rate, so the queue fills evenly instead of in bursts.
+        for i in range(0, len(strs), size):
+            t0 = time.monotonic()
+            part = strs[i : i + size]
+            task.delay(part)
+            if opts["rate"] > 0:
+                time.sleep(max(0.0, len(part) / opts["rate"] - (time.monotonic() - t0)))
+
+        state["last_id"] = strs[-1]
+        state["queued"] += len(ids)
+        self._save(opts["checkpoint"], state)
+        self.stdout.write(f"queued={state['queued']} last_id={state['last_id']}")
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        return None if state.get("finished") else state
+
+    @staticmethod
+    def _save(path, state):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
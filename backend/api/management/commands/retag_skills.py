@@ -0,0 +1,38 @@
+"""
+retag_skills
+Re-tag every candidate's skills with the current taxonomy (SKILL_TAXONOMY_PATH),
+e.g. after editing skills.json. Runs retag_skills_task in this process, or
+enqueues it on the parse-cpu queue with --queue.
+
+    python manage.py retag_skills --dry-run
+    python manage.py retag_skills --queue
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.tasks import retag_skills_task
+
+
+class Command(BaseCommand):
+    help = "Recompute candidate skills from stored resume text with the current skill taxonomy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queue", action="store_true", help="enqueue retag_skills_task instead of running here")
+        parser.add_argument("--dry-run", action="store_true", help="count changes without writing")
+
+    def handle(self, *args, queue, dry_run, **opts):
+        if queue:
+            if dry_run:
+                raise CommandError("--dry-run runs here; drop --queue")
+            res = retag_skills_task.delay()
+            self.stdout.write(f"queued task_id={res.id}")
+            return
+
+        t0 = time.time()
+        out = retag_skills_task(dry_run=dry_run)
+        self.stdout.write(
+            f"taxonomy_version={out['taxonomy_version']} scanned={out['scanned']} updated={out['updated']} "
+            f"dry_run={dry_run} dt={time.time() - t0:.1f}s"
+        )
@@ -0,0 +1,21 @@
+"""
+metrics.py
+Cluster-wide counters kept in Redis (one hash), so every worker process adds
+to the same numbers. Exposed by GET /metrics. Fails open (redis_client).
+"""
+
+from typing import Dict
+
+from .redis_client import fail_open, get as _redis
+
+_KEY = "metrics:counters"
+
+
+@fail_open()
+def incr(name: str, n: int = 1) -> None:
+    _redis().hincrby(_KEY, name, n)
+
+
+@fail_open({})
+def counters() -> Dict[str, int]:
+    return {k.decode(): int(v) for k, v in _redis().hgetall(_KEY).items()}
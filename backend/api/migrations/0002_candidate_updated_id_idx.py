@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['updated_at', 'id'], name='candidate_updated_id_idx'),
+        ),
+    ]
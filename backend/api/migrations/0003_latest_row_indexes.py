@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_candidate_updated_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['candidate', 'ts'], name='auditlog_cand_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['candidate', 'uploaded_at'], name='document_cand_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentrequest',
+            index=models.Index(fields=['candidate', '-created_at'], name='docreq_cand_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='extraction',
+            index=models.Index(fields=['candidate', '-created_at'], name='extraction_cand_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resume',
+            index=models.Index(fields=['candidate', '-created_at'], name='resume_cand_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_latest_row_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resume',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
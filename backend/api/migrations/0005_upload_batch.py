@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:43
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_resume_sha256_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumes', to='api.uploadbatch'),
+        ),
+    ]
@@ -1,5 +1,18 @@
 import uuid
 from django.db import models
+from django.db.models import OuterRef, Subquery
+
+
+class CandidateQuerySet(models.QuerySet):
+    def with_latest_extraction_status(self):
+        """Annotate each row with its newest Extraction.status in the same query."""
+        latest = (
+            Extraction.objects.filter(candidate=OuterRef("pk"))
+            .order_by("-created_at")
+            .values("status")[:1]
+        )
+        return self.annotate(latest_extraction_status=Subquery(latest))
+
 
 class Candidate(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -12,14 +25,31 @@ class Candidate(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CandidateQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination for GET /candidates walks (updated_at, id) descending.
+            models.Index(fields=["updated_at", "id"], name="candidate_updated_id_idx"),
+        ]
+
+class UploadBatch(models.Model):
+    """One POST /candidates/bulk-upload; Resume.batch points back here for progress polling."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
 class Resume(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name="resumes")
     file_path = models.TextField()          # absolute path on the mounted volume
     mime = models.CharField(max_length=100, blank=True, default="")
-    sha256 = models.CharField(max_length=64, blank=True, default="")
+    sha256 = models.CharField(max_length=64, blank=True, default="", db_index=True)  # dedup lookup on upload
+    batch = models.ForeignKey(UploadBatch, on_delete=models.SET_NULL, related_name="resumes", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["candidate", "-created_at"], name="resume_cand_created_idx")]
+
 class Extraction(models.Model):
     STATUS = (("queued","queued"),("done","done"),("error","error"))
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -32,6 +62,9 @@ class Extraction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["candidate", "-created_at"], name="extraction_cand_created_idx")]
+
 class DocumentRequest(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name="document_requests")
@@ -39,6 +72,9 @@ class DocumentRequest(models.Model):
     payload_json = models.JSONField(default=dict)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["candidate", "-created_at"], name="docreq_cand_created_idx")]
+
 class Document(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name="documents")
@@ -47,6 +83,9 @@ class Document(models.Model):
     verified = models.BooleanField(default=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["candidate", "uploaded_at"], name="document_cand_uploaded_idx")]
+
 class AuditLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     actor = models.CharField(max_length=100, default="system")
@@ -54,3 +93,6 @@ class AuditLog(models.Model):
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name="audit_logs", null=True, blank=True)
     metadata_json = models.JSONField(default=dict, blank=True)
     ts = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["candidate", "ts"], name="auditlog_cand_ts_idx")]
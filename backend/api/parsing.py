@@ -3,159 +3,423 @@ parsing.py
 End-to-end resume parsing helpers:
 - extract_text(): PDF/DOCX to plain text
 - deterministic_extract(): regex/heuristics (email/phone/skills/role/company)
-- llm_extract(): optional JSON from LLM
+- llm_extract(): optional JSON from LLM (llm_extract_many(): concurrent async batch,
+  optionally several resumes per request),
+  skipped or narrowed to the missing fields when the rule result is confident
 - merge_results(): combine rule-based + LLM with confidences
 - update_candidate(): write extracted fields back to Candidate
 """
 
 from __future__ import annotations
+import asyncio
+import logging
+import multiprocessing
 import os
 import re
-from typing import Dict, Tuple, List
+import time
+from collections import deque
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Dict, Iterable, Iterator, Tuple, List
 
 from django.conf import settings
 
 from .utils_text import normalize_space, truncate, canonical_phone, clamp01
 from .schemas import Extracted, Confidence
-from .llm_client import generate_structured
+from .storage import open_blob
+from .skills import get_matcher
+from .llm_client import (
+    generate_structured, agenerate_structured, aclose_clients, provider_chain, LLMThrottled, LLMTimeout,
+)
+from . import metrics
+
+log = logging.getLogger(__name__)
 
 # -----------------------------------------------------------------------------
 # Text extraction
 # -----------------------------------------------------------------------------
 
-def _extract_pdf(path: str) -> str:
-    """Try PyPDF (pypdf) first, then fall back to pdfminer.six."""
-    text = ""
-    try:
-        import pypdf  # type: ignore
-        with open(path, "rb") as f:
-            pdf = pypdf.PdfReader(f)
-            pages = [page.extract_text() or "" for page in pdf.pages]
-        text = "\n".join(pages)
-    except Exception:
-        text = ""
+_PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+_PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+_PDF_PAGE_BUDGET_SECS = float(os.getenv("PDF_PAGE_BUDGET_SECS", "2"))
+_PDF_CHUNK_PAGES = 4  # pages per pool task; small so early exit wastes little work
 
-    if text and len(text.strip()) >= 50:
-        return text
+_pdf_pool = None
+_pdf_pool_pid = None
 
+def _get_pdf_pool():
+    """Bounded process pool for page extraction, created lazily once per process."""
+    global _pdf_pool, _pdf_pool_pid
+    if _pdf_pool is None or _pdf_pool_pid != os.getpid():
+        from concurrent.futures import ProcessPoolExecutor
+        _pdf_pool = ProcessPoolExecutor(max_workers=_PDF_WORKERS)
+        _pdf_pool_pid = os.getpid()
+    return _pdf_pool
+
+def _drop_pdf_pool() -> None:
+    """
+    Shut this process's page pool down without waiting: queued ranges are
+    cancelled and the worker processes terminated, since a range that is
+    already running can't be cancelled any other way. The next use starts a
+    fresh pool.
+    """
+    global _pdf_pool, _pdf_pool_pid
+    pool, _pdf_pool, owner, _pdf_pool_pid = _pdf_pool, None, _pdf_pool_pid, None
+    if pool is None or owner != os.getpid():
+        return
+    procs = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proc in procs:
+        try:
+            proc.terminate()
+        except Exception:
+            pass
+
+def _pdfminer_pages(src, pages: List[int]) -> List[str]:
+    """pdfminer text for the given 0-based pages of src (path or open blob); "" each on failure."""
     try:
         from pdfminer.high_level import extract_text as pm_extract  # type: ignore
-        text2 = pm_extract(path) or ""
-        if len(text2.strip()) > len(text.strip()):
-            return text2
+        # pdfminer ends every page with a form feed, so one call splits back per page.
+        texts = (pm_extract(src, page_numbers=pages) or "").split("\f")
+        return [texts[k] if k < len(texts) else "" for k in range(len(pages))]
     except Exception:
-        pass
+        return ["" for _ in pages]
+
+def _pdf_pages_text(path: str, pages: List[int]) -> List[str]:
+    """
+    Text of the given 0-based pages: pypdf per page, then one pdfminer pass over
+    only the pages pypdf returned empty (scanned headers, odd encodings).
+    """
+    out = ["" for _ in pages]
+    with open_blob(path) as blob:
+        try:
+            import pypdf  # type: ignore
+            pdf = pypdf.PdfReader(blob)
+            for k, i in enumerate(pages):
+                try:
+                    out[k] = pdf.pages[i].extract_text() or ""
+                except Exception:
+                    pass
+        except Exception:
+            pass
+
+        empty = [k for k, t in enumerate(out) if not t.strip()]
+        if empty:
+            for k, t in zip(empty, _pdfminer_pages(blob, [pages[k] for k in empty])):
+                out[k] = t
+    return out
+
+def _iter_pdf_pages_serial(pdf, blob, n: int) -> Iterator[str]:
+    for i in range(n):
+        try:
+            text = pdf.pages[i].extract_text() or ""
+        except Exception:
+            text = ""
+        yield text if text.strip() else _pdfminer_pages(blob, [i])[0]
 
-    return text or ""
+def _iter_pdf_pages(path: str) -> Iterator[str]:
+    """
+    Yield page texts in order, lazily, so the caller can stop early.
+
+    Long PDFs are extracted on a bounded process pool in small page ranges with
+    at most PDF_WORKERS ranges in flight; a range that overruns its time budget
+    (PDF_PAGE_BUDGET_SECS per page) yields empty pages instead of stalling the
+    parse; the pool is then recycled (_drop_pdf_pool) to stop the stuck
+    process, and the ranges queued behind it are resubmitted to a fresh one.
+    Short PDFs run in-process, and so does everything in a daemonic process
+    (a Celery prefork child: it can't have children, and already has a core to
+    itself) or wherever the pool fails to start.
+    Closing the generator cancels ranges not yet started.
+
+    In-process, the file is mapped once (storage.open_blob) and that one buffer
+    serves both pypdf and the pdfminer fallback; pool workers map it themselves.
+    """
+    with open_blob(path) as blob:
+        try:
+            import pypdf  # type: ignore
+            pdf = pypdf.PdfReader(blob)
+            n = len(pdf.pages)
+        except Exception:
+            # pypdf can't even open it: let pdfminer try the whole document.
+            try:
+                from pdfminer.high_level import extract_text as pm_extract  # type: ignore
+                yield pm_extract(blob) or ""
+            except Exception:
+                pass
+            return
+
+        pool = None
+        if n >= _PDF_PARALLEL_MIN_PAGES and _PDF_WORKERS > 1 and not multiprocessing.current_process().daemon:
+            try:
+                pool = _get_pdf_pool()
+            except Exception:
+                pool = None
+        if pool is None:
+            yield from _iter_pdf_pages_serial(pdf, blob, n)
+            return
+
+    ranges = iter([list(range(a, min(a + _PDF_CHUNK_PAGES, n))) for a in range(0, n, _PDF_CHUNK_PAGES)])
+    pending: deque = deque()
+
+    def submit() -> None:
+        r = next(ranges, None)
+        if r is not None:
+            pending.append((pool.submit(_pdf_pages_text, path, r), r, time.monotonic()))
 
-def _extract_docx(path: str) -> str:
-    """Extract text from a DOCX file, including table cells."""
+    try:
+        try:
+            for _ in range(_PDF_WORKERS):
+                submit()
+        except Exception:
+            # Workers only start at the first submit: if they can't, go in-process.
+            pending.clear()
+            _drop_pdf_pool()
+            for r in [list(range(a, min(a + _PDF_CHUNK_PAGES, n))) for a in range(0, n, _PDF_CHUNK_PAGES)]:
+                yield from _pdf_pages_text(path, r)
+            return
+        while pending:
+            fut, r, t_sub = pending.popleft()
+            remaining = t_sub + _PDF_PAGE_BUDGET_SECS * len(r) - time.monotonic()
+            try:
+                texts = fut.result(timeout=max(0.0, remaining))
+            except FuturesTimeout:
+                texts = ["" for _ in r]
+                queued = [q for _, q, _ in pending]
+                pending.clear()
+                _drop_pdf_pool()
+                try:
+                    pool = _get_pdf_pool()
+                    for q in queued:
+                        pending.append((pool.submit(_pdf_pages_text, path, q), q, time.monotonic()))
+                except Exception:
+                    # No fresh pool: finish the document in-process.
+                    yield from texts
+                    for q in queued + list(ranges):
+                        yield from _pdf_pages_text(path, q)
+                    return
+            except Exception:
+                texts = _pdf_pages_text(path, r)
+            submit()
+            yield from texts
+    finally:
+        for fut, _, _ in pending:
+            fut.cancel()
+
+def _iter_docx_blocks(path: str) -> Iterator[str]:
+    """Yield DOCX paragraph texts, then table cell texts, lazily."""
     try:
         import docx  # python-docx
         d = docx.Document(path)
-        lines = [p.text for p in d.paragraphs]
+    except Exception:
+        return
+    try:
+        for p in d.paragraphs:
+            yield p.text
         for table in d.tables:
             for row in table.rows:
                 for cell in row.cells:
                     if cell.text:
-                        lines.append(cell.text)
-        return "\n".join(lines)
+                        yield cell.text
     except Exception:
-        return ""
+        return
 
-def _normalize_keep_newlines(raw: str) -> str:
-    """Preserve line breaks; normalize spaces inside each line."""
-    raw = raw.replace("\r", "\n").replace("\x00", " ")
-    lines = [re.sub(r"[ \t]+", " ", ln).strip() for ln in raw.split("\n")]
-    lines = [ln for ln in lines if ln]
-    return "\n".join(lines)
+_SPACES_RE = re.compile(r"[ \t]+")
+
+def _normalize_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Preserve line breaks; normalize spaces inside each line; drop empty lines. One chunk at a time."""
+    for raw in chunks:
+        raw = raw.replace("\r", "\n").replace("\x00", " ")
+        for ln in raw.split("\n"):
+            ln = _SPACES_RE.sub(" ", ln).strip()
+            if ln:
+                yield ln
 
 def extract_text(path: str, max_chars: int = 50000) -> str:
-    """Extract textual content from a PDF or DOCX and truncate it."""
+    """
+    Extract textual content from a PDF or DOCX and truncate it.
+    Pages/paragraphs are pulled only until max_chars is reached, so a 300-page
+    PDF costs about the same as the few pages that fit in the budget.
+    """
     ext = os.path.splitext(path)[1].lower()
     if ext == ".pdf":
-        raw = _extract_pdf(path)
+        chunks = _iter_pdf_pages(path)
     elif ext == ".docx":
-        raw = _extract_docx(path)
+        chunks = _iter_docx_blocks(path)
     else:
         raise ValueError(f"Unsupported file type: {ext}")
-    txt = _normalize_keep_newlines(raw)
-    return truncate(txt, max_chars)
+
+    lines = _normalize_lines(chunks)
+    out: List[str] = []
+    size = 0
+    try:
+        for ln in lines:
+            out.append(ln)
+            size += len(ln) + 1
+            if size > max_chars:
+                break
+    finally:
+        lines.close()
+        chunks.close()
+    return truncate("\n".join(out), max_chars)
 
 # -----------------------------------------------------------------------------
 # Deterministic regex / heuristics
 # -----------------------------------------------------------------------------
 
 _EMAIL_RE = re.compile(r"\b[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b")
-# Flexible phone; we canonicalize after (7..15 digits)
-_PHONE_RE = re.compile(r"(\+?\d[\d\s().\-]{6,}\d)")
-
-_SKILL_KEYWORDS = {
-    "python", "java", "javascript", "typescript", "react", "redux", "next.js", "node", "node.js",
-    "django", "flask", "spring", "spring boot", "postgres", "postgresql", "mysql", "mssql",
-    "mongodb", "neo4j", "redis", "kafka", "spark", "hadoop", "elasticsearch",
-    "docker", "kubernetes", "eks", "aws", "gcp", "azure", "sagemaker",
-    "celery", "graphql", "rest", "grpc", "pandas", "pytorch", "tensorflow", "scikit-learn",
-    "selenium", "playwright", "jenkins", "github actions", "terraform", "prometheus", "grafana"
-}
+# Flexible phone; we canonicalize after (7..15 digits). Line-local: a number
+# never swallows digits from the next line (e.g. a "2019 - 2021" below it).
+_PHONE_RE = re.compile(r"(\+?\d[\d \t().\-]{6,}\d)")
 
 _MONTHS = r"(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)"
 _SEP_CHARS = r"\|/•\-–—"
 
+_META_SEP_RE = re.compile(rf"\s[{_SEP_CHARS}]\s")
+_MONTH_RANGE_RE = re.compile(rf"\b{_MONTHS}\b\s+\d{{4}}\s*[–—\-]\s*\b{_MONTHS}\b\s+\d{{4}}", re.I)
+_YEAR_RANGE_RE = re.compile(r"\b(19|20)\d{2}\s*[–—\-]\s*(19|20)\d{2}\b")  # 2021-2023
+_MONTH_YEAR_RE = re.compile(rf"\b{_MONTHS}\b\s+\d{{4}}", re.I)             # Jun 2024
+_MULTI_SPACE_RE = re.compile(r"\s{2,}")
+_HAS_DIGIT_RE = re.compile(r"\d")
+
+_HEADER_LINES = 10
+
 def _strip_trailing_meta(s: str) -> str:
     """Remove date ranges and trailing location/timeline separators from company."""
-    s = re.split(rf"\s[{_SEP_CHARS}]\s", s, maxsplit=1)[0]
-    s = re.sub(rf"\b{_MONTHS}\b\s+\d{{4}}\s*[–—\-]\s*\b{_MONTHS}\b\s+\d{{4}}", "", s, flags=re.I)
-    s = re.sub(r"\b(19|20)\d{2}\s*[–—\-]\s*(19|20)\d{2}\b", "", s)  # 2021-2023
-    s = re.sub(rf"\b{_MONTHS}\b\s+\d{{4}}", "", s, flags=re.I)       # Jun 2024
-    return re.sub(r"\s{2,}", " ", s).strip()
+    s = _META_SEP_RE.split(s, maxsplit=1)[0]
+    if _HAS_DIGIT_RE.search(s):  # every date pattern needs a year
+        s = _MONTH_RANGE_RE.sub("", s)
+        s = _YEAR_RANGE_RE.sub("", s)
+        s = _MONTH_YEAR_RE.sub("", s)
+    return _MULTI_SPACE_RE.sub(" ", s).strip()
+
+def _company_designation(line: str) -> Tuple[str, str]:
+    """("Designation, Company ...") line → (designation, company), or ("", "")."""
+    if "," not in line or len(line) > 160:
+        return "", ""
+    left, right = [s.strip() for s in line.split(",", 1)]
+    if 2 <= len(left) <= 60 and 2 <= len(right) <= 100:
+        company = _strip_trailing_meta(right)
+        if company:
+            return left, company
+    return "", ""
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """Stripped non-empty lines, produced lazily so the scan can stop early."""
+    pos, n = 0, len(text)
+    while pos <= n:
+        nl = text.find("\n", pos)
+        if nl < 0:
+            nl = n
+        line = text[pos:nl].strip()
+        if line:
+            yield line
+        pos = nl + 1
 
 def deterministic_extract(text: str) -> Dict[str, object]:
     """
     Pull low-hanging fruit using regex and simple heuristics.
     Returns a dict compatible with Extracted.model_dump().
+
+    One pass over the lines fills email, phone, name (first header line that is
+    not contact/"resume" meta) and company/designation (first "Role, Company"
+    line), stopping as soon as all of them are found. Skills are one pass of
+    the compiled taxonomy matcher over the whole text.
     """
-    out: Dict[str, object] = {"name": "", "email": "", "phone": "", "company": "", "designation": "", "skills": []}
-    lines = [l.strip() for l in text.split("\n") if l.strip()]
-
-    # Email
-    m = _EMAIL_RE.search(text)
-    if m:
-        out["email"] = m.group(0).lower()
-
-    # Phone (prefer the first plausible)
-    for m in _PHONE_RE.finditer(text):
-        cand = canonical_phone(m.group(0))
-        if cand:
-            out["phone"] = cand
+    email = phone = name = company = designation = ""
+
+    for i, line in enumerate(_iter_lines(text)):
+        has_phone = False
+        if not email and "@" in line:
+            m = _EMAIL_RE.search(line)
+            if m:
+                email = m.group(0).lower()
+        if not phone or (not name and i < _HEADER_LINES):
+            for m in _PHONE_RE.finditer(line):
+                has_phone = True
+                if phone:
+                    break
+                cand = canonical_phone(m.group(0))
+                if cand:
+                    phone = cand
+                    break
+        if not name and i < _HEADER_LINES and "@" not in line and not has_phone and "resume" not in line.lower():
+            name = line[:80]
+        if not company:
+            designation, company = _company_designation(line)
+        if email and phone and company and (name or i >= _HEADER_LINES):
             break
 
-    # Name heuristic: first non-meta line in header (skip lines containing email/phone/“resume”)
-    header = lines[:10]
-    header = [l for l in header if ("@" not in l and not _PHONE_RE.search(l) and "resume" not in l.lower())]
-    if header:
-        out["name"] = header[0][:80]
-
-    # Company & designation heuristic:
-    for l in lines:
-        if "," in l and len(l) <= 160:
-            left, right = [s.strip() for s in l.split(",", 1)]
-            if 2 <= len(left) <= 60 and 2 <= len(right) <= 100:
-                clean_company = _strip_trailing_meta(right)
-                if clean_company:
-                    out["designation"] = out["designation"] or left
-                    out["company"] = out["company"] or clean_company
-                    if out["company"] and out["designation"]:
-                        break
-
-    # Skills: bag-of-words match
-    text_l = text.lower()
-    skills: List[str] = []
-    for kw in _SKILL_KEYWORDS:
-        if kw in text_l:
-            skills.append(kw)
-    out["skills"] = sorted(set(skills))[:20]
+    return {
+        "name": name,
+        "email": email,
+        "phone": phone,
+        "company": company,
+        "designation": designation,
+        # Skills: one pass of the compiled taxonomy matcher (aliases → canonical)
+        "skills": sorted(get_matcher().find(text))[:20],
+    }
 
+_BATCH_FIELDS = ("name", "email", "phone", "company", "designation")
+
+def _extract_columns(texts: List[str]) -> Dict[str, object]:
+    """deterministic_extract over one chunk, as columns; skills as bitsets of this process's matcher."""
+    matcher = get_matcher()
+    cols: Dict[str, list] = {f: [] for f in _BATCH_FIELDS}
+    bits = []
+    for text in texts:
+        row = deterministic_extract(text or "")
+        for f in _BATCH_FIELDS:
+            cols[f].append(row[f])
+        bits.append(matcher.to_bits(row["skills"]))
+    return {**cols, "skills": bits, "skill_names": matcher.skills}
+
+def deterministic_extract_batch(
+    texts: Iterable[str],
+    workers: int = 1,
+    chunk_size: int = 256,
+    pool=None,
+) -> Dict[str, list]:
+    """
+    deterministic_extract over many texts, returned column-wise:
+      {"name": [...], "email": [...], "phone": [...], "company": [...],
+       "designation": [...], "skills": [int bitset, ...], "skill_names": [...]}
+    Bit i of a skills entry means skill_names[i]. Chunks of chunk_size texts fan
+    out to `pool` (any concurrent.futures executor) or, with workers > 1, to a
+    temporary process pool; otherwise they run in-process.
+    """
+    texts = list(texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+    own_pool = None
+    if pool is None and workers > 1 and len(chunks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = own_pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        parts = list(pool.map(_extract_columns, chunks)) if pool is not None else [_extract_columns(c) for c in chunks]
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+    out: Dict[str, list] = {f: [] for f in _BATCH_FIELDS}
+    out["skills"] = []
+    out["skill_names"] = list(parts[0]["skill_names"]) if parts else list(get_matcher().skills)
+    index = {s: i for i, s in enumerate(out["skill_names"])}
+    for part in parts:
+        for f in _BATCH_FIELDS:
+            out[f].extend(part[f])
+        if part["skill_names"] == out["skill_names"]:
+            out["skills"].extend(part["skills"])
+            continue
+        # A worker saw a different taxonomy version: re-encode against ours.
+        names = part["skill_names"]
+        for b in part["skills"]:
+            remapped = 0
+            for i, s in enumerate(names):
+                if b >> i & 1:
+                    if s not in index:
+                        index[s] = len(out["skill_names"])
+                        out["skill_names"].append(s)
+                    remapped |= 1 << index[s]
+            out["skills"].append(remapped)
     return out
 
 # -----------------------------------------------------------------------------
@@ -169,38 +433,350 @@ _SYSTEM_PROMPT = (
     "If a field is unknown, use an empty string or empty array."
 )
 
-def llm_extract(text: str, hints: Dict[str, object]) -> Extracted:
-    """
-    Ask the configured LLM to produce structured JSON. Hints are rule-based picks.
-    If provider/key is missing or request fails, returns an empty Extracted().
-    """
-    user = (
+_EXTRACT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "email": {"type": "string"},
+        "phone": {"type": "string"},
+        "company": {"type": "string"},
+        "designation": {"type": "string"},
+        "skills": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["name", "email", "phone", "company", "designation", "skills"],
+    "additionalProperties": False,
+}
+
+def _llm_user_prompt(text: str, hints: Dict[str, object]) -> str:
+    return (
         "Resume text follows between <TEXT> tags. Use hints when reasonable, "
         "but correct them if obviously wrong.\n\n"
         f"HINTS: {hints}\n\n"
         f"<TEXT>\n{text}\n</TEXT>"
     )
+
+# -- Prompt trimming -----------------------------------------------------------
+# The LLM only needs the header (name/contact), the experience block (company,
+# designation) and the skills block. trim_for_llm() keeps those sections, in
+# that priority, up to the budget of the first provider in the chain
+# (LLM_PROMPT_TOKENS_<PROVIDER>, else LLM_PROMPT_TOKENS; 0 = send the full
+# text). Lines keep their original order. Text with no recognisable headings
+# is cut to the budget from the top.
+
+_HEADER_LINES_LLM = 12
+_SECTION_RE = re.compile(
+    r"^\W*(?P<title>(professional |work |employment |relevant )?(experience|history)|employment|"
+    r"(technical |core |key )?(skills|competencies|expertise)|tech(nical)? stack|technologies|"
+    r"summary|profile|objective|about me|education|academics?|projects?|certifications?|"
+    r"achievements|awards|publications|languages|interests|hobbies|references|volunteer(ing)?)\W*$",
+    re.I,
+)
+_SECTION_PRIORITY = (("experience", "history", "employment"), ("skills", "competencies", "expertise", "stack", "technologies"))
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE token count (~4 chars/token for English), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+def _prompt_token_budget() -> int:
+    chain = provider_chain()
+    raw = os.getenv(f"LLM_PROMPT_TOKENS_{chain[0].upper()}") if chain else None
+    return int(raw or os.getenv("LLM_PROMPT_TOKENS", "3000"))
+
+def trim_for_llm(text: str, budget: int | None = None) -> str:
+    """Header + experience + skills lines of text within `budget` estimated tokens."""
+    budget = _prompt_token_budget() if budget is None else budget
+    if budget <= 0 or estimate_tokens(text) <= budget:
+        return text
+
+    lines = text.split("\n")
+    sections: List[Tuple[str, List[int]]] = [("header", [])]
+    for i, line in enumerate(lines):
+        title = _SECTION_RE.match(line.strip()) if len(line) <= 40 else None
+        if title and i >= 1:
+            sections.append((title.group("title").lower(), [i]))
+        else:
+            sections[-1][1].append(i)
+    if len(sections) == 1:
+        return text[: budget * 4]
+
+    groups = [sections[0][1][:_HEADER_LINES_LLM]]
+    for words in _SECTION_PRIORITY:
+        groups.append([i for title, idx in sections[1:] if any(w in title for w in words) for i in idx])
+
+    keep, used = set(), 0
+
+    def take(idx: List[int], limit: int) -> None:
+        nonlocal used
+        for i in idx:
+            if i in keep:
+                continue
+            cost = estimate_tokens(lines[i]) + 1
+            if used + cost > limit:
+                return
+            keep.add(i)
+            used += cost
+
+    # First pass: no group may take more than half of what is left, so a long
+    # experience block can't starve the skills block; second pass fills the rest.
+    for idx in groups:
+        take(idx, used + (budget - used) // 2 if idx is not groups[-1] else budget)
+    for idx in groups:
+        take(idx, budget)
+    return "\n".join(lines[i] for i in sorted(keep))
+
+# -- Confidence gate ----------------------------------------------------------
+# Every field of the rule result gets a confidence (rule_confidence). If all of
+# name/email/phone/company/designation reach LLM_SKIP_THRESHOLD the LLM call is
+# skipped; if only some do, the LLM is asked for just the missing ones over
+# about LLM_PARTIAL_CHARS of trimmed text. Threshold > 1 always sends the full request.
+# Decisions are counted as llm_gate_{skip,partial,full} in metrics.
+
+LLM_SKIP_THRESHOLD = float(os.getenv("LLM_SKIP_THRESHOLD", "0.8"))
+LLM_PARTIAL_CHARS = int(os.getenv("LLM_PARTIAL_CHARS", "3000"))
+
+_GATED_FIELDS = ("name", "email", "phone", "company", "designation")
+_ROLE_WORDS = frozenset((
+    "engineer", "developer", "manager", "analyst", "intern", "lead", "consultant", "designer",
+    "scientist", "architect", "director", "head", "officer", "specialist", "administrator",
+    "associate", "executive", "programmer", "tester", "founder", "cto", "ceo", "sde", "devops",
+))
+_NOT_NAME_WORDS = _ROLE_WORDS | {"curriculum", "vitae", "cv", "profile", "summary", "contact", "objective"}
+_NAME_TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z.'\-]*")
+_WORD_RE = re.compile(r"[a-z]+")
+
+def rule_confidence(rule: Dict[str, object]) -> Dict[str, float]:
+    """How much to trust each deterministic_extract() field on its own (0..1)."""
+    conf = {f: 0.0 for f in _GATED_FIELDS}
+    conf["email"] = 1.0 if rule.get("email") else 0.0
+    conf["phone"] = 1.0 if rule.get("phone") else 0.0
+
+    name = str(rule.get("name") or "")
+    if name:
+        tokens = name.split()
+        conf["name"] = 0.9 if (
+            2 <= len(tokens) <= 4
+            and len(name) <= 60
+            and all(_NAME_TOKEN_RE.fullmatch(t) for t in tokens)
+            and not _NOT_NAME_WORDS.intersection(t.lower() for t in tokens)
+        ) else 0.6
+
+    designation = str(rule.get("designation") or "")
+    company = str(rule.get("company") or "")
+    if designation and company:
+        # A "Role, Company" line whose left side names a role is very likely just that.
+        role_like = len(designation.split()) <= 6 and bool(_ROLE_WORDS.intersection(_WORD_RE.findall(designation.lower())))
+        conf["designation"] = 0.9 if role_like else 0.6
+        conf["company"] = 0.9 if role_like and len(company) <= 60 and "@" not in company else 0.6
+    return conf
+
+def _partial_system_prompt(fields: List[str]) -> str:
+    return (
+        "You are a resume parser. Extract EXACT JSON with these fields: "
+        + ", ".join("skills (array of strings)" if f == "skills" else f for f in fields)
+        + ". Do not include any other keys. Phone should be digits only. "
+        "If a field is unknown, use an empty string or empty array."
+    )
+
+def _gate(hints: Dict[str, object]) -> List[str] | None:
+    """Fields to ask the LLM for, or None when the rule result makes the call redundant."""
+    conf = rule_confidence(hints)
+    missing = [f for f in _GATED_FIELDS if conf[f] < LLM_SKIP_THRESHOLD]
+    if not missing:
+        metrics.incr("llm_gate_skip")
+        return None
+    if len(missing) == len(_GATED_FIELDS) or LLM_PARTIAL_CHARS <= 0:
+        metrics.incr("llm_gate_full")
+        return list(_EXTRACT_SCHEMA["required"])
+    if not hints.get("skills"):
+        missing.append("skills")
+    metrics.incr("llm_gate_partial")
+    return missing
+
+def _llm_request(text: str, hints: Dict[str, object], fields: List[str]):
+    """(schema, system prompt, user prompt) asking for `fields` (all of them = the full request)."""
+    if len(fields) == len(_EXTRACT_SCHEMA["required"]):
+        return _EXTRACT_SCHEMA, _SYSTEM_PROMPT, _llm_user_prompt(trim_for_llm(text), hints)
     schema = {
-        "type": "object",
-        "properties": {
-            "name": {"type": "string"},
-            "email": {"type": "string"},
-            "phone": {"type": "string"},
-            "company": {"type": "string"},
-            "designation": {"type": "string"},
-            "skills": {"type": "array", "items": {"type": "string"}},
-        },
-        "required": ["name", "email", "phone", "company", "designation", "skills"],
-        "additionalProperties": False,
+        **_EXTRACT_SCHEMA,
+        "properties": {f: _EXTRACT_SCHEMA["properties"][f] for f in fields},
+        "required": fields,
     }
-    data = generate_structured(schema, _SYSTEM_PROMPT, user)
+    return schema, _partial_system_prompt(fields), _llm_user_prompt(trim_for_llm(text, LLM_PARTIAL_CHARS // 4), hints)
+
+def _to_extracted(data, fields=None) -> Extracted:
+    """Extracted from LLM JSON; with fields, keys outside the requested ones are ignored."""
     if not data:
         return Extracted()
+    if fields is not None:
+        data = {k: v for k, v in data.items() if k in fields}
     try:
         return Extracted(**data)
     except Exception:
         return Extracted()
 
+def llm_request(text: str, hints: Dict[str, object]):
+    """
+    (fields, (schema, system prompt, user prompt)) for one resume after the
+    gate, or None if it is skipped; for callers that send requests themselves
+    (offline batch APIs). Parse the answer with _to_extracted(data, fields).
+    """
+    fields = _gate(hints)
+    return None if fields is None else (fields, _llm_request(text, hints, fields))
+
+def llm_extract(text: str, hints: Dict[str, object], fields: List[str] | None = None) -> Extracted:
+    """
+    Ask the configured LLM to produce structured JSON. Hints are rule-based picks.
+    If the gate skips the call, provider/key is missing, the request fails or it
+    times out, returns an empty Extracted() so merge_results() falls back to the
+    rule-based fields. A partial request leaves the confident fields empty.
+    Passing fields bypasses the gate (re-sending a request it already allowed).
+    LLMThrottled (rate limit full or every provider backed off) propagates: the caller reschedules.
+    """
+    fields = _gate(hints) if fields is None else fields
+    if fields is None:
+        return Extracted()
+    try:
+        data = generate_structured(*_llm_request(text, hints, fields))
+    except LLMTimeout as e:
+        log.warning("llm_extract timeout: %s", e)
+        return Extracted()
+    return _to_extracted(data, fields=fields)
+
+async def _allm_fields(text: str, hints: Dict[str, object], fields: List[str]) -> Extracted:
+    try:
+        data = await agenerate_structured(*_llm_request(text, hints, fields))
+    except LLMTimeout as e:
+        log.warning("llm_extract timeout: %s", e)
+        return Extracted()
+    return _to_extracted(data, fields=fields)
+
+async def allm_extract(text: str, hints: Dict[str, object]) -> Extracted:
+    """Async llm_extract(); same gate and fallbacks."""
+    fields = _gate(hints)
+    if fields is None:
+        return Extracted()
+    return await _allm_fields(text, hints, fields)
+
+# -- Packed requests -------------------------------------------------------------
+# Several resumes in one structured call: the prompt carries each (trimmed)
+# resume tagged with its candidate id, the answer is {"results": [{id, ...}]}.
+# Results are matched back by id; a resume missing or malformed in the answer
+# (or a failed pack) is retried alone with the normal single-resume request.
+
+LLM_PACK_TOKENS = int(os.getenv("LLM_PACK_TOKENS", "1200"))  # text budget per resume in a pack
+
+_PACK_SYSTEM_PROMPT = (
+    "You are a resume parser. The input holds several resumes, each inside "
+    "<RESUME id=\"...\"> tags. Return EXACT JSON {\"results\": [...]} with one object "
+    "per resume: id (copied from the tag), name, email, phone, company, designation, "
+    "skills (array of strings). Do not include any other keys. Phone should be "
+    "digits only. If a field is unknown, use an empty string or empty array."
+)
+
+_PACK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                **_EXTRACT_SCHEMA,
+                "properties": {"id": {"type": "string"}, **_EXTRACT_SCHEMA["properties"]},
+                "required": ["id", *_EXTRACT_SCHEMA["required"]],
+            },
+        },
+    },
+    "required": ["results"],
+    "additionalProperties": False,
+}
+
+def _pack_user_prompt(items: List[Tuple[str, str, Dict[str, object]]]) -> str:
+    return "Use hints when reasonable, but correct them if obviously wrong.\n\n" + "\n\n".join(
+        f'<RESUME id="{key}">\nHINTS: {hints}\n<TEXT>\n{trim_for_llm(text, LLM_PACK_TOKENS)}\n</TEXT>\n</RESUME>'
+        for key, text, hints in items
+    )
+
+def _demux(data, keys: List[str]) -> Dict[str, Dict[str, object]]:
+    """{id: result} for the requested ids found in a packed answer."""
+    wanted, out = set(keys), {}
+    rows = data.get("results") if isinstance(data, dict) else None
+    for row in rows if isinstance(rows, list) else []:
+        key = str(row.get("id", "")) if isinstance(row, dict) else ""
+        if key in wanted and key not in out:
+            out[key] = row
+    return out
+
+async def allm_extract_packed(items: List[Tuple[str, str, Dict[str, object]]]) -> List[Extracted | LLMThrottled]:
+    """
+    allm_extract() for several (id, text, hints) in one provider call. Gate
+    decisions are per resume; results come back in input order, with the
+    LLMThrottled error in place of a resume the shared rate limit held back.
+    """
+    results: List[Extracted | LLMThrottled] = [Extracted() for _ in items]
+    asked = []
+    for pos, (key, text, hints) in enumerate(items):
+        fields = _gate(hints)
+        if fields is not None:
+            asked.append((pos, str(key), text, hints, fields))
+    if not asked:
+        return results
+
+    found: Dict[str, Dict[str, object]] = {}
+    if len(asked) > 1:
+        try:
+            data = await agenerate_structured(
+                _PACK_SCHEMA, _PACK_SYSTEM_PROMPT, _pack_user_prompt([(k, t, h) for _, k, t, h, _ in asked]),
+                answers=len(asked),
+            )
+            found = _demux(data, [k for _, k, _, _, _ in asked])
+        except LLMTimeout as e:
+            log.warning("llm_extract pack timeout (%d resumes): %s", len(asked), e)
+        except LLMThrottled as e:
+            sent = {a[0] for a in asked}
+            return [e if pos in sent else r for pos, r in enumerate(results)]
+
+    retry = []
+    for pos, key, text, hints, fields in asked:
+        if key in found:
+            results[pos] = _to_extracted(found[key], fields=fields)
+        else:
+            retry.append((pos, text, hints, fields))
+    if retry and len(asked) > 1:
+        log.info("llm_extract pack: retrying %d of %d resumes alone", len(retry), len(asked))
+    alone = await asyncio.gather(*(_allm_fields(t, h, f) for _, t, h, f in retry), return_exceptions=True)
+    for (pos, _, _, _), ext in zip(retry, alone):
+        if isinstance(ext, BaseException) and not isinstance(ext, LLMThrottled):
+            raise ext
+        results[pos] = ext
+    return results
+
+async def llm_extract_many(
+    items: List[Tuple[str, str, Dict[str, object]]], concurrency: int, pack_size: int = 1
+) -> List[Extracted | LLMThrottled]:
+    """
+    LLM results for each (id, text, hints), in input order, with at most
+    `concurrency` requests in flight. pack_size > 1 sends that many resumes per
+    request (allm_extract_packed); 1 sends each alone (allm_extract). A resume
+    held back by the shared rate limit gets its LLMThrottled error instead, for
+    the caller to reschedule (retry_after).
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    size = max(1, pack_size)
+    packs = [items[i:i + size] for i in range(0, len(items), size)]
+
+    async def one(pack) -> List[Extracted | LLMThrottled]:
+        async with sem:
+            if len(pack) > 1:
+                return await allm_extract_packed(pack)
+            try:
+                return [await allm_extract(pack[0][1], pack[0][2])]
+            except LLMThrottled as e:
+                return [e]
+
+    try:
+        return [ext for part in await asyncio.gather(*(one(p) for p in packs)) for ext in part]
+    finally:
+        await aclose_clients()
+
 # -----------------------------------------------------------------------------
 # Merge & update helpers
 # -----------------------------------------------------------------------------
@@ -0,0 +1,42 @@
+"""
+redis_client.py
+The Redis connection shared by everything that keeps cross-process state there
+(llm_cache, llm_ratelimit, metrics, doc_request).
+
+That state is all best-effort, so the client has short socket timeouts and the
+functions that use it are wrapped in @fail_open: any Redis failure (down, slow,
+bad data) returns the function's default instead of raising, so Redis never
+breaks a parse or a request.
+"""
+
+import copy
+import functools
+import os
+
+_client = None
+
+
+def get():
+    """Process-wide client for REDIS_URL, created on first use."""
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(
+            os.getenv("REDIS_URL", "redis://redis:6379/0"),
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5,
+        )
+    return _client
+
+
+def fail_open(default=None):
+    """Decorator: return (a copy of) default if the wrapped function raises."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                return copy.copy(default)
+        return inner
+    return wrap
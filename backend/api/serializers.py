@@ -8,6 +8,16 @@ class CandidateListSerializer(serializers.ModelSerializer):
         model = Candidate
         fields = ("id", "name", "email", "company", "extraction_status", "updated_at")
 
+    def __init__(self, *args, fields=None, **kwargs):
+        """Optional `fields` projection: drop any serializer field not listed."""
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_extraction_status(self, obj):
+        # Prefer the value annotated by with_latest_extraction_status() (single query).
+        if hasattr(obj, "latest_extraction_status"):
+            return obj.latest_extraction_status or "unknown"
         last = obj.extractions.order_by("-created_at").first()
         return last.status if last else "unknown"
@@ -0,0 +1,147 @@
+"""
+skills.py
+Skill taxonomy + single-pass matcher used by deterministic_extract().
+
+The taxonomy is a JSON object {canonical: [aliases...]} or a CSV with one
+"canonical,alias,alias..." row per skill (api/data/skills.json by default,
+override with SKILL_TAXONOMY_PATH). All names and aliases are compiled into one
+trie-shaped regex, so the text is scanned once no matter how many skills there
+are, and matches must sit on word boundaries ("java" does not match inside
+"javascript", "rest" not inside "interested").
+
+Hot reload: the compiled matcher is cached per process under the file's version
+stamp (mtime + size), re-checked at most every SKILL_TAXONOMY_CHECK_SECS.
+Replacing the file (write a temp file, then rename over it) is picked up by
+every worker without a restart; an unreadable file keeps the previous matcher.
+"""
+
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), "data", "skills.json")
+
+# Boundaries by hand instead of \b so terms ending in symbols (c++, c#) still work.
+_LEFT = r"(?<![\w])"
+_RIGHT = r"(?![\w])"
+
+
+def _norm(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+def _trie_pattern(terms: List[str]) -> str:
+    """Regex equivalent to an alternation of terms, factored as a prefix trie."""
+    trie: Dict[str, dict] = {}
+    for t in terms:
+        node = trie
+        for ch in t:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [
+            (r"\s+" if ch == " " else re.escape(ch)) + build(child)
+            for ch, child in sorted(node.items())
+            if ch
+        ]
+        if not branches:
+            return ""
+        pat = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Greedy optional: the longer term wins, shorter one is the fallback.
+            pat = "(?:" + pat + ")?"
+        return pat
+
+    return build(trie)
+
+
+class SkillMatcher:
+    """Compiled taxonomy: find() maps every alias hit in a text to its canonical skill."""
+
+    def __init__(self, taxonomy: Dict[str, List[str]], version: str = ""):
+        self.version = version
+        self.aliases: Dict[str, str] = {}
+        for canonical, aliases in taxonomy.items():
+            canon = _norm(canonical)
+            for term in [canonical, *(aliases or [])]:
+                if _norm(term):
+                    self.aliases[_norm(term)] = canon
+        pattern = _trie_pattern(list(self.aliases)) if self.aliases else r"(?!)"
+        self.regex = re.compile(_LEFT + "(?:" + pattern + ")" + _RIGHT, re.IGNORECASE)
+        # Stable bit index per canonical skill (within this version) for bitset columns.
+        self.skills: List[str] = sorted(set(self.aliases.values()))
+        self._bit = {skill: 1 << i for i, skill in enumerate(self.skills)}
+
+    def find(self, text: str) -> List[str]:
+        """Canonical skills present in text, in order of first appearance."""
+        seen: Dict[str, None] = {}
+        for m in self.regex.finditer(text or ""):
+            key = _norm(m.group(0))
+            canon = self.aliases.get(key) or self.aliases.get(key.casefold())
+            if canon is not None:  # IGNORECASE also matches letters that don't lower() back (e.g. "İ")
+                seen.setdefault(canon, None)
+        return list(seen)
+
+    def to_bits(self, skills: List[str]) -> int:
+        """Bitset (Python int) of canonical skills; names outside the taxonomy are dropped."""
+        bits = 0
+        for skill in skills:
+            bits |= self._bit.get(skill, 0)
+        return bits
+
+
+def taxonomy_path() -> str:
+    return os.getenv("SKILL_TAXONOMY_PATH") or DEFAULT_TAXONOMY_PATH  # empty (compose env) = default
+
+
+def taxonomy_version(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def load_taxonomy(path: str) -> Dict[str, List[str]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            return {
+                row[0].strip(): [a.strip() for a in row[1:] if a.strip()]
+                for row in csv.reader(f)
+                if row and row[0].strip() and not row[0].startswith("#")
+            }
+        return json.load(f)
+
+
+_CHECK_SECS = float(os.getenv("SKILL_TAXONOMY_CHECK_SECS", "5"))
+_matcher: Optional[SkillMatcher] = None
+_stamp: Optional[Tuple[str, str]] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_matcher() -> SkillMatcher:
+    """Process-wide matcher; recompiled only when the taxonomy's version stamp changes."""
+    global _matcher, _stamp, _checked_at
+    now = time.monotonic()
+    if _matcher is not None and now - _checked_at < _CHECK_SECS:
+        return _matcher
+
+    with _lock:
+        path = taxonomy_path()
+        try:
+            stamp = (path, taxonomy_version(path))
+            if stamp != _stamp:
+                _matcher = SkillMatcher(load_taxonomy(path), version=stamp[1])
+                _stamp = stamp
+        except Exception:
+            if _matcher is None:
+                raise
+            log.exception("skill taxonomy reload failed; keeping version %s", _matcher.version)
+        _checked_at = now
+        return _matcher
@@ -0,0 +1,71 @@
+"""
+storage.py
+File access for resumes/documents under settings.DOCS_DIR.
+
+- open_blob(): map a stored file once (read-only mmap) and hand the same
+  buffer to the hasher, pypdf and pdfminer — no per-consumer reopen/copy.
+- sha256_upload() / store_upload(): hash and place an incoming upload. Uploads
+  Django already spooled to disk (FILE_UPLOAD_TEMP_DIR, on the DOCS_DIR volume)
+  are moved into place with a rename; small in-memory uploads are hashed from
+  their buffer and written once.
+"""
+
+import hashlib
+import io
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+from django.core.files.move import file_move_safe
+
+
+@contextmanager
+def open_blob(path: str) -> Iterator[Union[mmap.mmap, io.BytesIO]]:
+    """
+    Read-only, file-like view over path (mmap supports read/seek/tell/readline,
+    which is all pypdf and pdfminer need). Empty files can't be mapped, so they
+    get an empty BytesIO.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield io.BytesIO(b"")
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
+def sha256_file(path: str) -> str:
+    with open_blob(path) as blob:
+        return hashlib.sha256(blob if isinstance(blob, mmap.mmap) else blob.getbuffer()).hexdigest()
+
+
+def sha256_upload(f) -> str:
+    """SHA-256 of a Django UploadedFile without copying it into Python bytes."""
+    if hasattr(f, "temporary_file_path"):
+        return sha256_file(f.temporary_file_path())
+    buf = getattr(f.file, "getbuffer", None)
+    if buf is not None:
+        return hashlib.sha256(buf()).hexdigest()
+    sha = hashlib.sha256()
+    for chunk in f.chunks():
+        sha.update(chunk)
+    return sha.hexdigest()
+
+
+def store_upload(f, dest_path: str) -> None:
+    """Place an upload at dest_path: rename if Django spooled it to disk, else write once."""
+    if hasattr(f, "temporary_file_path"):
+        # Falls back to a copy only if the temp dir is on another filesystem.
+        file_move_safe(f.temporary_file_path(), dest_path)
+        return
+    with open(dest_path, "wb") as out:
+        buf = getattr(f.file, "getbuffer", None)
+        if buf is not None:
+            out.write(buf())
+        else:
+            for chunk in f.chunks():
+                out.write(chunk)
@@ -84,43 +84,347 @@
 #         raise
 
 
+import asyncio
+import logging
+import os
 import time
-from celery import shared_task
+from celery import chain, shared_task
 from django.db import transaction
-from .models import Candidate, Extraction
-from .parsing import extract_text, deterministic_extract, llm_extract, merge_results, update_candidate
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .models import Candidate, Extraction, Resume
+from .schemas import Extracted
+from .skills import get_matcher
+from .parsing import (
+    extract_text, deterministic_extract, llm_extract, llm_extract_many, llm_request, merge_results,
+    update_candidate, _to_extracted,
+)
+from .llm_client import submit_structured_batch, fetch_structured_batch, LLMThrottled, LLMTimeout
+from . import doc_request
 
-@shared_task(name="parse_resume_task")
-def parse_resume_task(candidate_id: str, file_path: str):
+log = logging.getLogger(__name__)
+
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "20"))
+LLM_PACK_SIZE = int(os.getenv("LLM_PACK_SIZE", "1"))  # resumes per LLM request in batch parsing
+LLM_OFFLINE_POLL_SECS = int(os.getenv("LLM_OFFLINE_POLL_SECS", "300"))
+RETAG_CHUNK = 500
+DOC_REQUEST_PRECOMPUTE = os.getenv("DOC_REQUEST_PRECOMPUTE", "1").strip().lower() in {"1", "true", "yes", "on"}
+
+def _save_result(candidate_id: str, text: str, extracted, conf, precompute: bool = False) -> None:
+    """Save the parse; precompute=True also queues the document-request draft (single uploads only)."""
+    with transaction.atomic():
+        cand = Candidate.objects.select_for_update().get(id=candidate_id)
+        last = cand.extractions.order_by("-created_at").first()
+        if not last:
+            last = Extraction.objects.create(candidate=cand, status="queued")
+
+        last.raw_text = text[:10000]
+        last.extracted_json = extracted.model_dump()
+        last.confidence_json = conf
+        last.status = "done"
+        last.save()
+
+        update_candidate(cand, extracted)
+
+    if precompute and DOC_REQUEST_PRECOMPUTE:
+        try:
+            precompute_document_request_task.delay(candidate_id)
+        except Exception as e:
+            log.warning("precompute_document_request enqueue failed candidate_id=%s: %s", candidate_id, e)
+
+def _save_error(candidate_id: str, err: Exception) -> None:
+    with transaction.atomic():
+        cand = Candidate.objects.get(id=candidate_id)
+        last = cand.extractions.order_by("-created_at").first()
+        if not last:
+            last = Extraction.objects.create(candidate=cand, status="queued")
+        last.status = "error"
+        last.error_message = str(err)
+        last.save()
+
+# LLMThrottled means our shared provider rate limit (llm_ratelimit) is full:
+# tasks give the worker slot back and are requeued with that countdown.
+
+@shared_task(name="parse_resume_task", bind=True, max_retries=None)
+def parse_resume_task(self, candidate_id: str, file_path: str):
     try:
         text = extract_text(file_path)
         rule = deterministic_extract(text)
         llm = llm_extract(text, rule)  # empty Extracted() if LLM not configured
         extracted, conf = merge_results(rule, llm)
+        _save_result(candidate_id, text, extracted, conf)
+        return {"candidate_id": candidate_id, "status": "done"}
+
+    except LLMThrottled as e:
+        raise self.retry(countdown=e.retry_after)
+    except Exception as e:
+        _save_error(candidate_id, e)
+        return {"candidate_id": candidate_id, "status": "error", "error": str(e)}
 
-        with transaction.atomic():
-            cand = Candidate.objects.select_for_update().get(id=candidate_id)
-            last = cand.extractions.order_by("-created_at").first()
-            if not last:
-                last = Extraction.objects.create(candidate=cand, status="queued")
+# -----------------------------------------------------------------------------
+# Staged pipeline: extract (CPU) → llm (network) → persist (DB), one queue each
+# (routes/concurrency in core/celery.py). Each stage passes a dict payload on;
+# a stage that fails records the error and marks the payload so later ones skip.
+# -----------------------------------------------------------------------------
 
-            last.raw_text = text[:10000]
-            last.extracted_json = extracted.model_dump()
-            last.confidence_json = conf
-            last.status = "done"
-            last.save()
+def parse_resume_pipeline(candidate_id: str, file_path: str, precompute: bool = False):
+    """
+    Chain of stage tasks for one resume; call .delay() / .apply_async() on it.
+    precompute: draft the document-request message once saved (new uploads).
+    """
+    return chain(
+        extract_text_task.s(candidate_id, file_path),
+        llm_extract_task.s(),
+        persist_task.s(precompute=precompute),
+    )
 
-            update_candidate(cand, extracted)
+@shared_task(name="extract_text_task")
+def extract_text_task(candidate_id: str, file_path: str):
+    try:
+        text = extract_text(file_path)
+        return {"candidate_id": candidate_id, "text": text, "rule": deterministic_extract(text)}
+    except Exception as e:
+        _save_error(candidate_id, e)
+        return {"candidate_id": candidate_id, "error": str(e)}
 
-        return {"candidate_id": candidate_id, "status": "done"}
+@shared_task(name="llm_extract_task", bind=True, max_retries=None)
+def llm_extract_task(self, payload: dict):
+    if payload.get("error"):
+        return payload
+    try:
+        llm = llm_extract(payload["text"], payload["rule"])  # empty Extracted() if LLM not configured
+    except LLMThrottled as e:
+        raise self.retry(countdown=e.retry_after)  # the rest of the chain runs after the retry
+    except Exception as e:
+        # Keep the chain going: persist saves the rule-only result, as the inline path would.
+        log.warning("llm_extract failed candidate_id=%s: %s", payload["candidate_id"], e)
+        llm = Extracted()
+    return {**payload, "llm": llm.model_dump()}
 
+@shared_task(name="persist_task")
+def persist_task(payload: dict, precompute: bool = False):
+    candidate_id = payload["candidate_id"]
+    if payload.get("error"):
+        return {"candidate_id": candidate_id, "status": "error", "error": payload["error"]}
+    try:
+        extracted, conf = merge_results(payload["rule"], Extracted(**payload["llm"]))
+        _save_result(candidate_id, payload["text"], extracted, conf, precompute=precompute)
+        return {"candidate_id": candidate_id, "status": "done"}
     except Exception as e:
-        with transaction.atomic():
-            cand = Candidate.objects.get(id=candidate_id)
-            last = cand.extractions.order_by("-created_at").first()
-            if not last:
-                last = Extraction.objects.create(candidate=cand, status="queued")
-            last.status = "error"
-            last.error_message = str(e)
-            last.save()
+        _save_error(candidate_id, e)
         return {"candidate_id": candidate_id, "status": "error", "error": str(e)}
+
+@shared_task(name="parse_resume_batch_task")
+def parse_resume_batch_task(candidate_ids: list):
+    """
+    Batch version of the staged pipeline, for bulk uploads and reparse_all.
+    This task is the CPU stage (parse-cpu): it extracts text and rule fields
+    from each candidate's latest resume, then hands the lot to
+    llm_extract_batch_task (llm-io), which hands its results to
+    persist_batch_task (persist).
+    """
+    ready, results = [], []
+    for cid in candidate_ids:
+        try:
+            resume = Resume.objects.filter(candidate_id=cid).order_by("-created_at").first()
+            if not resume:
+                raise ValueError("no resume found")
+            text = extract_text(resume.file_path)
+            ready.append({"candidate_id": cid, "text": text, "rule": deterministic_extract(text)})
+        except Exception as e:
+            _save_error(cid, e)
+            results.append({"candidate_id": cid, "status": "error", "error": str(e)})
+    if ready:
+        llm_extract_batch_task.delay(ready)
+        results.append({"extracted": len(ready)})
+    return results
+
+@shared_task(name="llm_extract_batch_task")
+def llm_extract_batch_task(payloads: list):
+    """
+    LLM stage of parse_resume_batch_task: every call runs concurrently on one
+    event loop (at most LLM_BATCH_CONCURRENCY in flight, LLM_PACK_SIZE resumes
+    per request). Resumes held back by the rate limit are requeued here, not
+    re-extracted; an LLM failure falls back to the rule-only result.
+    """
+    try:
+        llms = asyncio.run(llm_extract_many(
+            [(p["candidate_id"], p["text"], p["rule"]) for p in payloads], LLM_BATCH_CONCURRENCY, LLM_PACK_SIZE
+        ))
+    except Exception as e:
+        log.warning("llm_extract_batch failed n=%d: %s", len(payloads), e)
+        llms = [Extracted() for _ in payloads]
+
+    held = [(p, llm.retry_after) for p, llm in zip(payloads, llms) if isinstance(llm, LLMThrottled)]
+    if held:
+        llm_extract_batch_task.apply_async(([p for p, _ in held],), countdown=min(w for _, w in held))
+
+    done = [{**p, "llm": llm.model_dump()} for p, llm in zip(payloads, llms) if not isinstance(llm, LLMThrottled)]
+    if done:
+        persist_batch_task.delay(done)
+    return {"sent": len(done), "requeued": len(held)}
+
+@shared_task(name="persist_batch_task")
+def persist_batch_task(payloads: list):
+    return [persist_task(p) for p in payloads]
+
+# -----------------------------------------------------------------------------
+# Offline batch: LLM calls through the provider's batch API (see llm_client).
+# llm_offline_batch_task (parse-cpu) extracts text up front and keeps it on the
+# queued Extraction; llm_offline_submit_task (llm-io) submits the requests; the
+# poll task re-schedules itself until the batch ends, then merges and saves each
+# result. Requests the batch lost or failed are retried alone with llm_extract().
+# -----------------------------------------------------------------------------
+
+def _save_pending(candidate_id: str, text: str) -> None:
+    last = Extraction.objects.filter(candidate_id=candidate_id).order_by("-created_at").first()
+    if not last:
+        last = Extraction(candidate_id=candidate_id, status="queued")
+    last.raw_text = text[:10000]
+    last.save()
+
+@shared_task(name="llm_offline_batch_task")
+def llm_offline_batch_task(candidate_ids: list):
+    pending, requests, results = {}, [], []
+    for cid in candidate_ids:
+        try:
+            resume = Resume.objects.filter(candidate_id=cid).order_by("-created_at").first()
+            if not resume:
+                raise ValueError("no resume found")
+            text = extract_text(resume.file_path)
+            rule = deterministic_extract(text)
+            req = llm_request(text, rule)
+            if req is None:
+                _save_result(cid, text, *merge_results(rule, None))
+                results.append({"candidate_id": cid, "status": "done"})
+                continue
+            fields, (_schema, system_prompt, user_prompt) = req
+            _save_pending(cid, text)
+            pending[cid] = {"rule": rule, "fields": fields}
+            requests.append((cid, system_prompt, user_prompt))
+        except Exception as e:
+            _save_error(cid, e)
+            results.append({"candidate_id": cid, "status": "error", "error": str(e)})
+
+    if requests:
+        llm_offline_submit_task.delay(requests, pending)
+        results.append({"prepared": len(requests)})
+    return results
+
+@shared_task(name="llm_offline_submit_task")
+def llm_offline_submit_task(requests: list, pending: dict):
+    try:
+        batch_id = submit_structured_batch([tuple(r) for r in requests])
+    except Exception as e:
+        # No batch API (or submit failed): queue these for online parsing instead.
+        log.warning("offline batch submit failed n=%d: %s", len(requests), e)
+        parse_resume_batch_task.delay(list(pending))
+        return [{"candidate_id": cid, "status": "requeued"} for cid in pending]
+    llm_offline_poll_task.apply_async((batch_id, pending), countdown=LLM_OFFLINE_POLL_SECS)
+    return {"batch_id": batch_id, "submitted": len(requests)}
+
+@shared_task(name="llm_offline_poll_task")
+def llm_offline_poll_task(batch_id: str, pending: dict):
+    answers = fetch_structured_batch(batch_id)
+    if answers is None:
+        llm_offline_poll_task.apply_async((batch_id, pending), countdown=LLM_OFFLINE_POLL_SECS)
+        return {"batch_id": batch_id, "status": "processing"}
+
+    results, held, wait = [], {}, None
+    for cid, item in pending.items():
+        try:
+            last = Extraction.objects.filter(candidate_id=cid).order_by("-created_at").first()
+            text = last.raw_text if last else ""
+            data = answers.get(cid)
+            if data:
+                llm = _to_extracted(data, fields=item["fields"])
+            else:
+                llm = llm_extract(text, item["rule"], fields=item["fields"])
+            extracted, conf = merge_results(item["rule"], llm)
+            _save_result(cid, text, extracted, conf)
+            results.append({"candidate_id": cid, "status": "done", "retried": not data})
+        except LLMThrottled as e:
+            held[cid] = item
+            wait = e.retry_after if wait is None else min(wait, e.retry_after)
+        except Exception as e:
+            _save_error(cid, e)
+            results.append({"candidate_id": cid, "status": "error", "error": str(e)})
+    if held:
+        # The batch's answers stay fetchable; come back for the ones still to redo online.
+        llm_offline_poll_task.apply_async((batch_id, held), countdown=wait)
+        results.append({"batch_id": batch_id, "requeued": len(held)})
+    return results
+
+@shared_task(name="retag_skills_task")
+def retag_skills_task(dry_run: bool = False):
+    """
+    Re-run the current skill taxonomy over every candidate's latest done
+    Extraction, using the stored raw_text (no file reads, no LLM calls).
+    The skill set is recomputed from the text, so skills the taxonomy no
+    longer knows are dropped and renamed ones collapse to the new canonical
+    name; rows are streamed and written back in chunks (python manage.py
+    retag_skills).
+    """
+    matcher = get_matcher()
+    latest = Extraction.objects.filter(candidate=OuterRef("candidate")).order_by("-created_at").values("id")[:1]
+    qs = (
+        Extraction.objects.filter(status="done", id=Subquery(latest))
+        .select_related("candidate")
+        .only("id", "raw_text", "extracted_json", "candidate__id", "candidate__skills")
+    )
+
+    scanned = updated = 0
+    exts, cands = [], []
+
+    def flush():
+        if not dry_run:
+            Extraction.objects.bulk_update(exts, ["extracted_json", "updated_at"])
+            Candidate.objects.bulk_update(cands, ["skills", "updated_at"])
+        exts.clear()
+        cands.clear()
+
+    for ext in qs.iterator(chunk_size=RETAG_CHUNK):
+        scanned += 1
+        prev = (ext.extracted_json or {}).get("skills") or []
+        skills = sorted(set(matcher.find(ext.raw_text)))[:20]
+        if skills != prev:
+            now = timezone.now()
+            ext.extracted_json = {**(ext.extracted_json or {}), "skills": skills}
+            ext.updated_at = ext.candidate.updated_at = now
+            ext.candidate.skills = skills
+            exts.append(ext)
+            cands.append(ext.candidate)
+            updated += 1
+        if len(exts) >= RETAG_CHUNK:
+            flush()
+    flush()
+    return {"taxonomy_version": matcher.version, "scanned": scanned, "updated": updated, "dry_run": dry_run}
+
+@shared_task(name="precompute_document_request_task", bind=True, max_retries=None)
+def precompute_document_request_task(self, candidate_id: str):
+    """
+    Draft and cache the document-request message for the default org and
+    upload link (see doc_request), so request-documents answers from cache.
+    Does nothing if the cached message was drafted from the same inputs.
+    """
+    cand = Candidate.objects.filter(id=candidate_id).first()
+    if cand is None:
+        return {"candidate_id": candidate_id, "status": "missing"}
+    last = cand.extractions.order_by("-created_at").first()
+    payload = doc_request.candidate_payload(cand, (last.extracted_json if last else None) or {})
+    upload_url = doc_request.default_upload_url(cand.id)
+    org_name, support_email = doc_request.default_sender()
+
+    key = doc_request.inputs_key(payload, upload_url, org_name, support_email)
+    if doc_request.cached(cand.id, key, count=False) is not None:
+        return {"candidate_id": candidate_id, "status": "cached"}
+    try:
+        data = doc_request.draft(payload, upload_url, org_name, support_email)
+    except LLMThrottled as e:
+        raise self.retry(countdown=e.retry_after)
+    except LLMTimeout:
+        return {"candidate_id": candidate_id, "status": "timeout"}
+    if not data:
+        return {"candidate_id": candidate_id, "status": "skipped"}  # no LLM configured / providers failed
+    doc_request.store(cand.id, key, data)
+    return {"candidate_id": candidate_id, "status": "done"}
@@ -0,0 +1,98 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api import views
+from api.models import Candidate, Resume, UploadBatch
+
+
+def pdf(name, body=None):
+    return SimpleUploadedFile(name, b"%PDF-1.4 " + (body or name).encode(), content_type="application/pdf")
+
+
+def make_zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    return SimpleUploadedFile("batch.zip", buf.getvalue(), content_type="application/zip")
+
+
+class BulkUploadTests(TestCase):
+    def setUp(self):
+        self.docs = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.docs, True)
+        patcher = override_settings(DOCS_DIR=self.docs)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.group = mock.patch.object(views, "group").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def post(self, **files):
+        return self.client.post(reverse("bulk_upload_resumes"), files)
+
+    def test_files_are_stored_and_queued(self):
+        resp = self.post(resumes=[pdf("a.pdf"), pdf("b.pdf"), pdf("a-again.pdf", "a.pdf")])
+        self.assertEqual(resp.status_code, 202)
+        body = resp.json()
+        self.assertEqual(body["accepted"], 2)
+        self.assertEqual([d["filename"] for d in body["duplicates"]], ["a-again.pdf"])
+        self.assertEqual(Resume.objects.filter(batch_id=body["batch_id"]).count(), 2)
+        for r in Resume.objects.all():
+            with open(r.file_path, "rb") as f:
+                self.assertTrue(f.read().startswith(b"%PDF-1.4 "))
+        self.group.return_value.apply_async.assert_called_once()
+
+    def test_batch_limit(self):
+        with mock.patch.object(views, "MAX_BULK_FILES", 2):
+            body = self.post(resumes=[pdf("a.pdf"), pdf("b.pdf"), pdf("c.pdf")]).json()
+        self.assertEqual(body["accepted"], 2)
+        self.assertEqual(body["rejected"], [{"filename": "c.pdf", "error": "batch limit reached (max 2)"}])
+
+    def test_more_files_than_djangos_default_part_limit(self):
+        body = self.post(resumes=[pdf(f"r{i}.pdf") for i in range(150)]).json()
+        self.assertEqual((body["accepted"], body["rejected_total"]), (150, 0))
+
+    def test_zip_member_names(self):
+        z = make_zip([
+            ("cv/", b""),
+            ("cv/one.pdf", b"%PDF-1.4 one"),
+            ("../../escape.pdf", b"%PDF-1.4 escape"),
+            ("__MACOSX/cv/._one.pdf", b"resource fork"),
+            ("notes.txt", b"hello"),
+        ])
+        body = self.post(zip=z).json()
+        self.assertEqual(body["accepted"], 2)
+        self.assertEqual(body["rejected"], [{"filename": "notes.txt", "error": "unsupported file type; use .pdf or .docx"}])
+        for r in Resume.objects.all():
+            self.assertTrue(r.file_path.startswith(self.docs + "/"), r.file_path)
+
+    def test_size_limit_applies_to_files_and_zip_members(self):
+        z = make_zip([("big.pdf", b"%PDF-1.4 " + b"x" * 64), ("ok.pdf", b"%PDF-1.4")])
+        with mock.patch.object(views, "MAX_RESUME_SIZE", 32):
+            body = self.post(resumes=[pdf("huge.pdf", "y" * 64)], zip=z).json()
+        self.assertEqual(body["accepted"], 1)
+        self.assertEqual([r["filename"] for r in body["rejected"]], ["huge.pdf", "big.pdf"])
+
+    def test_empty_zip(self):
+        resp = self.post(zip=make_zip([]))
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()["accepted"], 0)
+        self.group.assert_not_called()
+
+    def test_non_zip_part_is_rejected_and_cleaned_up(self):
+        resp = self.post(resumes=[pdf("a.pdf")], zip=SimpleUploadedFile("x.zip", b"not a zip"))
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(UploadBatch.objects.exists())
+        self.assertFalse(Candidate.objects.exists())
+        self.assertEqual([p for p in os.listdir(self.docs) if not p.startswith(".")], [])
+
+    def test_nothing_attached(self):
+        self.assertEqual(self.post().status_code, 400)
@@ -0,0 +1,47 @@
+import json
+
+from django.test import SimpleTestCase
+
+from api.json_stream import IncrementalJSONObject
+
+MESSAGE = {"subject": "PAN & Aadhaar", "email_body": "Dear A,\n\"quoted\" {braces}", "sms_body": "x" * 50}
+
+
+def feed_chars(parser, text):
+    for ch in text:
+        if parser.feed(ch):
+            return True
+    return False
+
+
+class IncrementalJSONObjectTests(SimpleTestCase):
+    def test_whole_object_in_small_chunks(self):
+        text = json.dumps(MESSAGE) + " trailing tokens"
+        p = IncrementalJSONObject()
+        for i in range(0, len(text), 3):
+            if p.feed(text[i : i + 3]):
+                break
+        self.assertEqual(p.result(), MESSAGE)
+
+    def test_stops_once_required_keys_are_complete(self):
+        text = json.dumps(MESSAGE)
+        p = IncrementalJSONObject(required=["subject", "email_body"])
+        self.assertTrue(feed_chars(p, text))
+        self.assertEqual(p.result(), {"subject": MESSAGE["subject"], "email_body": MESSAGE["email_body"]})
+        self.assertLess(len(p.text), len(text))
+
+    def test_preamble_and_fence_are_skipped(self):
+        for pre in ("Here is the JSON:\n", "```json\n", "Sure. ```json\n"):
+            p = IncrementalJSONObject()
+            self.assertTrue(feed_chars(p, pre + json.dumps(MESSAGE) + "\n```"))
+            self.assertEqual(p.result(), MESSAGE)
+
+    def test_partial_string_value(self):
+        p = IncrementalJSONObject()
+        p.feed('{"subject": "Hi", "email_body": "Dear A,\\nplease up')
+        self.assertEqual(p.partial(), {"subject": "Hi", "email_body": "Dear A,\nplease up"})
+
+    def test_malformed_output_fails_fast(self):
+        for bad in ('{"a": tru e, "b": 1}', "[1, 2]", "{...}", "prose " * 400):
+            with self.assertRaises(ValueError, msg=bad):
+                feed_chars(IncrementalJSONObject(), bad)
@@ -0,0 +1,74 @@
+import itertools
+import os
+import unittest
+from types import SimpleNamespace as NS
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import llm_cache, redis_client
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def key(n):
+    return llm_cache.make_key({"type": "object"}, "system", f"resume {n}", "openai", "gpt-4o-mini")
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+class CacheTests(SimpleTestCase):
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=self.server)
+        clock = itertools.count(1_000_000)  # strictly increasing access times
+        for obj, name, value in (
+            (redis_client, "_client", self.redis),
+            (llm_cache, "time", NS(time=lambda: float(next(clock)))),
+        ):
+            patcher = mock.patch.object(obj, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_key_covers_prompt_and_model(self):
+        self.assertEqual(key(1), key(1))
+        self.assertNotEqual(key(1), key(2))
+        other_model = llm_cache.make_key({"type": "object"}, "system", "resume 1", "openai", "gpt-4o")
+        self.assertNotEqual(key(1), other_model)
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(llm_cache.get(key(1)))
+        llm_cache.put(key(1), {"name": "Asha"})
+        self.assertEqual(llm_cache.get(key(1)), {"name": "Asha"})
+        self.assertEqual(llm_cache.stats(), {"hits": 1, "misses": 1, "entries": 1})
+
+    def test_entries_expire_with_ttl(self):
+        with mock.patch.dict(os.environ, {"LLM_CACHE_TTL": "60"}):
+            llm_cache.put(key(1), {"name": "Asha"})
+        self.assertLessEqual(self.redis.ttl(key(1)), 60)
+
+    def test_evicts_least_recently_used(self):
+        with mock.patch.dict(os.environ, {"LLM_CACHE_MAX_ENTRIES": "2"}):
+            llm_cache.put(key(1), {"n": 1})
+            llm_cache.put(key(2), {"n": 2})
+            llm_cache.get(key(1))  # 2 is now the least recently used
+            llm_cache.put(key(3), {"n": 3})
+        self.assertIsNone(llm_cache.get(key(2)))
+        self.assertEqual(llm_cache.get(key(1)), {"n": 1})
+        self.assertEqual(llm_cache.get(key(3)), {"n": 3})
+        self.assertEqual(llm_cache.stats()["entries"], 2)
+
+    def test_disabled(self):
+        with mock.patch.dict(os.environ, {"LLM_CACHE_ENABLED": "0"}):
+            llm_cache.put(key(1), {"n": 1})
+            self.assertIsNone(llm_cache.get(key(1)))
+        self.assertEqual(self.redis.dbsize(), 0)
+
+    def test_redis_down_is_a_miss(self):
+        llm_cache.put(key(1), {"n": 1})
+        self.server.connected = False
+        self.assertIsNone(llm_cache.get(key(1)))
+        self.assertIsNone(llm_cache.put(key(2), {"n": 2}))
+        self.assertEqual(llm_cache.stats(), {"hits": 0, "misses": 0, "entries": 0})
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+from types import SimpleNamespace as NS
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import llm_client, llm_health
+from api.llm_client import LLMThrottled, LLMTimeout
+
+
+class ClientRegistryTests(SimpleTestCase):
+    def setUp(self):
+        llm_client.reset_clients()
+
+    def tearDown(self):
+        llm_client.reset_clients()
+
+    def test_client_is_built_once_per_process(self):
+        self.assertIs(llm_client.get_client("http"), llm_client.get_client("http"))
+
+    def test_forked_child_builds_its_own_client(self):
+        parent = llm_client.get_client("http")
+        with mock.patch.object(llm_client.os, "getpid", return_value=os.getpid() + 1):
+            child = llm_client.get_client("http")
+            self.assertIsNot(child, parent)
+            self.assertIs(llm_client.get_client("http"), child)
+
+
+class OfflineBatchApiTests(SimpleTestCase):
+    REQUESTS = [("c1", "system", "user one"), ("c2", "system", "user two")]
+
+    def use(self, provider, client):
+        for target, value in (("_batch_provider", provider), ("get_client", client)):
+            patcher = mock.patch.object(llm_client, target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_openai_submit_and_fetch(self):
+        client = mock.MagicMock()
+        client.files.create.return_value = NS(id="file-1")
+        client.batches.create.return_value = NS(id="batch-1")
+        self.use("openai", client)
+
+        self.assertEqual(llm_client.submit_structured_batch(self.REQUESTS), "batch-1")
+        lines = client.files.create.call_args.kwargs["file"][1].decode().splitlines()
+        self.assertEqual([json.loads(l)["custom_id"] for l in lines], ["c1", "c2"])
+        self.assertEqual(client.batches.create.call_args.kwargs["input_file_id"], "file-1")
+
+        client.batches.retrieve.return_value = NS(status="in_progress", output_file_id=None)
+        self.assertIsNone(llm_client.fetch_structured_batch("batch-1"))
+
+        def row(cid, content):
+            return json.dumps({"custom_id": cid, "response": {"body": {"choices": [{"message": {"content": content}}]}}})
+
+        client.batches.retrieve.return_value = NS(status="completed", output_file_id="out-1")
+        client.files.content.return_value = NS(text="\n".join([
+            row("c1", 'Here you go: {"name": "One"}'),
+            json.dumps({"custom_id": "c2", "error": {"message": "boom"}}),
+            "",
+        ]))
+        self.assertEqual(llm_client.fetch_structured_batch("batch-1"), {"c1": {"name": "One"}, "c2": None})
+
+    def test_anthropic_submit_and_fetch(self):
+        client = mock.MagicMock()
+        batches = client.beta.messages.batches
+        batches.create.return_value = NS(id="msgbatch-1")
+        self.use("anthropic", client)
+
+        self.assertEqual(llm_client.submit_structured_batch(self.REQUESTS), "msgbatch-1")
+        sent = batches.create.call_args.kwargs["requests"]
+        self.assertEqual([r["custom_id"] for r in sent], ["c1", "c2"])
+        self.assertEqual(sent[1]["params"]["messages"][0]["content"], "user two")
+
+        batches.retrieve.return_value = NS(processing_status="in_progress")
+        self.assertIsNone(llm_client.fetch_structured_batch("msgbatch-1"))
+
+        batches.retrieve.return_value = NS(processing_status="ended")
+        batches.results.return_value = [
+            NS(custom_id="c1", result=NS(type="succeeded", message=NS(content=[NS(type="text", text='{"name": "One"}')]))),
+            NS(custom_id="c2", result=NS(type="errored")),
+        ]
+        self.assertEqual(llm_client.fetch_structured_batch("msgbatch-1"), {"c1": {"name": "One"}, "c2": None})
+
+
+class FailoverTests(SimpleTestCase):
+    """_failover with fake providers standing in for _call_provider."""
+
+    def setUp(self):
+        llm_health._registry.clear()
+        self.release = threading.Event()
+        self.calls = []
+        self.providers = {}
+        for target, value in (("_call_provider", self.fake), ("_HEDGE", True)):
+            patcher = mock.patch.object(llm_client, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(llm_health, "_HEDGE_MIN_SECS", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(llm_health._registry.clear)
+        self.addCleanup(self.release.set)  # unblock a hung fake before the next test
+
+    def fake(self, provider, system_prompt, user_prompt, deadline, attempts, stream=None, answers=1):
+        self.calls.append(provider)
+        return self.providers[provider]()
+
+    def hang(self):
+        self.release.wait(10)
+        return '{"from": "slow"}'
+
+    def failover(self, chain, budget=5.0):
+        return llm_client._failover(chain, "system", "user", budget)
+
+    def fast_p95(self, provider):
+        for _ in range(llm_health._P95_MIN_SAMPLES):
+            llm_health.get(provider).record_success(0.02)
+
+    def test_hedges_to_next_provider_after_p95(self):
+        self.fast_p95("a")
+        self.providers = {"a": self.hang, "b": lambda: '{"from": "b"}'}
+        self.assertEqual(self.failover(["a", "b"]), '{"from": "b"}')
+        self.assertEqual(self.calls, ["a", "b"])
+
+    def test_no_hedge_when_disabled(self):
+        self.fast_p95("a")
+        self.providers = {"a": lambda: (self.release.wait(0.2), '{"from": "a"}')[1], "b": lambda: '{"from": "b"}'}
+        with mock.patch.object(llm_client, "_HEDGE", False):
+            self.assertEqual(self.failover(["a", "b"]), '{"from": "a"}')
+        self.assertEqual(self.calls, ["a"])
+
+    def test_fails_over_on_error(self):
+        def boom():
+            raise RuntimeError("500")
+        self.providers = {"a": boom, "b": lambda: '{"from": "b"}'}
+        self.assertEqual(self.failover(["a", "b"]), '{"from": "b"}')
+        self.assertEqual(self.calls, ["a", "b"])
+
+    def test_all_failed_is_none_and_all_throttled_raises(self):
+        def boom():
+            raise RuntimeError("500")
+        self.providers = {"a": boom, "b": lambda: ""}
+        self.assertIsNone(self.failover(["a", "b"]))
+
+        def throttled(wait):
+            def call():
+                raise LLMThrottled(wait)
+            return call
+        self.providers = {"a": throttled(9.0), "b": throttled(4.0)}
+        with self.assertRaises(LLMThrottled) as ctx:
+            self.failover(["a", "b"])
+        self.assertEqual(ctx.exception.retry_after, 4.0)
+
+    def test_deadline(self):
+        self.providers = {"a": self.hang, "b": self.hang}
+        with self.assertRaises(LLMTimeout):
+            self.failover(["a", "b"], budget=0.1)
+
+    def test_open_circuits_skip_provider_or_throttle(self):
+        with mock.patch.object(llm_health, "_BREAKER_FAILURES", 1):
+            llm_health.get("a").record_failure()
+            self.providers = {"b": lambda: '{"from": "b"}'}
+            self.assertEqual(self.failover(["a", "b"]), '{"from": "b"}')
+            llm_health.get("b").record_failure()
+            with self.assertRaises(LLMThrottled) as ctx:
+                self.failover(["a", "b"])
+        self.assertGreater(ctx.exception.retry_after, 0)
+        self.assertEqual(self.calls, ["b"])
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import llm_health
+from api.llm_health import ProviderHealth
+
+
+class LLMHealthTestCase(SimpleTestCase):
+    def setUp(self):
+        llm_health._registry.clear()
+        self.addCleanup(llm_health._registry.clear)
+
+
+@mock.patch.object(llm_health, "_BREAKER_FAILURES", 3)
+@mock.patch.object(llm_health, "_BREAKER_COOLDOWN", 30.0)
+class CircuitBreakerTests(LLMHealthTestCase):
+    def test_opens_after_consecutive_failures_then_half_opens(self):
+        h = ProviderHealth("p")
+        for _ in range(2):
+            h.record_failure(now=100.0)
+        self.assertTrue(h.available(100.0))
+        h.record_failure(now=100.0)
+        self.assertFalse(h.available(129.9))
+        self.assertEqual(h.available_in(110.0), 20.0)
+
+        # Half-open after the cooldown: one more failure re-opens it...
+        self.assertTrue(h.available(130.0))
+        h.record_failure(now=130.0)
+        self.assertFalse(h.available(159.0))
+        # ...a success closes it.
+        h.record_success(0.5)
+        self.assertTrue(h.available(131.0))
+        h.record_failure(now=131.0)
+        self.assertTrue(h.available(131.0))
+
+    def test_rate_limit_backoff(self):
+        h = ProviderHealth("p")
+        h.record_failure(rate_limited=True, retry_after=12.0, now=0.0)
+        self.assertEqual(h.available_in(2.0), 10.0)
+        h2 = ProviderHealth("q")
+        waits = []
+        for _ in range(2):
+            h2.record_failure(rate_limited=True, now=0.0)
+            waits.append(h2.available_in(0.0))
+        self.assertEqual(waits, [1.0, 2.0])  # exponential without Retry-After
+
+    def test_route_skips_unavailable_and_reports_next(self):
+        llm_health.get("a").record_failure(rate_limited=True, retry_after=5.0, now=0.0)
+        self.assertEqual(llm_health.route(["a", "b"], now=1.0), ["b"])
+        for _ in range(3):
+            llm_health.get("b").record_failure(now=0.0)
+        self.assertEqual(llm_health.route(["a", "b"], now=1.0), [])
+        self.assertEqual(llm_health.next_available(["a", "b"], now=1.0), 4.0)
+
+
+class RoutingOrderTests(LLMHealthTestCase):
+    def test_configured_order_while_healthy(self):
+        llm_health.get("a").record_success(1.0)
+        llm_health.get("b").record_success(0.5)
+        self.assertEqual(llm_health.route(["a", "b", "c"], now=0.0), ["a", "b", "c"])
+
+    def test_slow_provider_moves_behind_the_others(self):
+        for _ in range(5):
+            llm_health.get("a").record_success(4.0)
+            llm_health.get("b").record_success(1.0)
+        self.assertEqual(llm_health.route(["a", "b", "c"], now=0.0), ["b", "c", "a"])
+
+    def test_error_prone_provider_moves_behind_the_others(self):
+        a = llm_health.get("a")
+        for _ in range(4):
+            a.record_failure(now=0.0)  # error EWMA 0.59 with alpha 0.2; breaker still closed
+        self.assertTrue(a.available(0.0))
+        self.assertEqual(llm_health.route(["a", "b"], now=0.0), ["b", "a"])
+        for _ in range(10):
+            a.record_success(1.0)
+        self.assertEqual(llm_health.route(["a", "b"], now=0.0), ["a", "b"])
+
+
+class HedgeDelayTests(SimpleTestCase):
+    def test_default_until_enough_samples_then_p95(self):
+        h = ProviderHealth("p")
+        for _ in range(llm_health._P95_MIN_SAMPLES - 1):
+            h.record_success(2.0)
+        self.assertEqual(h.hedge_delay(), llm_health._HEDGE_DEFAULT_SECS)
+        h = ProviderHealth("p")
+        for i in range(100):
+            h.record_success(1.0 + i / 100)
+        self.assertEqual(h.p95(), 1.95)
+        self.assertEqual(h.hedge_delay(), 1.95)
+
+    def test_never_below_minimum(self):
+        h = ProviderHealth("p")
+        for _ in range(20):
+            h.record_success(0.01)
+        self.assertEqual(h.hedge_delay(), llm_health._HEDGE_MIN_SECS)
@@ -0,0 +1,113 @@
+import os
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import llm_client, llm_ratelimit, redis_client
+from api.llm_client import LLMError, LLMThrottled
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  (fakeredis runs the Lua script with it)
+except ImportError:
+    fakeredis = None
+
+
+class LimitsTests(SimpleTestCase):
+    def test_provider_override_wins(self):
+        env = {"LLM_RPM": "60", "LLM_TPM": "1000", "LLM_RPM_OPENAI": "500"}
+        with mock.patch.dict(os.environ, env):
+            self.assertEqual(llm_ratelimit.limits("openai"), (500, 1000))
+            self.assertEqual(llm_ratelimit.limits("anthropic"), (60, 1000))
+
+    def test_unlimited_never_touches_redis(self):
+        with mock.patch.dict(os.environ, {"LLM_RPM": "0", "LLM_TPM": "0"}), \
+                mock.patch.object(llm_ratelimit, "_redis", side_effect=AssertionError("redis used")):
+            self.assertEqual(llm_ratelimit.acquire("openai", 10_000), 0.0)
+
+    def test_redis_down_lets_the_call_through(self):
+        with mock.patch.dict(os.environ, {"LLM_RPM": "1"}), \
+                mock.patch.object(llm_ratelimit, "_script", None), \
+                mock.patch.object(llm_ratelimit, "_redis", side_effect=ConnectionError("down")):
+            self.assertEqual(llm_ratelimit.acquire("openai", 10), 0.0)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] not installed")
+class BucketTests(SimpleTestCase):
+    """The Lua buckets against an in-process Redis."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        for obj, name, value in ((redis_client, "_client", self.redis), (llm_ratelimit, "_script", None)):
+            patcher = mock.patch.object(obj, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_request_bucket_empties(self):
+        with mock.patch.dict(os.environ, {"LLM_RPM": "2", "LLM_TPM": "0"}):
+            self.assertEqual(llm_ratelimit.acquire("openai", 1), 0.0)
+            self.assertEqual(llm_ratelimit.acquire("openai", 1), 0.0)
+            wait = llm_ratelimit.acquire("openai", 1)
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 30)
+
+    def test_token_bucket_charges_cost_and_refuses_without_charging(self):
+        with mock.patch.dict(os.environ, {"LLM_RPM": "0", "LLM_TPM": "1000"}):
+            self.assertEqual(llm_ratelimit.acquire("openai", 700), 0.0)
+            self.assertGreater(llm_ratelimit.acquire("openai", 700), 0)
+            self.assertEqual(llm_ratelimit.acquire("openai", 200), 0.0)  # the refused 700 wasn't charged
+
+    def test_providers_have_separate_buckets(self):
+        with mock.patch.dict(os.environ, {"LLM_RPM": "1", "LLM_TPM": "0"}):
+            self.assertEqual(llm_ratelimit.acquire("openai", 1), 0.0)
+            self.assertEqual(llm_ratelimit.acquire("anthropic", 1), 0.0)
+            self.assertGreater(llm_ratelimit.acquire("openai", 1), 0)
+
+
+class ChargeTests(SimpleTestCase):
+    """How llm_client charges the limiter."""
+
+    def setUp(self):
+        self.acquire = mock.Mock(return_value=0.0)
+        for obj, name, value in (
+            (llm_client.llm_ratelimit, "acquire", self.acquire),
+            (llm_client, "_record", mock.Mock()),
+            (llm_client, "_STRUCTURED_CALLS", {"openai": self.call}),
+        ):
+            patcher = mock.patch.object(obj, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.results = []
+
+    def call(self, system_prompt, user_prompt, timeout):
+        r = self.results.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    def call_provider(self, answers=1):
+        deadline = llm_client.time.monotonic() + 5
+        return llm_client._call_provider("openai", "s" * 400, "u" * 400, deadline, 2, answers=answers)
+
+    def test_each_attempt_is_charged(self):
+        self.results = [LLMError("500"), '{"ok": 1}']
+        with mock.patch("tenacity.nap.time.sleep"):
+            self.assertEqual(self.call_provider(), '{"ok": 1}')
+        self.assertEqual(self.acquire.call_count, 2)
+
+    def test_output_estimate_scales_with_answers(self):
+        self.results = ['{"ok": 1}', '{"ok": 1}']
+        self.call_provider()
+        self.call_provider(answers=5)
+        one, five = (c.args[1] for c in self.acquire.call_args_list)
+        self.assertEqual(one, 200 + llm_client._EST_OUTPUT_TOKENS)
+        self.assertEqual(five, 200 + 5 * llm_client._EST_OUTPUT_TOKENS)
+
+    def test_throttled_attempt_is_not_retried(self):
+        self.acquire.side_effect = [0.0, 7.0]
+        self.results = [LLMError("500")]
+        with mock.patch("tenacity.nap.time.sleep"), self.assertRaises(LLMThrottled) as ctx:
+            self.call_provider()
+        self.assertEqual(ctx.exception.retry_after, 7.0)
+        self.assertEqual(self.acquire.call_count, 2)
@@ -0,0 +1,253 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import parsing
+from api.llm_client import LLMThrottled
+from api.parsing import _strip_trailing_meta, deterministic_extract
+
+RESUME = """Resume
+Jane Doe
+Pune | +91 98765 43210 | jane.doe@example.com | github.com/janedoe
+EXPERIENCE
+Backend Engineer, Acme Corp | Jan 2020 - Present
+Built REST APIs in Python and Django; interested in Kubernetes.
+"""
+
+
+class DeterministicExtractTests(SimpleTestCase):
+    def test_header_fields(self):
+        out = deterministic_extract(RESUME)
+        self.assertEqual(out["name"], "Jane Doe")
+        self.assertEqual(out["email"], "jane.doe@example.com")
+        self.assertEqual(out["phone"], "919876543210")
+        self.assertEqual((out["designation"], out["company"]), ("Backend Engineer", "Acme Corp"))
+        self.assertIn("django", out["skills"])
+        self.assertIn("kubernetes", out["skills"])
+
+    def test_phone_does_not_span_lines(self):
+        out = deterministic_extract("Jane Doe\nRoom 12\n345 678\n")
+        self.assertEqual(out["phone"], "")
+
+    def test_empty_text(self):
+        out = deterministic_extract("")
+        self.assertEqual((out["name"], out["email"], out["skills"]), ("", "", []))
+
+    def test_strip_trailing_meta(self):
+        self.assertEqual(_strip_trailing_meta("Acme Corp Jan 2020 - Present"), "Acme Corp")
+        self.assertEqual(_strip_trailing_meta("Acme Corp | Pune"), "Acme Corp")
+        self.assertEqual(_strip_trailing_meta("Acme Corp 2018-2021"), "Acme Corp")
+
+
+class ConfidenceGateTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(parsing.metrics, "incr")
+        self.incr = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rule(self, **over):
+        return {**deterministic_extract(RESUME), **over}
+
+    def test_rule_confidence(self):
+        conf = parsing.rule_confidence(self.rule())
+        self.assertEqual(conf, {"name": 0.9, "email": 1.0, "phone": 1.0, "company": 0.9, "designation": 0.9})
+        conf = parsing.rule_confidence(self.rule(name="Senior Engineer", designation="Acme Corp Pune India", phone=""))
+        self.assertEqual((conf["name"], conf["designation"], conf["company"], conf["phone"]), (0.6, 0.6, 0.6, 0.0))
+        self.assertEqual(parsing.rule_confidence({}), dict.fromkeys(parsing._GATED_FIELDS, 0.0))
+
+    def test_confident_rule_result_skips_the_llm(self):
+        self.assertIsNone(parsing._gate(self.rule()))
+        self.incr.assert_called_once_with("llm_gate_skip")
+
+    def test_partial_asks_only_for_missing_fields(self):
+        self.assertEqual(parsing._gate(self.rule(phone="")), ["phone"])
+        self.assertEqual(parsing._gate(self.rule(phone="", skills=[])), ["phone", "skills"])
+        self.incr.assert_called_with("llm_gate_partial")
+
+        schema, system, user = parsing._llm_request(RESUME, self.rule(phone=""), ["phone"])
+        self.assertEqual((list(schema["properties"]), schema["required"]), (["phone"], ["phone"]))
+        self.assertIn("fields: phone.", system)
+
+    def test_full_request(self):
+        full = list(parsing._EXTRACT_SCHEMA["required"])
+        self.assertEqual(parsing._gate({}), full)
+        with mock.patch.object(parsing, "LLM_PARTIAL_CHARS", 0):
+            self.assertEqual(parsing._gate(self.rule(phone="")), full)
+        with mock.patch.object(parsing, "LLM_SKIP_THRESHOLD", 1.1):
+            self.assertEqual(parsing._gate(self.rule()), full)
+        self.assertEqual([c.args[0] for c in self.incr.call_args_list], ["llm_gate_full"] * 3)
+        self.assertIs(parsing._llm_request(RESUME, {}, full)[0], parsing._EXTRACT_SCHEMA)
+
+
+class TrimForLLMTests(SimpleTestCase):
+    HEADER = ["Jane Doe", "jane.doe@example.com | +91 98765 43210"]
+
+    def resume(self, **sections):
+        lines = list(self.HEADER)
+        for title, body in sections.items():
+            lines.append(title.upper())
+            lines.extend(body)
+        return "\n".join(lines)
+
+    def test_short_or_unbudgeted_text_is_unchanged(self):
+        text = self.resume(experience=["Engineer, Acme"])
+        self.assertEqual(parsing.trim_for_llm(text, 1000), text)
+        self.assertEqual(parsing.trim_for_llm(text * 100, 0), text * 100)
+
+    def test_text_without_headings_is_cut_from_the_top(self):
+        text = "x" * 1000
+        self.assertEqual(parsing.trim_for_llm(text, 10), "x" * 40)
+
+    def test_keeps_header_experience_and_skills_in_order(self):
+        text = self.resume(
+            education=[f"Degree {i} at a university far away" for i in range(40)],
+            experience=["Backend Engineer, Acme Corp", "Built REST APIs"],
+            projects=[f"Project {i} with a long description" for i in range(40)],
+            skills=["Python, Django, Postgres"],
+        )
+        out = parsing.trim_for_llm(text, 60)
+        self.assertLessEqual(parsing.estimate_tokens(out), 60)
+        self.assertEqual(out.split("\n"), self.HEADER + [
+            "EXPERIENCE", "Backend Engineer, Acme Corp", "Built REST APIs", "SKILLS", "Python, Django, Postgres",
+        ])
+
+    def test_long_experience_does_not_starve_skills(self):
+        text = self.resume(
+            experience=[f"Engineer {i}, Company {i} | built things" for i in range(100)],
+            skills=["Python, Django, Postgres"],
+        )
+        out = parsing.trim_for_llm(text, 120)
+        self.assertLessEqual(parsing.estimate_tokens(out), 120)
+        self.assertIn("Python, Django, Postgres", out)
+        self.assertIn("Engineer 0, Company 0 | built things", out)
+
+    def test_budget_follows_first_provider(self):
+        env = {"LLM_PROMPT_TOKENS": "3000", "LLM_PROMPT_TOKENS_ANTHROPIC": "500"}
+        with mock.patch.dict(os.environ, env), mock.patch.object(parsing, "provider_chain", return_value=["anthropic", "openai"]):
+            self.assertEqual(parsing._prompt_token_budget(), 500)
+        with mock.patch.dict(os.environ, env), mock.patch.object(parsing, "provider_chain", return_value=["openai"]):
+            self.assertEqual(parsing._prompt_token_budget(), 3000)
+
+
+def write_pdf(path, pages):
+    """Minimal PDF with one line of Helvetica text per page."""
+    n = len(pages)
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(n)), n),
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, text in enumerate(pages):
+        stream = b"BT /F1 12 Tf 72 720 Td (%s) Tj ET" % text.encode()
+        objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                    b"/Resources << /Font << /F1 3 0 R >> >> >>" % (5 + 2 * i))
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for k, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (k, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _pages_in_child(path, queue):
+    try:
+        queue.put(list(parsing._iter_pdf_pages(path)))
+    except BaseException as e:
+        queue.put(repr(e))
+
+
+class PdfPagesTests(SimpleTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(parsing._drop_pdf_pool)
+        self.pages = [f"Page{i}" for i in range(12)]
+        write_pdf(self.path, self.pages)
+
+    def texts(self, pages):
+        return [p.strip() for p in pages]
+
+    @mock.patch.object(parsing, "_PDF_WORKERS", 2)
+    @mock.patch.object(parsing, "_PDF_PARALLEL_MIN_PAGES", 8)
+    def test_parallel_path_in_order(self):
+        self.assertEqual(self.texts(parsing._iter_pdf_pages(self.path)), self.pages)
+
+    @mock.patch.object(parsing, "_PDF_WORKERS", 2)
+    @mock.patch.object(parsing, "_PDF_PARALLEL_MIN_PAGES", 8)
+    def test_daemonic_process_extracts_in_process(self):
+        # Celery prefork children are daemonic and may not start a process pool.
+        ctx = multiprocessing.get_context("fork")
+        queue = ctx.Queue()
+        child = ctx.Process(target=_pages_in_child, args=(self.path, queue), daemon=True)
+        child.start()
+        out = queue.get(timeout=60)
+        child.join(10)
+        self.assertIsInstance(out, list, out)
+        self.assertEqual(self.texts(out), self.pages)
+
+    @mock.patch.object(parsing, "_PDF_WORKERS", 2)
+    @mock.patch.object(parsing, "_PDF_PARALLEL_MIN_PAGES", 8)
+    def test_pool_that_fails_at_first_submit_falls_back(self):
+        pool = mock.Mock()
+        pool.submit.side_effect = AssertionError("daemonic processes are not allowed to have children")
+        with mock.patch.object(parsing, "_get_pdf_pool", return_value=pool):
+            self.assertEqual(self.texts(parsing._iter_pdf_pages(self.path)), self.pages)
+
+
+class PackedExtractTests(SimpleTestCase):
+    ITEMS = [("a", "resume a", {}), ("b", "resume b", {}), ("c", "resume c", {})]
+
+    def setUp(self):
+        patcher = mock.patch.object(parsing.metrics, "incr")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_demux_keeps_only_requested_ids_once(self):
+        data = {"results": [
+            {"id": "a", "name": "A"}, {"id": "a", "name": "A again"}, {"id": "x", "name": "X"},
+            "not a row", {"name": "no id"}, {"id": 7, "name": "int id"},
+        ]}
+        self.assertEqual(parsing._demux(data, ["a", "b", "7"]), {"a": {"id": "a", "name": "A"}, "7": {"id": 7, "name": "int id"}})
+        self.assertEqual(parsing._demux({"results": "nope"}, ["a"]), {})
+        self.assertEqual(parsing._demux(None, ["a"]), {})
+
+    def run_packed(self, pack_answer):
+        calls = []
+
+        async def fake(schema, system, user, **kw):
+            calls.append(schema is parsing._PACK_SCHEMA)
+            if schema is parsing._PACK_SCHEMA:
+                if isinstance(pack_answer, Exception):
+                    raise pack_answer
+                return pack_answer
+            return {"name": "Alone Person", "email": "", "phone": "", "company": "", "designation": "", "skills": []}
+
+        with mock.patch.object(parsing, "agenerate_structured", fake):
+            return asyncio.run(parsing.allm_extract_packed(self.ITEMS)), calls
+
+    def test_missing_or_foreign_members_are_retried_alone(self):
+        answer = {"results": [
+            {"id": "a", "name": "Pack Person", "email": "a@x.io", "phone": "", "company": "", "designation": "", "skills": []},
+            {"id": "zzz", "name": "Stray"},
+        ]}
+        out, calls = self.run_packed(answer)
+        self.assertEqual([e.name for e in out], ["Pack Person", "Alone Person", "Alone Person"])
+        self.assertEqual(calls, [True, False, False])
+
+    def test_unusable_pack_answer_retries_everyone(self):
+        out, calls = self.run_packed({"oops": []})
+        self.assertEqual([e.name for e in out], ["Alone Person"] * 3)
+        self.assertEqual(calls.count(False), 3)
+
+    def test_throttled_pack_returns_the_error_per_member(self):
+        out, calls = self.run_packed(LLMThrottled(3))
+        self.assertTrue(all(isinstance(e, LLMThrottled) and e.retry_after == 3 for e in out))
+        self.assertEqual(calls, [True])
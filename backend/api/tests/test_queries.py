@@ -0,0 +1,92 @@
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.models import AuditLog, Candidate, DocumentRequest, Extraction
+
+
+class CandidateQueryCountTests(TestCase):
+    """Endpoint query counts must not grow with the number of rows (no N+1)."""
+
+    def make(self, n):
+        for i in range(n):
+            cand = Candidate.objects.create(name=f"c{i}")
+            Extraction.objects.create(candidate=cand, status="queued")
+            Extraction.objects.create(candidate=cand, status="done")
+            DocumentRequest.objects.create(candidate=cand, channel="email", payload_json={})
+
+    def assertQueries(self, expected, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(ctx), expected, "\n".join(q["sql"] for q in ctx.captured_queries))
+        return resp
+
+    def test_list_candidates_is_one_query(self):
+        self.make(3)
+        resp = self.assertQueries(1, reverse("list_candidates"))
+        self.assertEqual({row["extraction_status"] for row in resp.json()}, {"done"})
+        self.make(20)
+        self.assertQueries(1, reverse("list_candidates"))
+        self.assertQueries(1, reverse("list_candidates") + "?limit=5&fields=id,name,extraction_status")
+
+    def test_list_candidates_cursor_page_is_one_query(self):
+        self.make(8)
+        first = self.client.get(reverse("list_candidates") + "?limit=5").json()
+        resp = self.assertQueries(1, reverse("list_candidates") + f"?limit=5&cursor={first['next_cursor']}")
+        self.assertEqual(len(resp.json()["results"]), 3)
+
+    def test_get_candidate_query_count_is_constant(self):
+        self.make(1)
+        cand = Candidate.objects.get()
+        for _ in range(10):
+            DocumentRequest.objects.create(candidate=cand, channel="sms", payload_json={})
+        # candidate, latest extraction, documents, requests
+        resp = self.assertQueries(4, reverse("get_candidate", args=[cand.id]))
+        self.assertEqual(resp.json()["extraction_status"], "done")
+        self.assertEqual(len(resp.json()["requests"]), 11)
+
+
+class IndexPlanTests(TestCase):
+    """The list/detail lookups are served by the indexes added for them."""
+
+    def plan(self, qs):
+        if connection.vendor == "postgresql":
+            # Tiny test tables would otherwise always be seq-scanned.
+            with connection.cursor() as cur:
+                cur.execute("SET enable_seqscan = off")
+            try:
+                return qs.explain()
+            finally:
+                with connection.cursor() as cur:
+                    cur.execute("SET enable_seqscan = on")
+        return qs.explain()
+
+    def test_keyset_page_uses_updated_id_index(self):
+        cand = Candidate.objects.create(name="a")
+        qs = Candidate.objects.order_by("-updated_at", "-id")
+        self.assertIn("candidate_updated_id_idx", self.plan(qs[:51]))
+        after = qs.filter(Q(updated_at__lt=cand.updated_at) | Q(updated_at=cand.updated_at, id__lt=cand.id))
+        self.assertIn("candidate_updated_id_idx", self.plan(after[:51]))
+
+    def test_latest_extraction_uses_candidate_created_index(self):
+        cand = Candidate.objects.create(name="a")
+        qs = Extraction.objects.filter(candidate=cand).order_by("-created_at")[:1]
+        self.assertIn("extraction_cand_created_idx", self.plan(qs))
+
+    def test_latest_resume_uses_candidate_created_index(self):
+        cand = Candidate.objects.create(name="a")
+        # reparse_candidate / parse_resume_batch_task
+        self.assertIn("resume_cand_created_idx", self.plan(cand.resumes.order_by("-created_at")[:1]))
+
+    def test_candidate_detail_lists_use_their_indexes(self):
+        cand = Candidate.objects.create(name="a")
+        # get_candidate
+        self.assertIn("docreq_cand_created_idx", self.plan(cand.document_requests.all().order_by("-created_at")))
+        self.assertIn("document_cand_uploaded_idx", self.plan(cand.documents.all().order_by("-uploaded_at")))
+
+    def test_candidate_audit_history_uses_candidate_ts_index(self):
+        cand = Candidate.objects.create(name="a")
+        self.assertIn("auditlog_cand_ts_idx", self.plan(AuditLog.objects.filter(candidate=cand).order_by("ts")))
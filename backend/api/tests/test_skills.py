@@ -0,0 +1,26 @@
+from django.test import SimpleTestCase
+
+from api.skills import SkillMatcher
+
+
+class SkillMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.matcher = SkillMatcher({"Redis": [], "CSS": [], "Kubernetes": ["k8s"], "Java": []})
+
+    def test_aliases_map_to_canonical_in_order(self):
+        self.assertEqual(self.matcher.find("k8s, Redis and CSS; redis again"), ["kubernetes", "redis", "css"])
+
+    def test_word_boundaries(self):
+        self.assertEqual(self.matcher.find("javascript developer"), [])
+
+    def test_unicode_case_folds_do_not_raise(self):
+        # re.IGNORECASE matches these against ASCII aliases, but .lower() doesn't map them back.
+        self.assertEqual(self.matcher.find("C\u017f\u017f"), ["css"])  # long s casefolds to "s"
+        self.assertEqual(self.matcher.find("\u212a8s"), ["kubernetes"])  # Kelvin sign
+        self.assertEqual(self.matcher.find("RED\u0130S"), [])  # dotted capital I: skipped
+
+    def test_large_taxonomy(self):
+        taxonomy = {f"skill{i:05d}": [f"alias{i:05d}"] for i in range(10000)}
+        matcher = SkillMatcher(taxonomy)
+        text = "Used alias00042 and skill09999, not skill1 or skill000420."
+        self.assertEqual(matcher.find(text), ["skill00042", "skill09999"])
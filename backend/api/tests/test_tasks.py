@@ -0,0 +1,142 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from api.llm_client import LLMThrottled
+from api.models import Candidate, Extraction, Resume
+from api.schemas import Extracted
+from api.skills import SkillMatcher
+from api.tasks import (
+    llm_extract_batch_task, llm_extract_task, llm_offline_batch_task, llm_offline_poll_task, llm_offline_submit_task,
+    parse_resume_batch_task, persist_batch_task, persist_task, retag_skills_task,
+)
+
+
+class LLMExtractTaskTests(SimpleTestCase):
+    def test_llm_failure_falls_back_to_rule_only(self):
+        payload = {"candidate_id": "c1", "text": "resume text", "rule": {"name": "A"}}
+        with mock.patch("api.tasks.llm_extract", side_effect=RuntimeError("provider down")):
+            out = llm_extract_task(payload)
+        self.assertEqual(out["llm"], Extracted().model_dump())
+        self.assertEqual(out["rule"], payload["rule"])
+
+    def test_error_payload_passes_through(self):
+        payload = {"candidate_id": "c1", "error": "no text"}
+        self.assertEqual(llm_extract_task(payload), payload)
+
+
+class PersistTaskTests(TestCase):
+    def payload(self):
+        cand = Candidate.objects.create(name="A")
+        return {"candidate_id": str(cand.id), "text": "resume text", "rule": {}, "llm": Extracted().model_dump()}
+
+    @mock.patch("api.tasks.DOC_REQUEST_PRECOMPUTE", True)
+    def test_precompute_only_when_asked(self):
+        with mock.patch("api.tasks.precompute_document_request_task.delay") as delay:
+            self.assertEqual(persist_task(self.payload())["status"], "done")
+            delay.assert_not_called()
+            payload = self.payload()
+            persist_task(payload, precompute=True)
+            delay.assert_called_once_with(payload["candidate_id"])
+
+
+class RetagSkillsTaskTests(TestCase):
+    @mock.patch("api.tasks.get_matcher", return_value=SkillMatcher({"Redis": [], "Kubernetes": ["k8s"]}))
+    def test_skills_are_recomputed_from_text(self, _matcher):
+        cand = Candidate.objects.create(name="A", skills=["cobol", "redis"])
+        ext = Extraction.objects.create(
+            candidate=cand, status="done", raw_text="Redis, k8s", extracted_json={"skills": ["cobol", "redis"]}
+        )
+        before = cand.updated_at
+        out = retag_skills_task()
+        self.assertEqual((out["scanned"], out["updated"]), (1, 1))
+        cand.refresh_from_db()
+        ext.refresh_from_db()
+        self.assertEqual(cand.skills, ["kubernetes", "redis"])  # "cobol" is no longer in the taxonomy
+        self.assertEqual(ext.extracted_json["skills"], ["kubernetes", "redis"])
+        self.assertGreater(cand.updated_at, before)
+        self.assertEqual(retag_skills_task()["updated"], 0)
+
+
+class ParseResumeBatchTests(TestCase):
+    def setUp(self):
+        self.cands = [Candidate.objects.create(name=f"c{i}") for i in range(2)]
+        for c in self.cands:
+            Resume.objects.create(candidate=c, file_path=f"/resumes/{c.id}.pdf")
+            Extraction.objects.create(candidate=c, status="queued")
+
+    def test_extract_stage_hands_payloads_to_llm_stage(self):
+        ids = [str(c.id) for c in self.cands] + [str(Candidate.objects.create(name="no resume").id)]
+        with mock.patch("api.tasks.extract_text", side_effect=lambda path: f"text of {path}"), \
+                mock.patch("api.tasks.llm_extract_batch_task.delay") as delay:
+            out = parse_resume_batch_task(ids)
+        (payloads,), _ = delay.call_args
+        self.assertEqual([p["candidate_id"] for p in payloads], ids[:2])
+        self.assertTrue(payloads[0]["text"].startswith("text of /resumes/"))
+        self.assertEqual(out[0], {"candidate_id": ids[2], "status": "error", "error": "no resume found"})
+
+    def test_llm_stage_requeues_throttled_and_persists_the_rest(self):
+        payloads = [{"candidate_id": str(c.id), "text": "resume text", "rule": {}} for c in self.cands]
+
+        async def many(items, concurrency, pack):
+            return [Extracted(name="From LLM"), LLMThrottled(7)]
+
+        with mock.patch("api.tasks.llm_extract_many", many), \
+                mock.patch("api.tasks.llm_extract_batch_task.apply_async") as requeue, \
+                mock.patch("api.tasks.persist_batch_task.delay") as persist:
+            self.assertEqual(llm_extract_batch_task(payloads), {"sent": 1, "requeued": 1})
+        requeue.assert_called_once_with(([payloads[1]],), countdown=7)
+        (done,), _ = persist.call_args
+        self.assertEqual([d["llm"]["name"] for d in done], ["From LLM"])
+
+        persist_batch_task(done)
+        self.cands[0].refresh_from_db()
+        self.assertEqual(self.cands[0].extractions.order_by("-created_at").first().status, "done")
+
+
+class OfflineBatchTaskTests(TestCase):
+    def setUp(self):
+        self.cands = [Candidate.objects.create(name=f"c{i}") for i in range(2)]
+        self.ids = [str(c.id) for c in self.cands]
+        for c in self.cands:
+            Resume.objects.create(candidate=c, file_path=f"/resumes/{c.id}.pdf")
+            Extraction.objects.create(candidate=c, status="queued")
+
+    def latest(self, cid):
+        return Extraction.objects.filter(candidate_id=cid).order_by("-created_at").first()
+
+    def test_submit_then_poll(self):
+        with mock.patch("api.tasks.extract_text", return_value="resume text"), \
+                mock.patch("api.tasks.llm_offline_submit_task.delay") as submit:
+            llm_offline_batch_task(self.ids)
+        requests, pending = submit.call_args.args
+        self.assertEqual([r[0] for r in requests], self.ids)
+        self.assertEqual(self.latest(self.ids[0]).raw_text, "resume text")
+
+        with mock.patch("api.tasks.submit_structured_batch", return_value="batch-1"), \
+                mock.patch("api.tasks.llm_offline_poll_task.apply_async") as poll:
+            self.assertEqual(llm_offline_submit_task(requests, pending), {"batch_id": "batch-1", "submitted": 2})
+        self.assertEqual(poll.call_args.args[0], ("batch-1", pending))
+
+        with mock.patch("api.tasks.fetch_structured_batch", return_value=None), \
+                mock.patch("api.tasks.llm_offline_poll_task.apply_async") as again:
+            self.assertEqual(llm_offline_poll_task("batch-1", pending)["status"], "processing")
+        again.assert_called_once()
+
+        # The batch answered for the first candidate only: the second is redone online.
+        answers = {self.ids[0]: {"name": "Batch Name"}, self.ids[1]: None}
+        with mock.patch("api.tasks.fetch_structured_batch", return_value=answers), \
+                mock.patch("api.tasks.llm_extract", return_value=Extracted(name="Online Name")) as online:
+            out = llm_offline_poll_task("batch-1", pending)
+        self.assertEqual([r["retried"] for r in out], [False, True])
+        online.assert_called_once()
+        self.assertEqual(self.latest(self.ids[0]).extracted_json["name"], "Batch Name")
+        self.assertEqual(self.latest(self.ids[1]).extracted_json["name"], "Online Name")
+
+    def test_submit_failure_falls_back_to_online_batch(self):
+        pending = {cid: {"rule": {}, "fields": ["name"]} for cid in self.ids}
+        with mock.patch("api.tasks.submit_structured_batch", side_effect=RuntimeError("no batch API")), \
+                mock.patch("api.tasks.parse_resume_batch_task.delay") as online:
+            out = llm_offline_submit_task([(cid, "s", "u") for cid in self.ids], pending)
+        online.assert_called_once_with(self.ids)
+        self.assertEqual({r["status"] for r in out}, {"requeued"})
@@ -3,7 +3,10 @@ from . import views
 
 urlpatterns = [
     path("healthz", views.health, name="health"),
+    path("metrics", views.metrics_view, name="metrics"),
     path("candidates/upload", views.upload_resume, name="upload_resume"),
+    path("candidates/bulk-upload", views.bulk_upload_resumes, name="bulk_upload_resumes"),
+    path("candidates/bulk-upload/<uuid:batch_id>", views.bulk_upload_status, name="bulk_upload_status"),
     path("candidates", views.list_candidates, name="list_candidates"),
     path("candidates/<uuid:id>", views.get_candidate, name="get_candidate"),
     path("candidates/<uuid:id>/reparse", views.reparse_candidate, name="reparse_candidate"),
@@ -18,6 +18,7 @@
 # import hashlib
 
 # from django.conf import settings
+from django.core.files import File
 # from django.shortcuts import get_object_or_404
 
 # from rest_framework import status
@@ -378,7 +379,7 @@
 """
 api/views.py
 HTTP endpoints for:
-- health check
+- health check, metrics
 - resume upload & candidate listing/detail
 - reparse latest resume
 - AI-backed PAN/Aadhaar request generation (+ optional delivery)
@@ -386,22 +387,33 @@ HTTP endpoints for:
 
 Notes:
 - Uses settings.DOCS_DIR for all file storage (mounted volume).
-- LLM request generation uses generate_structured(); falls back to a template if not configured.
+- LLM request messages come from doc_request: drafted after parsing and cached per candidate,
+  drafted on demand when the inputs changed, a template if no LLM is configured.
 - Sender org is always settings.ORG_NAME (or override per-request); never confuse with candidate_company.
 """
 
 import os
+import json
+import queue
+import threading
 import uuid
-import hashlib
+import base64
+import mimetypes
+import zipfile
+import zlib
 
 from django.conf import settings
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from django.utils.timezone import now
 
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
+from celery import group
 
 from .models import (
     Candidate,
@@ -410,10 +422,13 @@ from .models import (
     DocumentRequest,
     Document,
     AuditLog,
+    UploadBatch,
 )
 from .serializers import CandidateListSerializer
-from .tasks import parse_resume_task
-from .llm_client import generate_structured  # structured JSON helper
+from .storage import sha256_file, sha256_upload, store_upload
+from .tasks import parse_resume_pipeline, parse_resume_batch_task
+from .llm_client import LLMTimeout, LLMThrottled
+from . import doc_request, llm_cache, llm_health, metrics
 from core.messenger import send_email, send_sms
 
 # --------------------------
@@ -425,6 +440,13 @@ MAX_RESUME_SIZE = 5 * 1024 * 1024  # 5 MB
 ALLOWED_DOC_EXTS = {".jpg", ".jpeg", ".png", ".pdf"}
 MAX_DOC_SIZE = 8 * 1024 * 1024  # 8 MB
 
+MAX_BULK_FILES = settings.BULK_UPLOAD_MAX_FILES
+MAX_BULK_REJECTED_LISTED = 200  # per-file rejections echoed back; the rest are only counted
+BULK_PARSE_CHUNK = 25  # candidates per parse_resume_batch_task
+
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+
 
 # --------------------------
 # Health
@@ -434,14 +456,97 @@ def health(_req):
     return Response({"status": "ok"})
 
 
+@api_view(["GET"])
+def metrics_view(_req):
+    """Cluster-wide counters (see api/metrics.py), LLM cache stats, gate skip rate and provider health."""
+    counters = metrics.counters()
+    gated = sum(counters.get(k, 0) for k in ("llm_gate_skip", "llm_gate_partial", "llm_gate_full"))
+    return Response({
+        "counters": counters,
+        "llm_cache": llm_cache.stats(),
+        "llm_skip_rate": round(counters.get("llm_gate_skip", 0) / gated, 4) if gated else 0.0,
+        "llm_providers": llm_health.snapshot(),  # this API process's view
+    })
+
+
 # --------------------------
 # Candidate listing & detail
 # --------------------------
+def _encode_cursor(cand) -> str:
+    raw = f"{cand.updated_at.isoformat()}|{cand.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    """Return (updated_at, id) from an opaque cursor; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        ts, cid = raw.split("|", 1)
+        updated_at = parse_datetime(ts)
+        if updated_at is None:
+            raise ValueError
+        return updated_at, uuid.UUID(cid)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
 @api_view(["GET"])
-def list_candidates(_req):
-    qs = Candidate.objects.order_by("-updated_at").all()
-    data = CandidateListSerializer(qs, many=True).data
-    return Response(data)
+def list_candidates(req):
+    """
+    Query params (all optional):
+      fields=id,name,...   project the response down to these columns
+      limit=<n>            page size (max LIST_MAX_LIMIT); enables the paged response
+      cursor=<opaque>      continue after the `next_cursor` of a previous page
+
+    Without limit/cursor the full list is returned as a plain array (legacy shape).
+    Paged: {"results": [...], "next_cursor": "..." | null}, keyset on (updated_at, id) desc.
+    """
+    allowed = CandidateListSerializer.Meta.fields
+    fields = None
+    if req.query_params.get("fields"):
+        fields = [f.strip() for f in req.query_params["fields"].split(",") if f.strip()]
+        unknown = [f for f in fields if f not in allowed]
+        if unknown:
+            return Response(
+                {"error": f"unknown fields: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    limit_raw = req.query_params.get("limit")
+    cursor = req.query_params.get("cursor")
+    paged = limit_raw is not None or cursor is not None
+    try:
+        limit = int(limit_raw) if limit_raw is not None else LIST_DEFAULT_LIMIT
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+
+    qs = Candidate.objects.order_by("-updated_at", "-id")
+    wanted = fields or allowed
+    if "extraction_status" in wanted:
+        qs = qs.with_latest_extraction_status()
+    # Only read the columns we serialize (+ updated_at for the next cursor).
+    columns = {f for f in wanted if f != "extraction_status"} | {"id", "updated_at"}
+    qs = qs.only(*columns)
+
+    if cursor:
+        try:
+            after_ts, after_id = _decode_cursor(cursor)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        qs = qs.filter(Q(updated_at__lt=after_ts) | Q(updated_at=after_ts, id__lt=after_id))
+
+    if not paged:
+        return Response(CandidateListSerializer(qs, many=True, fields=fields).data)
+
+    rows = list(qs[: limit + 1])
+    page, more = rows[:limit], len(rows) > limit
+    return Response(
+        {
+            "results": CandidateListSerializer(page, many=True, fields=fields).data,
+            "next_cursor": _encode_cursor(page[-1]) if more else None,
+        }
+    )
 
 
 @api_view(["GET"])
@@ -485,12 +590,25 @@ def get_candidate(_req, id):
 # --------------------------
 # Upload resume → enqueue parse
 # --------------------------
+def _find_duplicate_resume(digest: str):
+    """
+    Most recent Resume with this content hash whose blob is still on disk, else None.
+    Content-addressed: identical bytes → same candidate, stored file and Extraction.
+    """
+    r = Resume.objects.select_related("candidate").filter(sha256=digest).order_by("-created_at").first()
+    if r and os.path.exists(r.file_path):
+        return r
+    return None
+
+
 @api_view(["POST"])
 @parser_classes([MultiPartParser, FormParser])
 def upload_resume(req):
     """
     Multipart form with key 'resume' (.pdf | .docx).
     Creates Candidate + Resume + Extraction(queued), saves file to DOCS_DIR/<candidate_uuid>/, and enqueues Celery parse.
+    If a resume with the same SHA-256 is already stored, returns that candidate (200, duplicate=true)
+    without writing the file or enqueueing a parse.
     """
     if "resume" not in req.FILES:
         return Response(
@@ -512,6 +630,27 @@ def upload_resume(req):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    # Hash first so a re-upload of a known file never touches disk or the queue.
+    digest = sha256_upload(f)
+
+    dup = _find_duplicate_resume(digest)
+    if dup:
+        last = dup.candidate.extractions.order_by("-created_at").first()
+        AuditLog.objects.create(
+            actor="system",
+            action="upload_duplicate",
+            candidate=dup.candidate,
+            metadata_json={"sha256": digest, "resume_id": str(dup.id)},
+        )
+        return Response(
+            {
+                "id": str(dup.candidate_id),
+                "status": last.status if last else "unknown",
+                "duplicate": True,
+            },
+            status=status.HTTP_200_OK,
+        )
+
     # Create candidate shell; parse will backfill fields.
     cand = Candidate.objects.create()
 
@@ -520,28 +659,207 @@ def upload_resume(req):
     os.makedirs(cand_dir, exist_ok=True)
     fname = f"resume-{uuid.uuid4().hex}{ext}"""
     abs_path = os.path.join(cand_dir, fname)
-
-    # Save file + compute sha256
-    sha = hashlib.sha256()
-    with open(abs_path, "wb") as out:
-        for chunk in f.chunks():
-            out.write(chunk)
-            sha.update(chunk)
+    store_upload(f, abs_path)
 
     Resume.objects.create(
         candidate=cand,
         file_path=abs_path,
         mime=f.content_type or "",
-        sha256=sha.hexdigest(),
+        sha256=digest,
     )
     Extraction.objects.create(candidate=cand, status="queued")
 
     # Enqueue async parsing
-    parse_resume_task.delay(str(cand.id), abs_path)
+    parse_resume_pipeline(str(cand.id), abs_path, precompute=True).delay()
 
     return Response({"id": str(cand.id), "status": "parsing"}, status=status.HTTP_201_CREATED)
 
 
+# --------------------------
+# Bulk upload (many files or a ZIP) → batched inserts + chunked parse
+# --------------------------
+class _ZipMember(File):
+    """
+    A zip member as a django File for store_upload: opened and decompressed
+    chunk by chunk on read, so a bad member (encrypted, unsupported method,
+    bad CRC) raises while it is being stored.
+    """
+
+    def __init__(self, zf, info):
+        super().__init__(None, os.path.basename(info.filename))
+        self._zf, self._info = zf, info
+
+    def chunks(self, chunk_size=None):
+        with self._zf.open(self._info) as member:
+            while chunk := member.read(chunk_size or self.DEFAULT_CHUNK_SIZE):
+                yield chunk
+
+
+def _iter_bulk_members(req):
+    """
+    Yield (filename, mime, size, file) for every resume in the request: each file
+    under 'resumes', plus every member of an optional 'zip' archive. Members are
+    streamed, never read whole into memory.
+    """
+    for f in req.FILES.getlist("resumes"):
+        yield f.name, f.content_type or "", f.size, f
+
+    z = req.FILES.get("zip")
+    if z:
+        with zipfile.ZipFile(z) as zf:
+            for info in zf.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or info.filename.startswith("__MACOSX/"):
+                    continue
+                # Reading stops at file_size and checks the CRC, so the header size is binding.
+                yield name, mimetypes.guess_type(name)[0] or "", info.file_size, _ZipMember(zf, info)
+
+
+def _unstage(path: str) -> None:
+    """Remove a staged resume and its (otherwise empty) candidate dir."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+@api_view(["POST"])
+@parser_classes([MultiPartParser])
+def bulk_upload_resumes(req):
+    """
+    Multipart form: any number of 'resumes' files (.pdf | .docx) and/or one 'zip'.
+    Each file is placed in DOCS_DIR/<candidate_uuid>/ with storage.store_upload (a
+    rename for spooled uploads; zip members are decompressed straight there) and
+    hashed; known hashes (already stored, or repeated in this batch) are skipped. Candidate/Resume/Extraction
+    rows are created with bulk_create and parsing is enqueued as a group of
+    parse_resume_batch_task chunks.
+
+    Returns 202: {"batch_id", "accepted", "duplicates": [...], "rejected": [...], "rejected_total"}
+    ("rejected" lists at most MAX_BULK_REJECTED_LISTED files).
+    Poll GET /candidates/bulk-upload/<batch_id> for progress.
+    """
+    if not req.FILES.getlist("resumes") and "zip" not in req.FILES:
+        return Response(
+            {"error": "attach 'resumes' files and/or a 'zip' archive"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    staged = []  # (candidate_id, abs_path, mime, sha256)
+    seen = {}    # sha256 → candidate_id within this batch
+    duplicates, rejected = [], []
+    rejected_total = 0
+
+    def reject(name, error):
+        nonlocal rejected_total
+        rejected_total += 1
+        if len(rejected) < MAX_BULK_REJECTED_LISTED:
+            rejected.append({"filename": name, "error": error})
+
+    try:
+        for name, mime, size, f in _iter_bulk_members(req):
+            if len(staged) + len(duplicates) >= MAX_BULK_FILES:
+                reject(name, f"batch limit reached (max {MAX_BULK_FILES})")
+                continue
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in ALLOWED_RESUME_EXTS:
+                reject(name, "unsupported file type; use .pdf or .docx")
+                continue
+            if size > MAX_RESUME_SIZE:
+                reject(name, "file too large (max 5MB)")
+                continue
+
+            cand_id = uuid.uuid4()
+            cand_dir = os.path.join(settings.DOCS_DIR, str(cand_id))
+            os.makedirs(cand_dir, exist_ok=True)
+            abs_path = os.path.join(cand_dir, f"resume-{uuid.uuid4().hex}{ext}")
+            try:
+                store_upload(f, abs_path)
+                digest = sha256_file(abs_path)
+            except (NotImplementedError, zipfile.BadZipFile, zlib.error, EOFError):
+                # unsupported compression method, bad CRC or truncated data in one member
+                _unstage(abs_path)
+                reject(name, "unreadable archive member")
+                continue
+            except RuntimeError:  # encrypted member (NotImplementedError is a RuntimeError: caught above)
+                _unstage(abs_path)
+                reject(name, "encrypted archive member")
+                continue
+
+            dup_id = seen.get(digest)
+            if dup_id is None:
+                dup = _find_duplicate_resume(digest)
+                dup_id = dup.candidate_id if dup else None
+            if dup_id is not None:
+                _unstage(abs_path)
+                duplicates.append({"filename": name, "id": str(dup_id)})
+                continue
+
+            seen[digest] = cand_id
+            staged.append((cand_id, abs_path, mime, digest))
+    except zipfile.BadZipFile:
+        for _, path, _, _ in staged:
+            _unstage(path)
+        return Response({"error": "zip is not a valid archive"}, status=status.HTTP_400_BAD_REQUEST)
+
+    batch = UploadBatch.objects.create()
+    Candidate.objects.bulk_create([Candidate(id=cid) for cid, _, _, _ in staged])
+    Resume.objects.bulk_create(
+        [
+            Resume(candidate_id=cid, file_path=path, mime=mime, sha256=digest, batch=batch)
+            for cid, path, mime, digest in staged
+        ]
+    )
+    Extraction.objects.bulk_create([Extraction(candidate_id=cid, status="queued") for cid, _, _, _ in staged])
+
+    ids = [str(cid) for cid, _, _, _ in staged]
+    if ids:
+        group(
+            parse_resume_batch_task.s(ids[i : i + BULK_PARSE_CHUNK])
+            for i in range(0, len(ids), BULK_PARSE_CHUNK)
+        ).apply_async()
+
+    AuditLog.objects.create(
+        actor="system",
+        action="bulk_upload",
+        metadata_json={
+            "batch_id": str(batch.id),
+            "accepted": len(ids),
+            "duplicates": len(duplicates),
+            "rejected": rejected_total,
+        },
+    )
+    return Response(
+        {
+            "batch_id": str(batch.id),
+            "accepted": len(ids),
+            "duplicates": duplicates,
+            "rejected": rejected,
+            "rejected_total": rejected_total,
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(["GET"])
+def bulk_upload_status(_req, batch_id):
+    """Progress of a bulk upload: counts of candidates by latest extraction status."""
+    batch = get_object_or_404(UploadBatch, pk=batch_id)
+    rows = (
+        Candidate.objects.filter(resumes__batch=batch)
+        .with_latest_extraction_status()
+        .values("latest_extraction_status")
+        .annotate(n=Count("id"))
+    )
+    counts = {"queued": 0, "done": 0, "error": 0}
+    for r in rows:
+        counts[r["latest_extraction_status"] or "queued"] += r["n"]
+    return Response({"batch_id": str(batch.id), "total": sum(counts.values()), **counts})
+
+
 # --------------------------
 # Reparse latest resume
 # --------------------------
@@ -557,7 +875,7 @@ def reparse_candidate(_req, id):
         return Response({"error": "no resume found"}, status=status.HTTP_400_BAD_REQUEST)
 
     Extraction.objects.create(candidate=cand, status="queued")
-    parse_resume_task.delay(str(cand.id), last_resume.file_path)
+    parse_resume_pipeline(str(cand.id), last_resume.file_path).delay()
 
     AuditLog.objects.create(
         actor="system",
@@ -598,22 +916,6 @@ def _choose_channel(cand, explicit_channel, extracted, confidence):
     raise ValueError("No reachable contact (email/phone) on candidate.")
 
 
-def _compose_preview(candidate_payload, upload_url, org_name, support_email):
-    sal = (candidate_payload.get("name") or "there").strip()
-    subject = f"{org_name} — PAN & Aadhaar verification"
-    email_body = (
-        f"Hi {sal},\n\n"
-        f"To complete your background verification for onboarding with {org_name}, "
-        "please upload clear images or PDFs of your PAN and Aadhaar using the secure link below:\n"
-        f"{upload_url}\n\n"
-        "We use these documents only for identity verification and do not share them. "
-        f"If you face any issues, reply to {support_email} and we’ll help.\n\n"
-        f"Thanks,\n{org_name} Team"
-    )
-    sms_body = f"{org_name}: please upload PAN & Aadhaar to complete verification: {upload_url}"
-    return {"subject": subject, "email_body": email_body, "sms_body": sms_body}
-
-
 # --------------------------
 # AI: request PAN/Aadhaar (org-safe) + optional send_now
 # --------------------------
@@ -625,13 +927,15 @@ def request_documents(req, id):
     Body (JSON):
       {
         "channel": "email" | "sms" | "auto" | null,   # optional; default 'auto'
-        "upload_url": "https://...",                   # optional; defaults to http://localhost:5173/upload/<id>
+        "upload_url": "https://...",                   # optional; defaults to DOC_REQUEST_UPLOAD_URL
         "org_name": "TraqCheck",                       # optional; defaults to settings.ORG_NAME
         "support_email": "support@...",                # optional; defaults to settings.ORG_SUPPORT_EMAIL
-        "send_now": true | false                       # optional; default false
+        "send_now": true | false,                      # optional; default false
+        "stream": true | false                         # optional; default false
       }
 
     Returns: {"id": "<DocumentRequest id>", "preview": {...}}
+    With "stream": true, a text/event-stream of draft previews instead (see _stream_document_request).
     """
     cand = get_object_or_404(Candidate, pk=id)
 
@@ -640,21 +944,15 @@ def request_documents(req, id):
     extracted = last.extracted_json if last else {}
     confidence = last.confidence_json if last else {}
 
-    candidate_payload = {
-        "name": extracted.get("name") or cand.name,
-        "email": extracted.get("email") or cand.email,
-        "phone": extracted.get("phone") or cand.phone,
-        "skills": extracted.get("skills") or (cand.skills or []),
-        "candidate_company": extracted.get("company") or cand.company,
-        "designation": extracted.get("designation") or cand.designation,
-    }
+    candidate_payload = doc_request.candidate_payload(cand, extracted)
 
     channel_raw = req.data.get("channel")
     channel_raw = (channel_raw or "auto").strip().lower() if isinstance(channel_raw, str) else "auto"
 
-    upload_url = req.data.get("upload_url") or f"http://localhost:5173/upload/{cand.id}"
-    org_name = (req.data.get("org_name") or getattr(settings, "ORG_NAME", "TraqCheck")).strip()
-    support_email = (req.data.get("support_email") or getattr(settings, "ORG_SUPPORT_EMAIL", "support@traqcheck.local")).strip()
+    default_org, default_support = doc_request.default_sender()
+    upload_url = req.data.get("upload_url") or doc_request.default_upload_url(cand.id)
+    org_name = (req.data.get("org_name") or default_org).strip()
+    support_email = (req.data.get("support_email") or default_support).strip()
     send_now = bool(req.data.get("send_now", False))
 
     # ---- choose channel (auto/email/sms) ----
@@ -663,63 +961,39 @@ def request_documents(req, id):
     except ValueError as e:
         return Response({"error": str(e)}, status=400)
 
-    # ---- LLM prompt with explicit sender semantics ----
-    system = (
-        "You are an HR assistant writing document-collection messages on behalf of an organization.\n"
-        "You MUST treat the requesting organization as the SENDER.\n"
-        f"- The sender organization is '{org_name}'. Never imply you are the candidate's employer.\n"
-        "- 'candidate_company' (if present) is the candidate's past/current employer, NOT the sender.\n"
-        "- Write concise, professional, privacy-aware requests to collect PAN and Aadhaar.\n"
-        "- Tone: courteous, clear, formal; keep SMS <= 320 chars.\n"
-        "- Output STRICT JSON ONLY with keys: subject, email_body, sms_body. No markdown links.\n"
-    )
-    user = (
-        "Context:\n"
-        f"- Sender org: {org_name}\n"
-        f"- Support email: {support_email}\n"
-        f"- Secure upload link: {upload_url}\n"
-        f"- Candidate data: {candidate_payload}\n\n"
-        "Requirements:\n"
-        "- Subject mentions 'PAN & Aadhaar verification' or similar.\n"
-        "- Email body MUST state you are contacting on behalf of the sender org (org_name),\n"
-        "  explain purpose (onboarding/identity verification), acceptable file types (clear photo or PDF), privacy,\n"
-        "  support instructions (use support_email), and include the plain URL.\n"
-        "- SMS body must be ≤ 320 chars and include the URL.\n"
-        "- NEVER say or imply you are the candidate_company.\n"
-        "- Output EXACT JSON with keys: subject, email_body, sms_body."
-    )
-    schema = {
-        "type": "object",
-        "properties": {
-            "subject": {"type": "string"},
-            "email_body": {"type": "string"},
-            "sms_body": {"type": "string"},
-        },
-        "required": ["subject", "email_body", "sms_body"],
-        "additionalProperties": False,
-    }
-
-    data = generate_structured(schema, system, user) or {}
-
-    # ---- Fallback if LLM not configured/available ----
-    if not data:
-        data = _compose_preview(candidate_payload, upload_url, org_name, support_email)
-
-    # ---- Final safety: sanitize any accidental sender confusion ----
-    cand_co = (candidate_payload.get("candidate_company") or "").strip()
-    if cand_co and cand_co.lower() != org_name.lower():
-        def _fix_org(text: str) -> str:
-            if not text:
-                return text
-            text = text.replace(f" at {cand_co}", f" at {org_name}")
-            text = text.replace(f" from {cand_co}", f" from {org_name}")
-            text = text.replace(cand_co, org_name)
-            return text
-
-        data["subject"] = _fix_org(data.get("subject", ""))
-        data["email_body"] = _fix_org(data.get("email_body", ""))
-        data["sms_body"] = _fix_org(data.get("sms_body", ""))
+    # ---- Message: precomputed after upload (doc_request), else drafted now ----
+    key = doc_request.inputs_key(candidate_payload, upload_url, org_name, support_email)
+
+    def generate(on_delta=None):
+        data = doc_request.cached(cand.id, key)
+        if data is None:
+            try:
+                data = doc_request.draft(candidate_payload, upload_url, org_name, support_email, on_delta)
+            except (LLMTimeout, LLMThrottled):
+                return None  # a recruiter is waiting: use the template rather than queue for the LLM
+            if data:
+                doc_request.store(cand.id, key, data)
+        return data
+
+    def finish(data):
+        # ---- Fallback if LLM not configured/available ----
+        if not data:
+            data = doc_request.fix_sender(
+                doc_request.compose_preview(candidate_payload, upload_url, org_name, support_email),
+                candidate_payload, org_name,
+            )
+        return _save_document_request(cand, channel, extracted, data, org_name, send_now)
+
+    if req.data.get("stream"):
+        return _stream_document_request(generate, finish)
+
+    dr = finish(generate())
 
+    # Respond with (possibly updated) preview
+    return Response({"id": str(dr.id), "preview": dr.payload_json}, status=201)
+
+
+def _save_document_request(cand, channel, extracted, data, org_name, send_now):
     # Persist request (as draft initially)
     dr = DocumentRequest.objects.create(candidate=cand, channel=channel, payload_json=data)
     AuditLog.objects.create(
@@ -758,9 +1032,48 @@ def request_documents(req, id):
             **({"error": err} if err else {}),
         }
         dr.save(update_fields=["payload_json"])
+    return dr
 
-    # Respond with (possibly updated) preview
-    return Response({"id": str(dr.id), "preview": dr.payload_json}, status=201)
+
+def _stream_document_request(generate, finish):
+    """
+    text/event-stream variant of request_documents: "delta" events carry the
+    message drafted so far (partial subject/email_body/sms_body) while the LLM
+    generates it, then one "done" event carries {"id", "preview"} once saved
+    (just "done" when the message was cached). generate(on_delta) runs in a
+    thread; only the newest draft is sent when the client reads slower than
+    tokens arrive.
+    """
+    drafts = queue.Queue()
+    result = {}
+
+    def run():
+        try:
+            result["data"] = generate(drafts.put)
+        finally:
+            drafts.put(None)
+
+    def events():
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            draft = drafts.get()
+            while draft is not None and not drafts.empty():
+                draft = drafts.get_nowait()
+            if draft is None:
+                break
+            if draft:
+                yield _sse("delta", draft)
+        dr = finish(result.get("data") or {})
+        yield _sse("done", {"id": str(dr.id), "preview": dr.payload_json})
+
+    resp = StreamingHttpResponse(events(), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return resp
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 # --------------------------
@@ -794,10 +1107,7 @@ def submit_documents(req, id):
 
         fname = f"{dtype.lower()}-{uuid.uuid4().hex}{ext}"
         abs_path = os.path.join(cand_dir, fname)
-
-        with open(abs_path, "wb") as out:
-            for chunk in f.chunks():
-                out.write(chunk)
+        store_upload(f, abs_path)
 
         d = Document.objects.create(
             candidate=cand,
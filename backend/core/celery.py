@@ -1,8 +1,57 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 app = Celery("core")
 app.conf.broker_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
 app.conf.result_backend = os.getenv("REDIS_URL", "redis://redis:6379/0")
 app.autodiscover_tasks()
+
+# Parse pipeline stages get their own queues so a slow LLM can't starve
+# CPU-bound text extraction (and vice versa).
+app.conf.task_routes = {
+    "extract_text_task": {"queue": "parse-cpu"},
+    "llm_extract_task": {"queue": "llm-io"},
+    "persist_task": {"queue": "persist"},
+    "precompute_document_request_task": {"queue": "llm-io"},
+    "parse_resume_batch_task": {"queue": "parse-cpu"},
+    "llm_extract_batch_task": {"queue": "llm-io"},
+    "persist_batch_task": {"queue": "persist"},
+    "llm_offline_batch_task": {"queue": "parse-cpu"},
+    "llm_offline_submit_task": {"queue": "llm-io"},
+    "llm_offline_poll_task": {"queue": "llm-io"},
+    "retag_skills_task": {"queue": "parse-cpu"},
+}
+
+# Per-stage worker tuning; pick one with CELERY_WORKER_STAGE, e.g.
+#   CELERY_WORKER_STAGE=llm-io celery -A core worker -Q llm-io
+# CPU stage: one process per core. LLM stage: many threads, it mostly waits on
+# sockets. Persist stage: a few processes, bounded by DB connections.
+STAGE_WORKERS = {
+    "parse-cpu": {
+        "worker_pool": "prefork",
+        "worker_concurrency": int(os.getenv("PARSE_CPU_CONCURRENCY", str(os.cpu_count() or 2))),
+        "worker_prefetch_multiplier": 1,
+    },
+    "llm-io": {
+        "worker_pool": "threads",
+        "worker_concurrency": int(os.getenv("LLM_IO_CONCURRENCY", "32")),
+        "worker_prefetch_multiplier": 2,
+    },
+    "persist": {
+        "worker_pool": "prefork",
+        "worker_concurrency": int(os.getenv("PERSIST_CONCURRENCY", "4")),
+        "worker_prefetch_multiplier": 4,
+    },
+}
+if os.getenv("CELERY_WORKER_STAGE") in STAGE_WORKERS:
+    app.conf.update(STAGE_WORKERS[os.environ["CELERY_WORKER_STAGE"]])
+
+
+@worker_process_init.connect
+def _reset_llm_clients(**_kwargs):
+    """Each prefork child builds its own LLM connection pools on first use."""
+    from api.llm_client import reset_clients
+    reset_clients()
+
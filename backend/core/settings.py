@@ -64,6 +64,16 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 DOCS_DIR = os.getenv("DOCS_DIR", str(BASE_DIR / "docs"))
 os.makedirs(DOCS_DIR, exist_ok=True)
 
+# Large uploads spool here; same volume as DOCS_DIR so storing them is a rename, not a copy.
+FILE_UPLOAD_TEMP_DIR = os.path.join(DOCS_DIR, ".uploads")
+os.makedirs(FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+
+# POST /candidates/bulk-upload accepts this many resumes (files plus zip members).
+# Django rejects a request with more file parts than DATA_UPLOAD_MAX_NUMBER_FILES
+# (default 100) before the view runs, so allow them all, plus the 'zip' part.
+BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", "5000"))
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES + 1
+
 # DRF basics
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
@@ -45,3 +45,11 @@ create table audit_logs(
   candidate_id uuid references candidates(id) on delete cascade,
   metadata jsonb, ts timestamptz default now()
 );
+
+-- "latest row per candidate" lookups + dashboard keyset pagination
+create index candidate_updated_id_idx on candidates(updated_at, id);
+create index resume_cand_created_idx on resumes(candidate_id, created_at desc);
+create index extraction_cand_created_idx on extractions(candidate_id, created_at desc);
+create index docreq_cand_created_idx on document_requests(candidate_id, created_at desc);
+create index document_cand_uploaded_idx on documents(candidate_id, uploaded_at);
+create index auditlog_cand_ts_idx on audit_logs(candidate_id, ts);
@@ -3,7 +3,7 @@
 import type {
   UploadResumeResponse,
   CandidateDetail,
-  CandidateRow,
+  CandidatePage,
   RequestDocumentsBody,
   RequestDocumentsResponse,
   SubmitDocumentsResponse,
@@ -46,9 +46,14 @@ export async function getCandidate(id: string): Promise<CandidateDetail> {
   return toJSON<CandidateDetail>(res);
 }
 
-export async function listCandidates(): Promise<CandidateRow[]> {
-  const res = await fetch(`${API_BASE}/candidates`);
-  return toJSON<CandidateRow[]>(res);
+// One page of the list, newest first; pass the previous page's next_cursor to continue.
+export async function listCandidates(
+  opts: { limit?: number; cursor?: string | null } = {}
+): Promise<CandidatePage> {
+  const qs = new URLSearchParams({ limit: String(opts.limit ?? 50) });
+  if (opts.cursor) qs.set("cursor", opts.cursor);
+  const res = await fetch(`${API_BASE}/candidates?${qs}`);
+  return toJSON<CandidatePage>(res);
 }
 
 export async function requestDocuments(
@@ -6,12 +6,19 @@ export default function Candidates() {
   const [rows, setRows] = useState<CandidateRow[]>([]);
   const [loading, setLoading] = useState(true);
   const [err, setErr] = useState<string | null>(null);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  async function loadPage(after: string | null) {
+    const page = await listCandidates({ cursor: after });
+    setRows(prev => (after ? [...prev, ...page.results] : page.results));
+    setCursor(page.next_cursor);
+  }
 
   useEffect(() => {
     (async () => {
       try {
-        const data = await listCandidates() as CandidateRow[];
-        setRows(data);
+        await loadPage(null);
       } catch (e: any) {
         setErr(e.message || String(e));
       } finally {
@@ -20,6 +27,17 @@ export default function Candidates() {
     })();
   }, []);
 
+  async function loadMore() {
+    setLoadingMore(true);
+    try {
+      await loadPage(cursor);
+    } catch (e: any) {
+      setErr(e.message || String(e));
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   if (loading) return <div className="p-6">Loading…</div>;
   if (err) return <div className="p-6 text-red-600">{err}</div>;
 
@@ -58,6 +76,15 @@ export default function Candidates() {
           </table>
         </div>
       )}
+      {cursor && (
+        <button
+          className="mt-4 px-4 py-2 rounded bg-black text-white disabled:opacity-50"
+          onClick={loadMore}
+          disabled={loadingMore}
+        >
+          {loadingMore ? "Loading…" : "Load more"}
+        </button>
+      )}
     </div>
   );
 }
@@ -14,6 +14,11 @@ export type CandidateRow = {
   updated_at: string;
 };
 
+export type CandidatePage = {
+  results: CandidateRow[];
+  next_cursor: string | null;
+};
+
 export type Confidence = Record<
   "name" | "email" | "phone" | "company" | "designation" | "skills",
   number